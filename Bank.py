@@ -1,740 +1,3217 @@
-from datetime import datetime
-from datetime import date
-
-trx_id = "TRX001"   # Global variable to keep track of the transaction ID
-
-
-class Customer(object):
-    """ Customer class: Stores all information about the customer. """
-
-    def __init__(self, customer_id, name, age, pin, acc_id=None):
-        self.customer_id = customer_id      # Customer's ID
-        self.name = name                    # Customer's Name
-        self.age = age                      # Customer's Age
-        self.__pin = pin                    # Customer's PIN
-        if acc_id is None:
-            self.accounts = []              # List of Customer's Accounts
-        else:
-            self.accounts = [acc_id]
-
-    def get_pin(self):
-        return self.__pin
-
-    def set_pin(self, pin):
-        self.__pin = pin
-
-    def pin_verify(self):
-        """ Checks PIN entered by the customer with their actual PIN and returns True or False. """
-        pin = ""
-        while len(pin) != 4 or not pin.isdigit():
-            pin = input("Enter your 4-digit PIN: ")
-        print()
-
-        if pin == self.get_pin():
-            return True
-        else:
-            return False
-
-    def change_pin(self):
-        """ Changes customer's PIN after verifying his current PIN. """
-        print("To change your PIN, we have to verify your current PIN first.")
-        if self.pin_verify():
-            pin = ""
-            while len(pin) != 4 or not pin.isdigit():
-                pin = input("Enter a new 4-digit PIN: ")
-            print()
-            self.set_pin(pin)
-        else:
-            print("Wrong PIN entered")
-            print("PIN Remains Unchanged\n")
-
-    def add_acc(self, acc_id):
-        """ Add an account to the customer accounts list. """
-        self.accounts.append(acc_id)
-
-    def print_balance(self):
-        """ Prints the Account ID, Balance and Type of each account the customer holds. """
-        if self.accounts:
-            print("Accounts:")
-            for acc in self.accounts:
-                print(acc)
-        else:
-            print("You have no accounts!")
-        print()
-
-    def choose_account(self):
-        """
-        Returns the index of the Account that the customer chooses.
-        Has -1 as the return value if the customer decides to cancel choosing instead.
-        """
-        # Prints each account that the customer holds
-        for index in range(len(self.accounts)):
-            print(str(index + 1) + ". " + str(self.accounts[index]))
-        print("\n0. Cancel\n")
-
-        choice = -1
-        # User input should be in the range of total accounts that he holds + 1 (for exit)
-        while choice not in [n for n in range(len(self.accounts) + 1)]:
-            print("Which account would you like to choose?")
-            try:
-                choice = int(input())
-            except ValueError:
-                print("Please only enter a number!")
-                continue
-        choice -= 1
-        return choice
-
-    def close_account(self):
-        """ Closes a Customer's Account after verifying his PIN. """
-        if not self.accounts:
-            print("You have no accounts!")
-        else:
-            print("Choose an account to close:\n")
-            choice = self.choose_account()
-
-            # If choice is not exit
-            if choice != -1:
-                print("Please verify your PIN to confirm")
-                if self.pin_verify():
-                    print(self.accounts.pop(choice))
-                    print("Account Closed Successfully")
-                else:
-                    print("Wrong PIN entered")
-                    print("Account Close Unsuccessful. Returning to main menu...")
-        print()
-
-    def __str__(self):
-        """ Returns a string with the Customer ID, Name, Age and a list of accounts that the customer holds. """
-        result = "Customer ID: " + self.customer_id + "\nName: " + self.name + "\nAge: %2d" % self.age + "\nAccounts:\n"
-        if self.accounts:
-            for acc in self.accounts:
-                result += str(acc) + "\n"
-        else:
-            result += "No Accounts\n"
-        return result
-
-
-class Account(object):
-    """ Account class: Stores all information about an account. Has functions to be used for all types of Accounts. """
-
-    def __init__(self, acc_id, balance=0.0, transactions=None):
-        self.acc_id = acc_id
-        self.balance = balance
-        if transactions is None:
-            self.transactions = []
-        else:
-            self.transactions = transactions
-
-    def deposit(self, amount):
-        """ Deposits amount into an account. """
-        if amount <= 0.0:
-            print("You can only deposit a positive value\n")
-            return
-
-        transaction = (get_next_trx_id(), self.acc_id, str(date.today()), "Deposit", "+"+str(amount))
-        self.transactions.append(transaction)
-
-        self.balance += amount
-
-        print("Deposit Successful")
-
-    def withdraw(self, amount):
-        """
-        Withdraws amount from an account. It checks for the type of Account passed.
-        If the Account is a:
-            Savings Account - It checks if the last withdraw or transfer transaction was made in the last 30 days.
-            Current Account - No monthly transaction limit.
-                              It checks if the resultant balance is less than the minimum balance limit.
-        """
-        if amount <= 0.0:
-            print("You can only withdraw a positive value\n")
-            return
-
-        # If the Account is a Savings Account
-        if isinstance(self, SavingAccount):
-            last = -1
-
-            # To find the last withdraw or transfer (removed from the account) transaction made by the account
-            for index in range(len(self.transactions) - 1, -1, -1):
-                if self.transactions[index][3] != "Deposit" and self.transactions[index][4].startswith("-"):
-                    last = index
-                    break
-
-            # If a withdraw or transfer transaction was found
-            if last != -1:
-                # Get the date of the last withdraw or transfer transaction made by the current account
-                last_trx_date = datetime.strptime(self.transactions[last][2], "%Y-%m-%d").date()
-
-                # Difference between the today and the last_trx_date in days
-                date_diff = (date.today() - last_trx_date).days
-
-                if date_diff < 30:
-                    print("You have already Withdrawn or Transferred this month.")
-                    print("You can only Withdraw or Transfer once every 30 days in a Savings Account")
-                    return
-
-            # If the balance after withdrawing is less than 0
-            if self.balance - amount < 0:
-                print("Sorry, you can't withdraw that much")
-                return
-
-        # If the Account is a Checking Account
-        if isinstance(self, CheckingAccount):
-            # If the balance after withdrawing is less than the minimum balance limit
-            if self.balance - amount < self.minimum_balance:
-                print("Sorry, you can't withdraw that much")
-                return
-
-        transaction = (get_next_trx_id(), self.acc_id, str(date.today()), "Withdraw", "-"+str(amount))
-        self.transactions.append(transaction)
-
-        self.balance -= amount
-
-        print("Withdrawal Successful")
-
-    def print_transactions(self):
-        """ Prints the last 5 transactions done by the Account. """
-        last = len(self.transactions)
-        first = last - 5
-        if first < 0:
-            first = 0
-
-        if last == 0:
-            print("No Transactions on this Account")
-            print("\nCurrent Balance: %.2f" % self.balance)
-            return
-
-        print("Account ID: " + self.acc_id)
-        print()
-        print("Transactions:")
-        for index in range(last, first, -1):
-            print("TRXID: " + self.transactions[index - 1][0] +
-                  " | Date: " + self.transactions[index - 1][2] +
-                  " | Type: {:8}".format(self.transactions[index - 1][3]) +
-                  " | Amount: {:>8}".format(self.transactions[index - 1][4]))
-
-        print("\nCurrent Balance: %.2f" % self.balance)
-
-    def __add__(self, param):
-        """ Add param to the account balance. Allows int and float as the parameter. """
-        if type(param) == int:  # convert ints to float
-            param = float(param)
-        if type(param) == float:
-            self.balance += param
-        else:
-            print("Wrong Type")
-            raise TypeError
-
-    def __radd__(self, param):
-        """ Add param to the account balance. Allows int and float as the parameter. """
-        if type(param) == int:  # convert ints to float
-            param = float(param)
-        if type(param) == float:
-            self.balance += param
-        else:
-            print("Wrong Type")
-            raise TypeError
-
-    def __sub__(self, param):
-        """ Remove param from the account balance. Allows int and float as the parameter. """
-        if type(param) == int:  # convert ints to float
-            param = float(param)
-        if type(param) == float:
-            self.balance -= param
-        else:
-            print("Wrong Type")
-            raise TypeError
-
-    def __rsub__(self, param):
-        """ Remove param from the account balance. Allows int and float as the parameter. """
-        if type(param) == int:  # convert ints to float
-            param = float(param)
-        if type(param) == float:
-            self.balance -= param
-        else:
-            print("Wrong Type")
-            raise TypeError
-
-    def __eq__(self, param):
-        """ Compare two account objects for equality based on Account ID, return Boolean. """
-        if isinstance(param, Account):
-            return self.acc_id == param.acc_id
-        else:
-            print("Wrong Type")
-            raise TypeError
-
-    def __str__(self):
-        """ Returns a string with the Account ID and Balance. """
-        result = "ID: " + self.acc_id + " | Balance: %9.2f" % self.balance
-        return result
-
-
-class SavingAccount(Account):
-    """ SavingAccount class: Subclass of Account. Has functions to be used for a Savings Account. """
-
-    def __init__(self, acc_id, balance=0, transactions=None):
-        Account.__init__(self, acc_id, balance, transactions)
-        self.accType = "Savings"
-
-    def transfer(self, amount, receiver_acc):
-        """ Transfers amount into another account"""
-        if amount <= 0.0:
-            print("You can only transfer a positive value\n")
-            return
-
-        last = -1
-
-        # To find the last withdraw or transfer transaction made by the account
-        for index in range(len(self.transactions) - 1, -1, -1):
-            if self.transactions[index][3] != "Deposit" and self.transactions[index][4].startswith("-"):
-                last = index
-                break
-
-        # If a withdraw or transfer transaction was found
-        if last != -1:
-            # Get the date of the last transaction made by the current account
-            last_trx_date = datetime.strptime(self.transactions[last][2], "%Y-%m-%d").date()
-
-            # Difference between the today and the last_trx_date in days
-            date_diff = (date.today() - last_trx_date).days
-
-            if date_diff < 30:
-                print("You have already Withdrawn or Transferred this month.")
-                print("You can only Withdraw or Transfer once every 30 days in a Savings Account")
-                return
-
-        # If the balance after transferring is less than 0
-        if self.balance - amount < 0:
-            print("Sorry, you can't transfer that much")
-            return
-
-        # Update transactions for the current account
-        transaction = (get_next_trx_id(), self.acc_id, str(date.today()), "Transfer", "-"+str(amount))
-        self.transactions.append(transaction)
-
-        # Update transactions for the receiver's account
-        transaction = (get_next_trx_id(), receiver_acc.acc_id, str(date.today()), "Transfer", "+"+str(amount))
-        receiver_acc.transactions.append(transaction)
-
-        self.balance -= amount          # Remove from current account
-        receiver_acc.balance += amount  # Add to receiver's account
-
-        print("Transfer Successful")
-
-    def __str__(self):
-        """ Returns a string with the Account ID, Balance and Account Type. """
-        result = Account.__str__(self) + " | Type: " + self.accType
-        return result
-
-
-class CheckingAccount(Account):
-    """ CheckingAccount class: Subclass of Account. Has functions to be used for a Checking Account. """
-
-    def __init__(self, acc_id, balance=0, transactions=None, minimum_balance=-1000):
-        Account.__init__(self, acc_id, balance, transactions)
-        self.accType = "Checking"
-        self.minimum_balance = minimum_balance
-
-    def transfer(self, amount, receiver_acc):
-        """ Transfers amount from one account (self) into another account (receiver account). """
-        if amount <= 0.0:
-            print("You can only transfer a positive value\n")
-            return
-
-        # If the balance after transferring is less than 0
-        if self.balance - amount < self.minimum_balance:
-            print("Sorry, you can't transfer that much")
-            return
-
-        # Update transactions for the current account
-        transaction = (get_next_trx_id(), self.acc_id, str(date.today()), "Transfer", "-"+str(amount))
-        self.transactions.append(transaction)
-
-        # Update transactions for the receiver's account
-        transaction = (get_next_trx_id(), receiver_acc.acc_id, str(date.today()), "Transfer", "+"+str(amount))
-        receiver_acc.transactions.append(transaction)
-
-        self.balance -= amount          # Remove from current account
-        receiver_acc.balance += amount  # Add to receiver's account
-
-        print("Transfer Successful")
-
-    def __str__(self):
-        """ Returns a string with the Account ID, Balance and Account Type. """
-        result = Account.__str__(self) + " | Type: " + self.accType
-        return result
-
-
-def get_next_trx_id():
-    """ Returns the next transaction ID. """
-    global trx_id
-    trx_id = "TRX{:03}".format(int(trx_id[3:]) + 1)
-    return trx_id
-
-
-def create_savings_account(customer, accounts):
-    """ Checks the age of the customer and creates a savings account for the customer if he is eligible. """
-
-    # Find the next Unique ID in accounts
-    unqid = "AC{:03}".format(int(max(accounts)[2:]) + 1)
-
-    # Check if the customer is eligible to open a Savings Account
-    if customer.age >= 14:
-        # Creates a new SavingAccount object and stores it in the accounts dictionary with the Account ID as key
-        accounts[unqid] = SavingAccount(acc_id=unqid)
-        # Add the newly created Account to the customer
-        customer.add_acc(accounts[unqid])
-
-        print("Account created successfully!\n")
-        print(accounts[unqid])
-    else:
-        print("You should be 14 years or older to open a Savings Account!")
-
-    print()
-
-
-def create_checking_account(customer, accounts):
-    """ Checks the age of the customer and creates a checking account for the customer if he is eligible. """
-
-    # Find the next Unique ID in accounts
-    unqid = "AC{:03}".format(int(max(accounts)[2:]) + 1)
-
-    # Check if the customer is eligible to open a Checking Account
-    if customer.age >= 18:
-        # Creates a new CheckingAccount object and stores it in the accounts dictionary with the Account ID as key
-        accounts[unqid] = CheckingAccount(acc_id=unqid)
-        # Add the newly created Account to the customer
-        customer.add_acc(accounts[unqid])
-
-        print("Account created successfully!\n")
-        print(accounts[unqid])
-    else:
-        print("You should be 18 years or older to open a Checking Account!")
-
-    print()
-
-
-def update_files(customers):
-    """
-    Updates the files:
-        customers.txt            -  With the information about each Customer
-        accounts.txt             -  With the information about each Accounts
-        accountsTransactions.txt -  With the information about each Transaction
-    """
-
-    # Open files to write data of all the Customers and Accounts
-    try:
-        customers_file = open("customers.txt", "w")
-        accounts_file = open("accounts.txt", "w")
-        transactions_file = open("accountsTransactions.txt", "w")
-    except IOError:
-        print("File could not be opened.")
-        return
-
-    # Writes details of each customer, accounts and transactions to the files
-    for key in customers:
-        line = customers[key].customer_id + " " + customers[key].name + " %d" % customers[key].age + " " + customers[key].get_pin() + " "
-
-        # Write the customer detail only if he has an account
-        for acc in customers[key].accounts:
-            # Write the details of the customer to the file customer.txt
-            print(line + acc.acc_id, file=customers_file)
-
-            # Write the details of the account to the file accounts.txt
-            line2 = acc.acc_id + " " + acc.accType + " %.2f" % acc.balance
-            print(line2, file=accounts_file)
-
-            # Writes details of each transaction to the file accountsTransactions.txt
-            for transaction in acc.transactions:
-                print(" ".join(transaction), file=transactions_file)
-
-    # Close all the files
-    customers_file.close()
-    accounts_file.close()
-    transactions_file.close()
-
-
-def menu(customer, allcustomers, accounts):
-    """ Displays the menu after logging in and calls the respective functions as the user chooses. """
-
-    while True:
-        print("1. Create a New Account")
-        print("2. View Balance")
-        print("3. Deposit")
-        print("4. Withdraw")
-        print("5. Transfer")
-        print("6. View Transactions")
-        print("7. Close an Account")
-        print("8. Change PIN")
-        print("9. Logout")
-
-        menu_choice = ""
-        while menu_choice not in ["1", "2", "3", "4", "5", "6", "7", "8", "9"]:
-            menu_choice = input("Enter your choice: ")
-        print()
-
-        menu_choice = int(menu_choice)
-
-        # Choice 1: Create a New Account
-        if menu_choice == 1:
-            print("Which type of account would you like to make?")
-            print("1. Savings Account")
-            print("2. Checking Account")
-
-            choice = ""
-            while choice not in ["1", "2"]:
-                choice = input("Enter your choice: ")
-            print()
-
-            # Customer chooses Savings Account
-            if choice == "1":
-                create_savings_account(customer, accounts)
-            # Customer chooses Checking Account
-            else:
-                create_checking_account(customer, accounts)
-
-        # Choice 2: View Balance
-        elif menu_choice == 2:
-            customer.print_balance()
-
-        # Choice 3: Deposit
-        elif menu_choice == 3:
-            # If customer has no accounts
-            if not customer.accounts:
-                print("You have no accounts!")
-            else:
-                print("Choose an account to deposit to:\n")
-                choice = customer.choose_account()
-
-                # If choice is not exit
-                if choice != -1:
-                    amount = ""
-                    while not amount.isdigit():
-                        amount = input("Enter amount to deposit: ")
-                    print()
-
-                    amount = float(amount)
-                    customer.accounts[choice].deposit(amount)
-            print()
-
-        # Choice 4: Withdraw
-        elif menu_choice == 4:
-            # If customer has no accounts
-            if not customer.accounts:
-                print("You have no accounts!")
-            else:
-                print("Choose an account to withdraw from:\n")
-                choice = customer.choose_account()
-
-                # If choice is not exit
-                if choice != -1:
-                    amount = ""
-                    while not amount.isdigit():
-                        amount = input("Enter amount to withdraw: ")
-                    print()
-
-                    amount = float(amount)
-                    customer.accounts[choice].withdraw(amount)
-            print()
-
-        # Choice 5: Transfer
-        elif menu_choice == 5:
-            # If customer has no accounts
-            if not customer.accounts:
-                print("You have no accounts!")
-            else:
-                print("Choose an account to transfer from:\n")
-                choice = customer.choose_account()
-
-                # If choice is not exit
-                if choice != -1:
-                    print("Choose a customer to transfer to:\n")
-
-                    # Choose customer to transfer to
-                    for key in allcustomers:
-                        print("ID: " + key + " | Name: " + allcustomers[key].name)
-                    print()
-                    customer_id = ""
-                    while customer_id not in [key for key in allcustomers]:
-                        customer_id = input("Enter Customer ID: ")
-
-                    # Choose account of the selected customer to transfer to
-                    print("Choose an account to transfer to:\n")
-                    acc = allcustomers[customer_id].choose_account()
-
-                    # If choice is not exit
-                    if choice != -1:
-                        amount = ""
-                        while not amount.isdigit():
-                            amount = input("Enter amount to transfer: ")
-                        print()
-
-                        amount = float(amount)
-                        customer.accounts[choice].transfer(amount, allcustomers[customer_id].accounts[acc])
-            print()
-
-        # Choice 6: View Transactions
-        elif menu_choice == 6:
-            # If customer has no accounts
-            if not customer.accounts:
-                print("You have no accounts!")
-            else:
-                print("Choose an account to view transactions:\n")
-                choice = customer.choose_account()
-                print()
-
-                # If choice is not exit
-                if choice != -1:
-                    customer.accounts[choice].print_transactions()
-
-            print()
-
-        # Choice 7: Close an Account
-        elif menu_choice == 7:
-            customer.close_account()
-
-        # Choice 9: Change PIN
-        elif menu_choice == 8:
-            customer.change_pin()
-
-        # Choice 9: Logout
-        else:
-            break
-
-
-def create_bank_obj(customers, accounts):
-    """ Creates previous customer objects and Account objects with information from the files. """
-
-    # Open files to get data to create all the previous Customers and Accounts
-    try:
-        customers_file = open("customers.txt", "r")
-        accounts_file = open("accounts.txt", "r")
-        transactions_file = open("accountsTransactions.txt", "r")
-    except IOError:
-        print("File could not be opened.")
-        return
-
-    # Create all the account objects and store them in the accounts dictionary with their ID as the key
-    for line in accounts_file:
-        record = line.strip().split()
-
-        if record[1] == 'Savings':
-            accounts[record[0]] = SavingAccount(acc_id=record[0], balance=float(record[2]))
-        else:
-            accounts[record[0]] = CheckingAccount(acc_id=record[0], balance=float(record[2]))
-
-    # Create all the customer objects and store them in the customers dictionary with their ID as the key
-    for line in customers_file:
-        record = line.strip().split()
-
-        # If the Customer object already exists, add the Account to the customer
-        if record[0] in customers:
-            customers[record[0]].add_acc(accounts[record[4]])
-        # If the Customer object does not exist, create a Customer with the Account
-        else:
-            customers[record[0]] = Customer(customer_id=record[0],
-                                            name=record[1],
-                                            age=int(record[2]),
-                                            pin=record[3],
-                                            acc_id=accounts[record[4]])
-
-    global trx_id
-    trx_id = "TRX001"
-
-    # Reads each transaction from the transactions file and add them to their respective accounts
-    for line in transactions_file:
-        record = line.strip().split()
-
-        # To get the max Transaction ID
-        if trx_id < record[0]:
-            trx_id = record[0]
-
-        # Store the transaction information as a tuple
-        transaction = tuple(record)
-
-        # Add the transaction to the respective account, record[1] is the Account ID of the transaction
-        accounts[record[1]].transactions.append(transaction)
-
-    # Close all the files
-    customers_file.close()
-    accounts_file.close()
-    transactions_file.close()
-
-
-def main():
-    """ Main function. """
-
-# =============================================================================================
-#                                   Create Previous Instances
-# =============================================================================================
-
-    customers = {}  # Dictionary to store all the customer objects
-    accounts = {}   # Dictionary to store all the account objects
-
-    create_bank_obj(customers, accounts)
-
-# =============================================================================================
-#                                           Main Menu
-# =============================================================================================
-
-    while True:
-        print("1. Create an Account")
-        print("2. Login to an Account")
-        print("3. Exit")
-
-        choice = ""
-        while choice not in ["1", "2", "3"]:
-            choice = input("Enter your choice: ")
-        print()
-
-        # Choice 1: Create an Account
-        if choice == "1":
-            name = ""
-            age = ""
-            pin = ""
-
-            while not name.isalpha():
-                name = input("Enter your first name (only letters): ")
-
-            while not age.isdigit():
-                age = input("Enter your age: ")
-
-            while len(pin) != 4 or not pin.isdigit():
-                pin = input("Enter a 4-digit PIN: ")
-
-            # Find the next Unique ID in customers
-            unqid = "C{:03}".format(int(max(customers)[1:]) + 1)
-
-            # Creates a new Customer object and stores it in the customers dictionary with the Customer ID as the key
-            customers[unqid] = Customer(customer_id=unqid, name=name, age=int(age), pin=pin)
-
-            print("\nAccount created successfully!\n")
-            print(customers[unqid])
-
-        # Choice 2: Login to an Account
-        elif choice == "2":
-            customer_id = input("Enter your ID: ")
-
-            if customer_id in customers:
-
-                if customers[customer_id].pin_verify():
-                    print("Login Successful\n")
-                    menu(customers[customer_id], customers, accounts)  # Main menu function after login
-                else:
-                    print("Wrong PIN entered\n")
-
-            else:
-                print("Account does not exist\n")
-
-        # Choice 3: Exit
-        else:
-            break
-
-        update_files(customers)
-
-    print("Thank you for using our services. Exiting Bank...")
-    return
-
-
-# Call the main function
-main()
+import gc
+import lzma
+import math
+import mmap
+import os
+import queue
+import shutil
+import sqlite3
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import date
+
+import metrics
+
+storage = None      # Global variable holding the storage (FileStorage or SQLiteStorage) the bank was loaded from
+journal = None      # Global variable holding the Journal of changes made since the last snapshot
+transaction_source = None   # Global variable holding the source that Account histories in the snapshot are read from
+shard_count = 0         # Global variable holding the number of shards the bank was loaded from, 0 if it is not sharded
+dirty_shards = set()    # Global variable holding the numbers of the shards changed since the last snapshot
+
+TEXT_FILES = ["customers.txt", "accounts.txt", "accountsTransactions.txt"]
+BINARY_SNAPSHOT = "bank.snap"           # Binary snapshot, used instead of the text files when it exists
+SHARD_DIRECTORY = "shards"              # Text files split into shards by Account ID, used instead of both when it exists
+SHARD_WORKERS = int(os.environ.get("BANK_SHARD_WORKERS", "0"))  # Processes reading the shards at launch, 0 for one per CPU
+IDS_FILE = "ids.txt"                    # Highest ID handed out for customers, accounts and transactions
+SNAPSHOT_FILES = TEXT_FILES + [BINARY_SNAPSHOT, IDS_FILE]
+JOURNAL_FILE = "journal.txt"            # Append-only log of every change made since the last snapshot
+SNAPSHOT_MARKER = "snapshot.ready"      # Exists only while a new snapshot is being moved into place
+JOURNAL_COMPACT_SIZE = 1000             # Number of journal records after which a new snapshot is written
+DURABILITY_MODES = ["flush", "fsync", "group", "async"]     # How soon journal records reach the disk, see Journal
+DURABILITY = os.environ.get("BANK_DURABILITY", "flush")     # Durability mode the journal is opened with
+GROUP_COMMIT_SIZE = 64                  # Number of records after which the group mode syncs the journal
+GROUP_COMMIT_INTERVAL = 0.005           # Seconds after which the group mode syncs records that have not been synced
+ASYNC_FLUSH_INTERVAL = 1.0              # Seconds between each sync of the journal in the async mode
+HISTORY_CACHE_SIZE = 1000               # Number of Account histories read from the snapshot that are kept in memory
+DATABASE_FILE = "bank.db"               # SQLite database, used instead of the snapshot files and journal when it exists
+DATABASE_POOL_SIZE = 4                  # Number of read connections to the SQLite database
+STATEMENT_PAGE_SIZE = 20                # Number of transactions shown on each page of a statement
+CUSTOMER_PAGE_SIZE = 20                 # Number of customers shown on each page of a search
+LIMITS_FILE = "limits.txt"              # Limits on withdraws and transfers for each type of Account, see load_limits
+LIMIT_WINDOW_DAYS = 30                  # Longest window of a limit, archive.py always keeps 30 days in the snapshot
+
+# Layout of the binary snapshot. All strings live once in the string table and records refer to them by index.
+# Transactions are stored as four columns (numbers, date ordinals, types and amounts in cents) with each Account's
+# transactions together, so an Account's history is read straight into a Ledger.
+SNAPSHOT_MAGIC = b"BANK"
+SNAPSHOT_VERSION = 5
+SNAPSHOT_HEADER = struct.Struct("<4sHHIIIIIq")  # Magic, version, unused, strings, string table size, customers, accounts,
+                                                # transactions, highest transaction number
+SNAPSHOT_CUSTOMER = struct.Struct("<IIHI")      # Customer ID, name, age, PIN
+SNAPSHOT_ACCOUNT = struct.Struct("<IIBqQIi")    # Account ID, owner (customer number), type, balance in cents, first transaction,
+                                                # transactions, date ordinal of the last withdraw or transfer
+SNAPSHOT_ACCOUNT_V4 = struct.Struct("<IIBdQIi") # The same in version 4 snapshots, with the balance as a float
+SNAPSHOT_TRANSACTION_SIZE = 8 + 4 + 1 + 8     # Transaction number, date ordinal, type, amount in cents
+
+# Layout of an archive segment. Each block holds up to ARCHIVE_BLOCK_SIZE transactions of one Account as the four
+# columns of a Ledger, compressed. The block index at the end gives each block's Account ID (a length byte, then the
+# text) followed by an ARCHIVE_BLOCK record.
+ARCHIVE_DIRECTORY = "archive"           # Archive segments of old transactions, see archive.py
+ARCHIVE_MAGIC = b"BARC"
+ARCHIVE_VERSION = 1
+ARCHIVE_COMPRESSION = ["zlib", "lzma"]
+ARCHIVE_HEADER = struct.Struct("<4sHBxIQ")     # Magic, version, compression, blocks, offset of the block index
+ARCHIVE_BLOCK = struct.Struct("<QIIiiq")        # Offset, compressed size, transactions, first date, last date, total in cents
+ARCHIVE_BLOCK_SIZE = 512                # Number of transactions in each block of an archive segment
+ARCHIVE_CACHE_SIZE = 64                 # Number of decompressed archive blocks kept in memory
+ACCOUNT_TYPES = ["Savings", "Checking"]
+TRANSACTION_TYPES = ["Deposit", "Withdraw", "Transfer", "Interest", "Fee"]
+TRANSACTION_CODES = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+DEBIT_TYPES = ["Withdraw", "Transfer"]  # Types of transaction taking money out of an account, which limits apply to
+
+
+class TransactionError(Exception):
+    """ TransactionError class: Raised when a deposit, withdraw or transfer breaks one of the bank's rules. """
+
+    def __init__(self, reason, message):
+        Exception.__init__(self, message)
+        self.reason = reason    # Short name of the broken rule, such as "insufficient_funds"
+
+
+class LockHolder(object):
+    """ LockHolder class: Context manager which calls acquire on entry and release on exit. """
+    __slots__ = ("acquire", "release")
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class SharedLock(object):
+    """
+    SharedLock class: Lock that many threads can hold shared at once, or a single thread can hold exclusively.
+    Changes to the bank hold it shared, writing a snapshot holds it exclusively. Waiting exclusive holders go first.
+    Use as "with lock.shared:" or "with lock.exclusive:".
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.holders = 0            # Number of threads holding the lock shared
+        self.held = False           # True while a thread holds the lock exclusively
+        self.waiting = 0            # Number of threads waiting to hold the lock exclusively
+        self.shared = LockHolder(self.acquire_shared, self.release_shared)
+        self.exclusive = LockHolder(self.acquire_exclusive, self.release_exclusive)
+
+    def acquire_shared(self):
+        with self.condition:
+            while self.held or self.waiting:
+                self.condition.wait()
+            self.holders += 1
+
+    def release_shared(self):
+        with self.condition:
+            self.holders -= 1
+            # Only exclusive holders wait for the shared ones to leave
+            if self.holders == 0 and self.waiting:
+                self.condition.notify_all()
+
+    def acquire_exclusive(self):
+        with self.condition:
+            self.waiting += 1
+            while self.held or self.holders:
+                self.condition.wait()
+            self.waiting -= 1
+            self.held = True
+
+    def release_exclusive(self):
+        with self.condition:
+            self.held = False
+            self.condition.notify_all()
+
+
+bank_lock = SharedLock()    # Held shared by every change to the bank and exclusively while a snapshot is written
+
+
+class Customer(object):
+    """ Customer class: Stores all information about the customer. """
+
+    def __init__(self, customer_id, name, age, pin, acc_id=None):
+        self.customer_id = customer_id      # Customer's ID
+        self.name = name                    # Customer's Name
+        self.age = age                      # Customer's Age
+        self.__pin = pin                    # Customer's PIN
+        self.accounts = []                  # List of Customer's Accounts
+        if acc_id is not None:
+            self.add_acc(acc_id)
+
+    def get_pin(self):
+        return self.__pin
+
+    def set_pin(self, pin):
+        self.__pin = pin
+
+    def pin_verify(self):
+        """ Checks PIN entered by the customer with their actual PIN and returns True or False. """
+        pin = ""
+        while len(pin) != 4 or not pin.isdigit():
+            pin = input("Enter your 4-digit PIN: ")
+        print()
+
+        return self.check_pin(pin)
+
+    @metrics.timed("check_pin", outcome=lambda matched: "ok" if matched else "wrong_pin")
+    def check_pin(self, pin):
+        """ Returns True if pin is the customer's PIN. """
+        return pin == self.get_pin()
+
+    def change_pin(self):
+        """ Changes customer's PIN after verifying his current PIN. """
+        print("To change your PIN, we have to verify your current PIN first.")
+        if self.pin_verify():
+            pin = ""
+            while len(pin) != 4 or not pin.isdigit():
+                pin = input("Enter a new 4-digit PIN: ")
+            print()
+            with bank_lock.shared:
+                journal_append("PIN", self.customer_id, pin)
+                self.set_pin(pin)
+        else:
+            print("Wrong PIN entered")
+            print("PIN Remains Unchanged\n")
+
+    def add_acc(self, acc_id):
+        """ Add an account to the customer accounts list. """
+        self.accounts.append(acc_id)
+        acc_id.owner = self
+
+    def remove_account(self, acc):
+        """ Closes one of the customer's Accounts without asking for anything. """
+        with bank_lock.shared:
+            journal_append("CLOSE", self.customer_id, acc.acc_id)
+            self.accounts.remove(acc)
+            acc.owner = None
+
+    def print_balance(self):
+        """ Prints the Account ID, Balance and Type of each account the customer holds. """
+        if self.accounts:
+            print("Accounts:")
+            for acc in self.accounts:
+                print(acc)
+        else:
+            print("You have no accounts!")
+        print()
+
+    def choose_account(self):
+        """
+        Returns the index of the Account that the customer chooses.
+        Has -1 as the return value if the customer decides to cancel choosing instead.
+        """
+        # Prints each account that the customer holds
+        for index in range(len(self.accounts)):
+            print(str(index + 1) + ". " + str(self.accounts[index]))
+        print("\n0. Cancel\n")
+
+        choice = -1
+        # User input should be in the range of total accounts that he holds + 1 (for exit)
+        while not 0 <= choice <= len(self.accounts):
+            print("Which account would you like to choose?")
+            try:
+                choice = int(input())
+            except ValueError:
+                print("Please only enter a number!")
+                continue
+        choice -= 1
+        return choice
+
+    def close_account(self):
+        """ Closes a Customer's Account after verifying his PIN. """
+        if not self.accounts:
+            print("You have no accounts!")
+        else:
+            print("Choose an account to close:\n")
+            choice = self.choose_account()
+
+            # If choice is not exit
+            if choice != -1:
+                print("Please verify your PIN to confirm")
+                if self.pin_verify():
+                    closed = self.accounts[choice]
+                    self.remove_account(closed)
+                    print(closed)
+                    print("Account Closed Successfully")
+                else:
+                    print("Wrong PIN entered")
+                    print("Account Close Unsuccessful. Returning to main menu...")
+        print()
+
+    def __str__(self):
+        """ Returns a string with the Customer ID, Name, Age and a list of accounts that the customer holds. """
+        result = "Customer ID: " + self.customer_id + "\nName: " + self.name + "\nAge: %2d" % self.age + "\nAccounts:\n"
+        if self.accounts:
+            for acc in self.accounts:
+                result += str(acc) + "\n"
+        else:
+            result += "No Accounts\n"
+        return result
+
+
+class Account(object):
+    """ Account class: Stores all information about an account. Has functions to be used for all types of Accounts. """
+
+    def __init__(self, acc_id, balance=0, transactions=None, last_debit=0):
+        self.acc_id = acc_id
+        self.balance = to_money(balance)    # Money
+        if transactions is None:
+            self.transactions = TransactionHistory(acc_id=acc_id)
+        else:
+            self.transactions = transactions
+        self.last_debit = last_debit    # Date ordinal of the last withdraw or transfer from the account, 0 if none
+        self.owner = None               # Customer holding the account, None once it is closed
+        self.lock = threading.Lock()    # Held while the balance is checked and changed
+        self.windows = None             # WindowCounters of the limits, by transaction types and days, made when needed
+
+    def add_transaction(self, transaction, cents=None):
+        """
+        Adds a transaction to the account's history and keeps the date of the last withdraw or transfer, and the counters
+        of the limits, up to date. cents is its amount in cents, if the caller already has it.
+        """
+        if cents is None:
+            cents = to_cents(transaction[4])
+        self.transactions.append(transaction, cents)
+        if cents < 0 and transaction[3] in DEBIT_TYPES:
+            self.last_debit = date_ordinal(transaction[2])
+            if self.windows:
+                for counter in self.windows.values():
+                    if transaction[3] in counter.types:
+                        counter.add(self.last_debit, -cents)
+
+    def window(self, types, days, today):
+        """
+        Returns the WindowCounter of the withdraws or transfers (the types) taken out of the account in the days days up
+        to today (a date ordinal). The first time it is needed it is filled from the transactions in those days, which
+        are only read if the last withdraw or transfer was made in them.
+        """
+        if self.windows is None:
+            self.windows = {}
+        counter = self.windows.get((types, days))
+        if counter is None:
+            counter = WindowCounter(types, days, today)
+            if self.last_debit > today - days:
+                start, end = self.transactions.date_range(today - days + 1, today)
+                for transaction in self.transactions[start:end]:
+                    if transaction[3] in types and transaction[4].startswith("-"):
+                        counter.add(date_ordinal(transaction[2]), -to_cents(transaction[4]))
+            self.windows[(types, days)] = counter
+        counter.advance(today)
+        return counter
+
+    def check_amount(self, amount, action):
+        """ Raises TransactionError if the amount (Money) to deposit, withdraw or transfer (the action) is not positive. """
+        if amount.cents <= 0:
+            raise TransactionError("invalid_amount", "You can only " + action + " a positive value\n")
+
+    def check_debit(self, amount, action, today=None):
+        """
+        Raises TransactionError if amount can not be taken out of the account by the action (withdraw or transfer) on
+        today, a date ordinal, by default the current day.
+        First the limits set for the type of Account are checked (see LIMIT_RULES), then the balance afterwards:
+            Savings Account - It checks if the resultant balance is less than 0.
+            Current Account - It checks if the resultant balance is less than the minimum balance limit.
+        """
+        self.check_amount(amount, action)
+
+        # The limits on withdraws and transfers, such as one every 30 days from a Savings Account
+        rules = limit_rules.get(self.accType)
+        if rules:
+            if today is None:
+                today = date.today().toordinal()
+            trx_type = action.capitalize()
+            for rule in rules:
+                rule.check(self, trx_type, amount, today)
+
+        # If the Account is a Savings Account
+        if isinstance(self, SavingAccount):
+            # If the balance afterwards is less than 0
+            if self.balance.cents - amount.cents < 0:
+                raise TransactionError("insufficient_funds", "Sorry, you can't " + action + " that much")
+
+        # If the Account is a Checking Account
+        if isinstance(self, CheckingAccount):
+            # If the balance afterwards is less than the minimum balance limit
+            if self.balance - amount < self.minimum_balance:
+                raise TransactionError("insufficient_funds", "Sorry, you can't " + action + " that much")
+
+    @metrics.timed("deposit")
+    def post_deposit(self, amount):
+        """ Deposits amount into an account without printing anything. Returns the transaction or raises TransactionError. """
+        amount = to_money(amount)
+        self.check_amount(amount, "deposit")
+
+        with bank_lock.shared, self.lock:
+            return self.apply_deposit(amount, str(date.today()))
+
+    @metrics.timed("withdraw")
+    def post_withdraw(self, amount):
+        """ Withdraws amount from an account without printing anything. Returns the transaction or raises TransactionError. """
+        amount = to_money(amount)
+        with bank_lock.shared, self.lock:
+            return self.apply_withdraw(amount, str(date.today()))
+
+    @metrics.timed("transfer")
+    def post_transfer(self, amount, receiver_acc):
+        """
+        Transfers amount from one account (self) into another account (receiver account) without printing anything.
+        Returns the transactions of both accounts or raises TransactionError.
+        Both accounts are locked in order of Account ID, so two opposite transfers can never wait on each other.
+        """
+        amount = to_money(amount)
+        if receiver_acc is self:
+            raise TransactionError("same_account", "You can't transfer to the same account")
+        if self.acc_id < receiver_acc.acc_id:
+            first, second = self, receiver_acc
+        else:
+            first, second = receiver_acc, self
+
+        with bank_lock.shared, first.lock, second.lock:
+            return self.apply_transfer(amount, receiver_acc, str(date.today()))
+
+    # The apply_ methods make a change dated today (a date string such as "2021-12-18") once the caller holds the locks:
+    # bank_lock shared and the lock of each Account, as the post_ methods do, or bank_lock exclusively, as batch.py does.
+
+    def apply_deposit(self, amount, today):
+        """ Deposits amount (positive Money) into the account. Returns the transaction. """
+        transaction = (get_next_trx_id(), self.acc_id, today, "Deposit", format_cents(amount.cents))
+        journal_append("TRX", *transaction)
+        self.add_transaction(transaction, amount.cents)
+
+        self.balance += amount
+        return transaction
+
+    def apply_withdraw(self, amount, today):
+        """ Withdraws amount (Money) from the account if check_debit allows it. Returns the transaction or raises TransactionError. """
+        self.check_debit(amount, "withdraw", date_ordinal(today))
+
+        transaction = (get_next_trx_id(), self.acc_id, today, "Withdraw", format_cents(-amount.cents))
+        journal_append("TRX", *transaction)
+        self.add_transaction(transaction, -amount.cents)
+
+        self.balance -= amount
+        return transaction
+
+    def apply_transfer(self, amount, receiver_acc, today):
+        """
+        Transfers amount (Money) from the account into the receiver account, another one, if check_debit allows it.
+        Returns the transactions of both accounts or raises TransactionError.
+        """
+        self.check_debit(amount, "transfer", date_ordinal(today))
+
+        # Both IDs are taken in one step, so the side received is always numbered right after the side sent
+        sent_id, received_id = transaction_ids.next_ids(2)
+        sent = (sent_id, self.acc_id, today, "Transfer", format_cents(-amount.cents))
+        received = (received_id, receiver_acc.acc_id, today, "Transfer", format_cents(amount.cents))
+
+        # Both sides of the transfer are journaled as one record so that it is never half applied
+        journal_append("TRX", *(sent + received))
+
+        # Update transactions for the current account and the receiver's account
+        self.add_transaction(sent, -amount.cents)
+        receiver_acc.add_transaction(received, amount.cents)
+
+        self.balance -= amount          # Remove from current account
+        receiver_acc.balance += amount  # Add to receiver's account
+        return sent, received
+
+    def deposit(self, amount):
+        """ Deposits amount into an account. """
+        try:
+            self.post_deposit(amount)
+        except TransactionError as error:
+            print(error)
+            return
+
+        print("Deposit Successful")
+
+    def withdraw(self, amount):
+        """ Withdraws amount from an account, if the rules for the type of Account allow it (see check_debit). """
+        try:
+            self.post_withdraw(amount)
+        except TransactionError as error:
+            print(error)
+            return
+
+        print("Withdrawal Successful")
+
+    def transfer(self, amount, receiver_acc):
+        """ Transfers amount from one account (self) into another account (receiver account). """
+        try:
+            self.post_transfer(amount, receiver_acc)
+        except TransactionError as error:
+            print(error)
+            return
+
+        print("Transfer Successful")
+
+    def print_transactions(self):
+        """ Prints the last 5 transactions done by the Account. """
+        if len(self.transactions) == 0:
+            print("No Transactions on this Account")
+            print("\nCurrent Balance: %.2f" % self.balance)
+            return
+
+        print("Account ID: " + self.acc_id)
+        print()
+        print("Transactions:")
+        for transaction in storage.history(self, 5):
+            print("TRXID: " + transaction[0] +
+                  " | Date: " + transaction[2] +
+                  " | Type: {:8}".format(transaction[3]) +
+                  " | Amount: {:>8}".format(transaction[4]))
+
+        print("\nCurrent Balance: %.2f" % self.balance)
+
+    def statement(self, first, last):
+        """ Returns the Statement of the transactions made from the first to the last day, given as dates such as "2021-12-18". """
+        with self.lock:
+            return Statement(self, date_ordinal(first), date_ordinal(last))
+
+    def print_statement(self, first, last):
+        """ Prints the statement from the first to the last day a page at a time, asking before each next page. """
+        statement = self.statement(first, last)
+
+        print("Account ID: " + self.acc_id)
+        print("Statement from " + first + " to " + last)
+        print("\nOpening Balance: %.2f" % statement.opening_balance)
+
+        if len(statement) == 0:
+            print("\nNo Transactions in this period")
+        for number in range(statement.pages()):
+            if number > 0 and input("Press Enter for the next page or q to stop: ") == "q":
+                break
+            print()
+            for transaction in statement.page(number):
+                print("TRXID: " + transaction[0] +
+                      " | Date: " + transaction[2] +
+                      " | Type: {:8}".format(transaction[3]) +
+                      " | Amount: {:>8}".format(transaction[4]))
+
+        print("\nClosing Balance: %.2f" % statement.closing_balance)
+
+    def __add__(self, param):
+        """ Add param to the account balance. Allows Money, int and float as the parameter. """
+        try:
+            self.balance += to_money(param)
+        except TypeError:
+            print("Wrong Type")
+            raise
+
+    def __radd__(self, param):
+        """ Add param to the account balance. Allows Money, int and float as the parameter. """
+        try:
+            self.balance += to_money(param)
+        except TypeError:
+            print("Wrong Type")
+            raise
+
+    def __sub__(self, param):
+        """ Remove param from the account balance. Allows Money, int and float as the parameter. """
+        try:
+            self.balance -= to_money(param)
+        except TypeError:
+            print("Wrong Type")
+            raise
+
+    def __rsub__(self, param):
+        """ Remove param from the account balance. Allows Money, int and float as the parameter. """
+        try:
+            self.balance -= to_money(param)
+        except TypeError:
+            print("Wrong Type")
+            raise
+
+    def __eq__(self, param):
+        """ Compare two account objects for equality based on Account ID, return Boolean. """
+        if isinstance(param, Account):
+            return self.acc_id == param.acc_id
+        else:
+            print("Wrong Type")
+            raise TypeError
+
+    def __str__(self):
+        """ Returns a string with the Account ID and Balance. """
+        result = "ID: " + self.acc_id + " | Balance: %9.2f" % self.balance
+        return result
+
+
+class SavingAccount(Account):
+    """ SavingAccount class: Subclass of Account. Has functions to be used for a Savings Account. """
+
+    def __init__(self, acc_id, balance=0, transactions=None, last_debit=0):
+        Account.__init__(self, acc_id, balance, transactions, last_debit)
+        self.accType = "Savings"
+
+    def __str__(self):
+        """ Returns a string with the Account ID, Balance and Account Type. """
+        result = Account.__str__(self) + " | Type: " + self.accType
+        return result
+
+
+class CheckingAccount(Account):
+    """ CheckingAccount class: Subclass of Account. Has functions to be used for a Checking Account. """
+
+    def __init__(self, acc_id, balance=0, transactions=None, minimum_balance=-1000, last_debit=0):
+        Account.__init__(self, acc_id, balance, transactions, last_debit)
+        self.accType = "Checking"
+        self.minimum_balance = to_money(minimum_balance)
+
+    def __str__(self):
+        """ Returns a string with the Account ID, Balance and Account Type. """
+        result = Account.__str__(self) + " | Type: " + self.accType
+        return result
+
+
+@lru_cache(maxsize=4096)
+def date_string(ordinal):
+    """ Returns the date with the given ordinal as a string such as "2021-12-18". """
+    return str(date.fromordinal(ordinal))
+
+
+@lru_cache(maxsize=4096)
+def date_ordinal(text):
+    """ Returns the ordinal of a date string such as "2021-12-18". """
+    return date.fromisoformat(text).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def to_cents(amount):
+    """ Converts an amount string such as "+1000.0" into a whole number of cents. """
+    return round(float(amount) * 100)
+
+
+@lru_cache(maxsize=4096)
+def format_cents(cents):
+    """ Formats a whole number of cents as a signed amount string such as "+1000.00". """
+    if cents < 0:
+        return "-%d.%02d" % divmod(-cents, 100)
+    return "+%d.%02d" % divmod(cents, 100)
+
+
+class Money(object):
+    """
+    Money class: An amount of money held as a whole number of cents, so that balances and sums of transactions are exact.
+    Money values never change; adding or subtracting another Money returns a new one. Other types are not mixed in,
+    convert them first with to_money, or Money(to_cents(text)) for amount strings. float() and "%.2f" give the amount in
+    pounds and str() gives it such as "-12.50".
+    """
+    __slots__ = ("cents",)
+
+    def __init__(self, cents=0):
+        self.cents = cents
+
+    def __add__(self, other):
+        if other.__class__ is Money:
+            return Money(self.cents + other.cents)
+        return NotImplemented
+
+    def __radd__(self, other):
+        # sum() starts from 0
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other):
+        if other.__class__ is Money:
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __eq__(self, other):
+        if other.__class__ is Money:
+            return self.cents == other.cents
+        return NotImplemented
+
+    def __lt__(self, other):
+        if other.__class__ is Money:
+            return self.cents < other.cents
+        return NotImplemented
+
+    def __le__(self, other):
+        if other.__class__ is Money:
+            return self.cents <= other.cents
+        return NotImplemented
+
+    def __gt__(self, other):
+        if other.__class__ is Money:
+            return self.cents > other.cents
+        return NotImplemented
+
+    def __ge__(self, other):
+        if other.__class__ is Money:
+            return self.cents >= other.cents
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __format__(self, spec):
+        if spec:
+            return format(self.cents / 100, spec)
+        return str(self)
+
+    def __str__(self):
+        return format_cents(self.cents).lstrip("+")
+
+    def __repr__(self):
+        return "Money('" + str(self) + "')"
+
+
+def to_money(value):
+    """ Returns an amount given as Money, an int or a float (in pounds) as Money. Raises TypeError for anything else. """
+    if value.__class__ is Money:
+        return value
+    if value.__class__ is int or value.__class__ is float:
+        return Money(round(value * 100))
+    raise TypeError("Money can not be made from " + type(value).__name__)
+
+
+class WindowCounter(object):
+    """
+    WindowCounter class: Number and total in cents of the withdraws or transfers (the types) taken out of an Account in
+    the last days days, kept in a ring of one bucket per day. The buckets of the days leaving the window are emptied as
+    it moves on, so counting a transaction and reading the totals take the same time however long the history is.
+    """
+    __slots__ = ("types", "days", "today", "counts", "totals", "count", "total")
+
+    def __init__(self, types, days, today):
+        self.types = types
+        self.days = days
+        self.today = today          # Date ordinal of the last day in the window
+        self.counts = [0] * days    # Bucket of each day, at its ordinal modulo days
+        self.totals = [0] * days
+        self.count = 0
+        self.total = 0
+
+    def advance(self, today):
+        """ Moves the window on to end on today, emptying the buckets of the days that leave it. """
+        if today <= self.today:
+            return
+        for day in range(self.today + 1, min(today, self.today + self.days) + 1):
+            bucket = day % self.days
+            self.count -= self.counts[bucket]
+            self.total -= self.totals[bucket]
+            self.counts[bucket] = 0
+            self.totals[bucket] = 0
+        self.today = today
+
+    def add(self, ordinal, cents):
+        """ Counts a transaction of cents (taken out, so positive) made on the day with the given ordinal. """
+        self.advance(ordinal)
+        if ordinal <= self.today - self.days:
+            return
+        bucket = ordinal % self.days
+        self.counts[bucket] += 1
+        self.totals[bucket] += cents
+        self.count += 1
+        self.total += cents
+
+
+def period(days):
+    """ Returns a number of days in words, as in "3 times a week". """
+    if days == 1:
+        return "a day"
+    if days == 7:
+        return "a week"
+    return "every %d days" % days
+
+
+class LimitRule(object):
+    """
+    LimitRule class: A limit on the withdraws or transfers (the types) of one type of Account. Subclasses check one kind
+    of limit; a LimitRule itself allows everything. A broken limit raises TransactionError with the reason and message,
+    made up from the limit if not given.
+    """
+
+    def __init__(self, types, reason, message=None):
+        self.types = tuple(types)
+        self.reason = reason
+        self.message = message
+
+    def check(self, acc, trx_type, amount, today):
+        """ Raises TransactionError if taking amount (Money) out of acc by trx_type today (a date ordinal) breaks the limit. """
+        pass
+
+    def fail(self, message):
+        raise TransactionError(self.reason, self.message or message)
+
+
+class AmountLimit(LimitRule):
+    """ AmountLimit class: Subclass of LimitRule. At most limit (Money) in one transaction. """
+
+    def __init__(self, types, limit, reason="amount_limit", message=None):
+        LimitRule.__init__(self, types, reason, message)
+        self.limit = limit
+
+    def check(self, acc, trx_type, amount, today):
+        if trx_type in self.types and amount.cents > self.limit.cents:
+            self.fail("Sorry, you can't " + trx_type.lower() + " more than " + str(self.limit) + " at once")
+
+
+class CountLimit(LimitRule):
+    """ CountLimit class: Subclass of LimitRule. At most count transactions in any days days in a row. """
+
+    def __init__(self, types, count, days, reason="count_limit", message=None):
+        LimitRule.__init__(self, types, reason, message)
+        self.count = count
+        self.days = days
+
+    def check(self, acc, trx_type, amount, today):
+        if trx_type in self.types and acc.window(self.types, self.days, today).count >= self.count:
+            times = "once " if self.count == 1 else "%d times " % self.count
+            self.fail("You can only " + " or ".join(self.types).lower() + " " + times + period(self.days))
+
+
+class TotalLimit(LimitRule):
+    """ TotalLimit class: Subclass of LimitRule. At most limit (Money) in all in any days days in a row. """
+
+    def __init__(self, types, limit, days, reason="total_limit", message=None):
+        LimitRule.__init__(self, types, reason, message)
+        self.limit = limit
+        self.days = days
+
+    def check(self, acc, trx_type, amount, today):
+        if trx_type in self.types and acc.window(self.types, self.days, today).total + amount.cents > self.limit.cents:
+            self.fail("Sorry, you can't " + trx_type.lower() + " more than " + str(self.limit) + " " + period(self.days))
+
+
+# Limits of each type of Account unless limits.txt sets others
+LIMIT_RULES = {
+    "Savings": [CountLimit(DEBIT_TYPES, 1, 30, reason="savings_limit",
+                           message="You have already Withdrawn or Transferred this month.\n"
+                                   "You can only Withdraw or Transfer once every 30 days in a Savings Account")],
+    "Checking": [],
+}
+limit_rules = dict(LIMIT_RULES)     # Global variable holding the limits in use, by type of Account
+LIMIT_KINDS = {"amount": (AmountLimit, 1), "count": (CountLimit, 2), "total": (TotalLimit, 2)}   # Class and number of values
+
+
+def load_limits(path):
+    """
+    Reads the limits of each type of Account named in the file, which replace its LIMIT_RULES. One limit a line:
+        <account type> amount <types> <limit>         -  At most limit in one transaction
+        <account type> count <types> <count> <days>   -  At most count transactions in any days days in a row
+        <account type> total <types> <limit> <days>   -  At most limit in all in any days days in a row
+    The types are Withdraw, Transfer or Withdraw,Transfer. Lines starting with # are ignored. Windows are at most
+    LIMIT_WINDOW_DAYS long. Returns False, keeping the limits as they were, if a line is not a valid limit.
+    """
+    try:
+        limits_file = open(path, "r")
+    except IOError:
+        return True
+
+    rules = {}
+    for line in limits_file:
+        record = line.split()
+        if not record or record[0].startswith("#"):
+            continue
+        try:
+            rule_class, size = LIMIT_KINDS[record[1]]
+            types = record[2].split(",")
+            if record[0] not in ACCOUNT_TYPES or len(record) != 3 + size or \
+                    any(trx_type not in DEBIT_TYPES for trx_type in types):
+                raise ValueError
+            if rule_class is CountLimit:
+                arguments = (int(record[3]), int(record[4]))
+            else:
+                arguments = (Money(to_cents(record[3])),) + tuple(int(days) for days in record[4:])
+            if rule_class is not AmountLimit and not 0 < arguments[1] <= LIMIT_WINDOW_DAYS:
+                raise ValueError
+        except (KeyError, IndexError, ValueError):
+            print("Limit not understood: " + line.strip())
+            limits_file.close()
+            return False
+        rules.setdefault(record[0], []).append(rule_class(types, *arguments))
+    limits_file.close()
+
+    limit_rules.clear()
+    limit_rules.update(LIMIT_RULES)
+    limit_rules.update(rules)
+    return True
+
+
+class IdAllocator(object):
+    """
+    IdAllocator class: Hands out IDs made of a prefix and a rising number, such as "AC001".
+    Numbers are padded to width digits and simply grow wider once they need more. Safe to use from several threads.
+    """
+
+    def __init__(self, prefix, width=3):
+        self.prefix = prefix
+        self.pattern = prefix + "{:0%d}" % width
+        self.last = 0                   # Highest number handed out or seen so far
+        self.lock = threading.Lock()
+
+    def format(self, number):
+        """ Returns the ID for a number. """
+        return self.pattern.format(number)
+
+    def number(self, id_string):
+        """ Returns the number of an ID. """
+        return int(id_string[len(self.prefix):])
+
+    def next(self):
+        """ Returns a new ID. """
+        with self.lock:
+            self.last += 1
+            return self.pattern.format(self.last)
+
+    def next_ids(self, count):
+        """ Returns count new IDs with consecutive numbers, such as the two sides of a transfer. """
+        with self.lock:
+            first = self.last + 1
+            self.last += count
+        return [self.pattern.format(number) for number in range(first, first + count)]
+
+    def reserve(self, count):
+        """
+        Claims count IDs in one step and returns the range of their numbers, see format().
+        The new high-water mark is journaled first, so the numbers are never handed out again even if they go unused.
+        """
+        with self.lock:
+            first = self.last + 1
+            journal_append("IDS", self.prefix, str(self.last + count))
+            self.last += count
+        return range(first, first + count)
+
+    def observe(self, number):
+        """ Makes sure a number that is already in use is never handed out. """
+        with self.lock:
+            if number > self.last:
+                self.last = number
+
+
+customer_ids = IdAllocator("C")
+account_ids = IdAllocator("AC")
+transaction_ids = IdAllocator("TRX")
+ALLOCATORS = [customer_ids, account_ids, transaction_ids]
+
+
+class NameIndex(object):
+    """
+    NameIndex class: The customers sorted by name, so those whose names start with some letters are found with bisect.
+    Names are compared without regard to case.
+    """
+
+    def __init__(self):
+        self.keys = []      # (lower case name, Customer ID) of each customer, sorted
+        self.lock = threading.Lock()
+
+    def rebuild(self, customers):
+        """ Indexes every customer in the dictionary, replacing what was indexed before. """
+        keys = sorted((customers[key].name.lower(), key) for key in customers)
+        with self.lock:
+            self.keys = keys
+
+    def add(self, customer):
+        """ Indexes a new customer. """
+        with self.lock:
+            insort(self.keys, (customer.name.lower(), customer.customer_id))
+
+    def search(self, prefix, page=0, size=CUSTOMER_PAGE_SIZE):
+        """
+        Returns the IDs of the customers on a page of those whose names start with prefix, counting pages from 0,
+        and the number of customers found in all.
+        """
+        prefix = prefix.lower()
+        with self.lock:
+            first = bisect_left(self.keys, (prefix,))
+            end = bisect_left(self.keys, (prefix + "\U0010ffff",))
+            start = first + page * size
+            return [key[1] for key in self.keys[start:min(start + size, end)]], end - first
+
+
+name_index = NameIndex()
+
+
+def write_ids_file(path):
+    """ Writes the high-water mark of each IdAllocator to a file, one "<prefix> <number>" per line. """
+    ids_file = open(path, "w")
+    for allocator in ALLOCATORS:
+        print(allocator.prefix + " %d" % allocator.last, file=ids_file)
+    ids_file.flush()
+    os.fsync(ids_file.fileno())
+    ids_file.close()
+
+
+def load_ids_file(path):
+    """ Raises the high-water mark of each IdAllocator to the one saved in the file, if there is one. """
+    try:
+        ids_file = open(path, "r")
+    except IOError:
+        return
+
+    allocators = {allocator.prefix: allocator for allocator in ALLOCATORS}
+    for line in ids_file:
+        record = line.split()
+        if record and record[0] in allocators:
+            allocators[record[0]].observe(int(record[1]))
+    ids_file.close()
+
+
+class Ledger(object):
+    """
+    Ledger class: Compact list of one Account's transactions, stored column by column in arrays.
+    Each entry reads back as the same tuple of strings as a line of accountsTransactions.txt.
+    """
+    __slots__ = ("acc_id", "numbers", "dates", "types", "cents")
+
+    def __init__(self, acc_id=None):
+        self.acc_id = acc_id
+        self.numbers = array("q")   # Transaction IDs without the "TRX" prefix
+        self.dates = array("i")     # Date ordinals
+        self.types = array("B")     # Index of the type in TRANSACTION_TYPES
+        self.cents = array("q")     # Signed amounts in cents
+
+    def add(self, number, ordinal, trx_type, cents):
+        """ Adds a transaction given by its columns. """
+        self.numbers.append(number)
+        self.dates.append(ordinal)
+        self.types.append(trx_type)
+        self.cents.append(cents)
+
+    def append(self, transaction, cents=None):
+        """ Adds a transaction given as a tuple of strings. cents is its amount in cents, if the caller already has it. """
+        if self.acc_id is None:
+            self.acc_id = transaction[1]
+        self.numbers.append(int(transaction[0][3:]))
+        self.dates.append(date_ordinal(transaction[2]))
+        self.types.append(TRANSACTION_CODES[transaction[3]])
+        self.cents.append(to_cents(transaction[4]) if cents is None else cents)
+
+    def total(self):
+        """ Returns the sum of all the amounts in cents. """
+        return sum(self.cents)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        return (transaction_ids.format(self.numbers[index]), self.acc_id, date_string(self.dates[index]),
+                TRANSACTION_TYPES[self.types[index]], format_cents(self.cents[index]))
+
+    def __iter__(self):
+        for index in range(len(self.numbers)):
+            yield self[index]
+
+
+EMPTY_LEDGER = Ledger()     # Shared by every history with no new transactions, never added to
+
+
+class ArchiveBlock(object):
+    """ ArchiveBlock class: Where a block of an Account's archived transactions is, with the summary of it kept in the block index. """
+    __slots__ = ("acc_id", "path", "compression", "offset", "length", "count", "first", "last", "total")
+
+    def __init__(self, acc_id, path, compression, offset, length, count, first, last, total):
+        self.acc_id = acc_id
+        self.path = path                # Archive segment holding the block
+        self.compression = compression  # Name from ARCHIVE_COMPRESSION
+        self.offset = offset            # Position and size of the compressed block in the segment
+        self.length = length
+        self.count = count              # Number of transactions
+        self.first = first              # Date ordinals of the first and last transaction
+        self.last = last
+        self.total = total              # Sum of the amounts in cents
+
+    def read(self):
+        """ Returns the Ledger of the block's transactions, decompressing it only if it is not cached. """
+        return read_archive_block(self.acc_id, self.path, self.compression, self.offset, self.length, self.count)
+
+
+@lru_cache(maxsize=ARCHIVE_CACHE_SIZE)
+def read_archive_block(acc_id, path, compression, offset, length, count):
+    """ Reads and decompresses one block of an archive segment into a Ledger. """
+    archive_file = open(path, "rb")
+    archive_file.seek(offset)
+    data = archive_file.read(length)
+    archive_file.close()
+    if compression == "lzma":
+        data = lzma.decompress(data)
+    else:
+        data = zlib.decompress(data)
+
+    transactions = Ledger(acc_id)
+    transactions.numbers.frombytes(data[:8 * count])
+    transactions.dates.frombytes(data[8 * count:12 * count])
+    transactions.types.frombytes(data[12 * count:13 * count])
+    transactions.cents.frombytes(data[13 * count:])
+    return transactions
+
+
+class ArchivedHistory(object):
+    """
+    ArchivedHistory class: The archived transactions of an Account, in blocks of archive segments.
+    The number and total of the transactions in each block come from the block index, so counting transactions by date
+    and adding up amounts only decompress the blocks at the edges of a range.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.starts = array("q")    # Index of the first transaction of each block
+        self.lasts = array("i")     # Date ordinal of the last transaction of each block
+        self.count = 0              # Carried forward: number of archived transactions and their total in cents
+        self.total = 0
+
+    def add_block(self, block):
+        """ Adds a block of transactions after all the others. """
+        self.blocks.append(block)
+        self.starts.append(self.count)
+        self.lasts.append(block.last)
+        self.count += block.count
+        self.total += block.total
+
+    def count_before(self, ordinal, search=bisect_left):
+        """ Returns the number of transactions whose date comes before ordinal, or up to it with search=bisect_right. """
+        number = search(self.lasts, ordinal)    # Blocks that lie entirely before
+        if number == len(self.blocks):
+            return self.count
+        block = self.blocks[number]
+        if search([block.first], ordinal) == 0:
+            return self.starts[number]
+        return self.starts[number] + search(block.read().dates, ordinal)
+
+    def total_between(self, start, end):
+        """ Returns the sum in cents of the amounts of the transactions from index start up to (not including) end. """
+        total = 0
+        for number, block in enumerate(self.blocks):
+            first = self.starts[number]
+            if first >= end or first + block.count <= start:
+                continue
+            if start <= first and first + block.count <= end:
+                total += block.total
+            else:
+                total += sum(block.read().cents[max(start - first, 0):end - first])
+        return total
+
+    def ledgers(self):
+        """ Yields the Ledger of each block in turn. """
+        for block in self.blocks:
+            yield block.read()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        number = bisect_right(self.starts, index) - 1
+        return self.blocks[number].read()[index - self.starts[number]]
+
+
+EMPTY_ARCHIVE = ArchivedHistory()   # Shared by every history with no archived transactions, never added to
+
+
+class TransactionHistory(object):
+    """
+    TransactionHistory class: The list of an Account's transactions.
+    Archived transactions come first and are read a block at a time from the archive segments. Transactions stored in
+    the snapshot are only read when first needed and are then kept in the history cache, transactions made since the
+    snapshot was written are always kept in memory.
+    """
+
+    def __init__(self, source=None, key=None, stored=0, acc_id=None):
+        self.acc_id = acc_id
+        self.source = source        # Source that the stored transactions are read from
+        self.key = key              # Where the stored transactions are in the source
+        self.stored = stored        # Number of stored transactions
+        self.new = EMPTY_LEDGER     # Transactions made since the snapshot was written, a Ledger of its own once there are any
+        self.archive = EMPTY_ARCHIVE    # Transactions moved to the archive
+
+    def stored_transactions(self):
+        """ Returns the Ledger of stored transactions, reading it through the history cache. """
+        if self.stored == 0:
+            return Ledger(self.acc_id)
+        return history_cache.get(self)
+
+    def ledgers(self):
+        """
+        Returns the Ledgers of stored and new transactions, the ones a snapshot holds. Stored ones that are not cached
+        are read but not cached.
+        """
+        if self.stored == 0:
+            return [self.new]
+        stored = history_cache.peek(self)
+        if stored is None:
+            stored = self.source.read(self.key)
+        return [stored, self.new]
+
+    def total_cents(self):
+        """ Returns the sum of the amounts of all the transactions in cents. """
+        return self.archive.total + sum(ledger.total() for ledger in self.ledgers())
+
+    def hot_length(self):
+        """ Returns the number of transactions that are not archived, the ones a snapshot holds. """
+        return self.stored + len(self.new)
+
+    def append(self, transaction, cents=None):
+        """ Adds a new transaction to the end of the history, see Ledger.append. """
+        if self.new is EMPTY_LEDGER:
+            self.new = Ledger(self.acc_id)
+        self.new.append(transaction, cents)
+
+    def add(self, number, ordinal, trx_type, cents):
+        """ Adds a new transaction given by its columns to the end of the history, see Ledger.add. """
+        if self.new is EMPTY_LEDGER:
+            self.new = Ledger(self.acc_id)
+        self.new.add(number, ordinal, trx_type, cents)
+
+    def date_range(self, first, last):
+        """
+        Returns the indexes (start, end) of the transactions dated from the first to the last date ordinal.
+        Transactions are added in date order, so each Ledger's dates are sorted and can be searched with bisect.
+        """
+        ledgers = [self.stored_transactions(), self.new]
+        start = self.archive.count_before(first) + sum(bisect_left(ledger.dates, first) for ledger in ledgers)
+        end = self.archive.count_before(last, bisect_right) + sum(bisect_right(ledger.dates, last) for ledger in ledgers)
+        return start, end
+
+    def last_date(self):
+        """
+        Returns the date ordinal of the last transaction, or 0 if there are none. If the stored transactions are not
+        cached only the last one is read from the source.
+        """
+        if len(self.new):
+            return self.new.dates[-1]
+        if self.stored:
+            stored = history_cache.peek(self)
+            if stored is None:
+                return self.source.last_date(self.key)
+            return stored.dates[-1]
+        if self.archive.count:
+            return self.archive.lasts[-1]
+        return 0
+
+    def total_between(self, start, end):
+        """ Returns the sum in cents of the amounts of the transactions from index start up to (not including) end. """
+        total = self.archive.total_between(start, end)
+        offset = self.archive.count
+        for ledger in (self.stored_transactions(), self.new):
+            total += sum(ledger.cents[max(start - offset, 0):max(end - offset, 0)])
+            offset += len(ledger)
+        return total
+
+    def rebase(self, source, key):
+        """ Points the history at a new snapshot which holds all of its transactions. """
+        history_cache.discard(self)
+        self.stored = self.hot_length()
+        self.source = source
+        self.key = key
+        self.new = EMPTY_LEDGER
+
+    def __len__(self):
+        return self.archive.count + self.stored + len(self.new)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("transaction index out of range")
+
+        if index < self.archive.count:
+            return self.archive[index]
+        index -= self.archive.count
+        if index < self.stored:
+            return self.stored_transactions()[index]
+        return self.new[index - self.stored]
+
+    def __iter__(self):
+        # A full pass reads the stored transactions without caching them, so it does not push out the histories in use
+        for ledger in self.archive.ledgers():
+            yield from ledger
+        for ledger in self.ledgers():
+            yield from ledger
+
+
+class Statement(object):
+    """
+    Statement class: The transactions of an Account dated between two days, with its balance before and after them.
+    The transactions are found by date with bisect and are only read a page at a time.
+    """
+
+    def __init__(self, acc, first, last):
+        self.acc_id = acc.acc_id
+        self.first = first      # Date ordinal of the first day
+        self.last = last        # Date ordinal of the last day
+        self.transactions = acc.transactions
+        self.start, self.end = self.transactions.date_range(first, last)
+        # A last day before the first day gives an empty statement
+        self.end = max(self.end, self.start)
+
+        # The closing balance is the current one less everything after the range
+        closing = acc.balance.cents - self.transactions.total_between(self.end, len(self.transactions))
+        self.closing_balance = Money(closing)
+        self.opening_balance = Money(closing - self.transactions.total_between(self.start, self.end))
+
+    def page(self, number, size=STATEMENT_PAGE_SIZE):
+        """ Returns the transactions on a page of the statement, counting pages from 0. """
+        start = self.start + number * size
+        return self.transactions[start:min(start + size, self.end)]
+
+    def pages(self, size=STATEMENT_PAGE_SIZE):
+        """ Returns the number of pages of the statement. """
+        return (len(self) + size - 1) // size
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class HistoryCache(object):
+    """ HistoryCache class: Keeps the stored transactions of the most recently used Account histories in memory. """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.histories = OrderedDict()  # TransactionHistory to its Ledger of stored transactions, least recently used first
+        self.lock = threading.Lock()
+
+    def get(self, history):
+        """ Returns the stored transactions of the history, reading them from its source if they are not cached. """
+        with self.lock:
+            if history in self.histories:
+                self.histories.move_to_end(history)
+                return self.histories[history]
+
+        # Read without holding the lock, so other threads can use the cache in the meantime
+        transactions = history.source.read(history.key)
+
+        with self.lock:
+            transactions = self.histories.setdefault(history, transactions)
+
+            # Evict the least recently used histories
+            while len(self.histories) > self.capacity:
+                self.histories.popitem(last=False)
+        return transactions
+
+    def peek(self, history):
+        """ Returns the stored transactions of the history if they are cached, otherwise None. """
+        return self.histories.get(history)
+
+    def discard(self, history):
+        """ Removes the history from the cache. """
+        with self.lock:
+            self.histories.pop(history, None)
+
+    def clear(self):
+        """ Removes every history from the cache. """
+        with self.lock:
+            self.histories.clear()
+
+
+history_cache = HistoryCache(HISTORY_CACHE_SIZE)
+
+
+class TextSource(object):
+    """ TextSource class: Reads stored transactions from accountsTransactions.txt by the byte offset of each line. """
+
+    def __init__(self, path="accountsTransactions.txt"):
+        self.path = path
+
+    def read(self, offsets):
+        """ Returns a Ledger of the transactions at the given offsets. """
+        transactions = Ledger()
+        transactions_file = open(self.path, "rb")
+        for offset in offsets:
+            transactions_file.seek(offset)
+            transactions.append(transactions_file.readline().decode().split())
+        transactions_file.close()
+        return transactions
+
+    def last_date(self, offsets):
+        """ Returns the date ordinal of the last of the transactions at the given offsets. """
+        transactions_file = open(self.path, "rb")
+        transactions_file.seek(offsets[-1])
+        record = transactions_file.readline().split()
+        transactions_file.close()
+        return date_ordinal(record[2].decode())
+
+    def location(self):
+        """ Returns the kind of source and its file, so that another process can open it again. """
+        return ("text", self.path)
+
+    def close(self):
+        pass
+
+
+class BinarySource(object):
+    """ BinarySource class: Reads stored transactions from a memory mapped binary snapshot. """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        magic, version, unused, n_strings, text_size, self.n_customers, self.n_accounts, self.n_transactions, \
+            self.last_trx = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC or version not in [4, SNAPSHOT_VERSION]:
+            self.close()
+            raise ValueError("unsupported snapshot file")
+        self.version = version
+        self.account_record = SNAPSHOT_ACCOUNT if version == SNAPSHOT_VERSION else SNAPSHOT_ACCOUNT_V4
+
+        # Rebuild the string table
+        position = SNAPSHOT_HEADER.size
+        offsets = struct.unpack_from("<%dI" % (n_strings + 1), self.map, position)
+        position += 4 * (n_strings + 1)
+        text = self.map[position:position + text_size].decode()
+        self.strings = [text[offsets[index]:offsets[index + 1]] for index in range(n_strings)]
+
+        # Where each kind of record starts
+        self.customers_start = position + text_size
+        self.accounts_start = self.customers_start + self.n_customers * SNAPSHOT_CUSTOMER.size
+        self.numbers_start = self.accounts_start + self.n_accounts * self.account_record.size
+        self.dates_start = self.numbers_start + 8 * self.n_transactions
+        self.types_start = self.dates_start + 4 * self.n_transactions
+        self.cents_start = self.types_start + self.n_transactions
+
+    def customers(self):
+        """ Returns an iterator over the Customer records. """
+        return SNAPSHOT_CUSTOMER.iter_unpack(self.view[self.customers_start:self.accounts_start])
+
+    def customer(self, number):
+        """ Returns the Customer record at a position, counting from 0. """
+        return SNAPSHOT_CUSTOMER.unpack_from(self.map, self.customers_start + number * SNAPSHOT_CUSTOMER.size)
+
+    def accounts(self):
+        """ Returns an iterator over the Account records, with the balance in cents. """
+        records = self.account_record.iter_unpack(self.view[self.accounts_start:self.numbers_start])
+        if self.version == SNAPSHOT_VERSION:
+            return records
+
+        # Version 4 snapshots are read as they are and written in the current version at the next save
+        return ((acc_id, owner, acc_type, round(balance * 100), first, count, last_debit)
+                for acc_id, owner, acc_type, balance, first, count, last_debit in records)
+
+    def read(self, key):
+        """ Returns a Ledger of an Account's transactions. key is the Account ID, its first transaction and their number. """
+        acc_id, first, count = key
+        transactions = Ledger(acc_id)
+
+        # Each column is copied straight from the memory map into its array
+        transactions.numbers.frombytes(self.view[self.numbers_start + 8 * first:self.numbers_start + 8 * (first + count)])
+        transactions.dates.frombytes(self.view[self.dates_start + 4 * first:self.dates_start + 4 * (first + count)])
+        transactions.types.frombytes(self.view[self.types_start + first:self.types_start + first + count])
+        transactions.cents.frombytes(self.view[self.cents_start + 8 * first:self.cents_start + 8 * (first + count)])
+
+        # The snapshot is little-endian
+        if sys.byteorder == "big":
+            for column in (transactions.numbers, transactions.dates, transactions.cents):
+                column.byteswap()
+        return transactions
+
+    def last_date(self, key):
+        """ Returns the date ordinal of an Account's last transaction, see read. """
+        acc_id, first, count = key
+        return struct.unpack_from("<i", self.map, self.dates_start + 4 * (first + count - 1))[0]
+
+    def location(self):
+        """ Returns the kind of source and its file, so that another process can open it again. """
+        return ("binary", self.path)
+
+    def close(self):
+        """ Releases the memory map. """
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+class Journal(object):
+    """
+    Journal class: Append-only log of every change made to the bank since the last snapshot of the files.
+    The durability mode sets how soon each record reaches the disk, and so which changes a crash can lose:
+        flush  -  Each record is handed to the operating system when it is written. Lost only if the machine itself
+                  goes down, for as long as the operating system keeps it before writing it out.
+        fsync  -  Each record is synced to the disk before the change returns. Nothing is lost.
+        group  -  Records are synced GROUP_COMMIT_SIZE at a time, or GROUP_COMMIT_INTERVAL seconds after the first of
+                  them, whichever comes first. Up to that many records, or that long, can be lost.
+        async  -  Records are kept by the program and synced by a background thread every ASYNC_FLUSH_INTERVAL seconds.
+                  Up to that long can be lost, even if only the program crashes.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, durability=None):
+        self.path = path
+        self.durability = durability or DURABILITY
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError("unknown durability mode " + self.durability)
+        self.records = 0        # Number of records in the journal
+        self.unsynced = 0       # Number of records written since the journal was last synced
+        self.file = None        # Opened on the first append
+        self.autoflush = True   # Write each record out as the durability mode says, otherwise only when flushed
+        self.lock = threading.Lock()
+        self.written = threading.Condition(self.lock)   # Wakes the flusher thread when there are records to sync
+        self.flusher = None     # Background thread syncing records in the group and async modes
+        self.stopping = False
+
+    def append(self, *fields):
+        """ Writes one record as a single line and writes it out as the durability mode says, unless autoflush is off. """
+        line = " ".join(fields) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a")
+            self.file.write(line)
+            self.records += 1
+            self.unsynced += 1
+            if not self.autoflush:
+                return
+
+            if self.durability == "flush":
+                self.file.flush()
+            elif self.durability == "fsync" or self.unsynced >= GROUP_COMMIT_SIZE and self.durability == "group":
+                self.sync()
+            else:
+                self.start_flusher()
+                if self.unsynced == 1:
+                    self.written.notify()
+
+    def sync(self):
+        """ Writes out every record and waits until they are on the disk. Called with the lock held. """
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def start_flusher(self):
+        """ Starts the background thread of the group and async modes, if it is not running. Called with the lock held. """
+        if self.flusher is None or not self.flusher.is_alive():
+            self.stopping = False
+            self.flusher = threading.Thread(target=self.flush_in_background, daemon=True)
+            self.flusher.start()
+
+    def flush_in_background(self):
+        """ Runs in the flusher thread: syncs records at most one interval after the first of them was written. """
+        interval = GROUP_COMMIT_INTERVAL if self.durability == "group" else ASYNC_FLUSH_INTERVAL
+        with self.lock:
+            while not self.stopping:
+                if self.unsynced == 0:
+                    self.written.wait()
+                    continue
+                self.written.wait(interval)
+                self.sync()
+
+    def flush(self):
+        """ Writes out all written records, and syncs them to the disk unless the durability mode is flush. """
+        with self.lock:
+            if self.file is not None:
+                if self.durability == "flush":
+                    self.file.flush()
+                    self.unsynced = 0
+                else:
+                    self.sync()
+
+    def replay(self, customers, accounts, acc_ids=None):
+        """
+        Applies every complete record in the journal to the Customers and Accounts loaded from the snapshot, or with a
+        set of acc_ids only the parts of them that touch those Accounts, see apply_partial_record.
+        A record cut short by a crash has no line ending, so it is dropped and cut off the end of the file.
+        """
+        try:
+            journal_file = open(self.path, "rb")
+        except IOError:
+            return
+
+        size = 0    # Length of the journal up to the end of the last complete record
+        for line in journal_file:
+            if not line.endswith(b"\n"):
+                break
+            size += len(line)
+            record = line.decode().split()
+            if acc_ids is None:
+                apply_record(record, customers, accounts)
+            else:
+                apply_partial_record(record, customers, accounts, acc_ids)
+            mark_dirty(record)
+            self.records += 1
+        journal_file.close()
+
+        # Remove the incomplete record so that new records start on a line of their own
+        if size < os.path.getsize(self.path):
+            os.truncate(self.path, size)
+
+    def reset(self):
+        """ Empties the journal once all of its records are part of a snapshot. """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            journal_file = open(self.path, "w")
+            os.fsync(journal_file.fileno())
+            journal_file.close()
+            self.records = 0
+            self.unsynced = 0
+
+    def close(self):
+        """ Syncs and closes the journal file, and stops the flusher thread. """
+        with self.lock:
+            if self.file is not None:
+                if self.durability != "flush":
+                    self.sync()
+                self.file.close()
+                self.file = None
+            self.stopping = True
+            self.written.notify()
+
+
+def journal_append(*fields):
+    """ Records a change with the storage the bank was loaded from, if there is one. All fields are strings. """
+    if storage is not None:
+        storage.record(*fields)
+
+
+def apply_record(record, customers, accounts):
+    """
+    Applies a single journal record, a list of fields, to the customers and accounts dictionaries:
+        CUSTOMER <customer id> <name> <age> <pin>   -  A new Customer
+        OPEN <customer id> <account id> <type>      -  A new Account for the Customer
+        CLOSE <customer id> <account id>            -  An Account closed by the Customer
+        PIN <customer id> <pin>                     -  A changed PIN
+        TRX <5 transaction fields> ...              -  One or more transactions (two for a transfer)
+        IDS <prefix> <number>                       -  A block of IDs reserved up to number
+    """
+    if record[0] == "TRX":
+        for index in range(1, len(record), 5):
+            transaction = tuple(record[index:index + 5])
+            transaction_ids.observe(transaction_ids.number(transaction[0]))
+            accounts[transaction[1]].add_transaction(transaction)
+            accounts[transaction[1]].balance += Money(to_cents(transaction[4]))
+
+    elif record[0] == "OPEN":
+        account_ids.observe(account_ids.number(record[2]))
+        if record[3] == "Savings":
+            accounts[record[2]] = SavingAccount(acc_id=record[2])
+        else:
+            accounts[record[2]] = CheckingAccount(acc_id=record[2])
+        customers[record[1]].add_acc(accounts[record[2]])
+
+    elif record[0] == "CLOSE":
+        customers[record[1]].accounts.remove(accounts[record[2]])
+        accounts[record[2]].owner = None
+
+    elif record[0] == "PIN":
+        customers[record[1]].set_pin(record[2])
+
+    elif record[0] == "CUSTOMER":
+        customer_ids.observe(customer_ids.number(record[1]))
+        customers[record[1]] = Customer(customer_id=record[1], name=record[2], age=int(record[3]), pin=record[4])
+
+    elif record[0] == "IDS":
+        for allocator in ALLOCATORS:
+            if allocator.prefix == record[1]:
+                allocator.observe(int(record[2]))
+
+
+def apply_partial_record(record, customers, accounts, acc_ids):
+    """
+    Applies the parts of a journal record that touch the Accounts in acc_ids, when only those are loaded. IDs in every
+    record are still observed, so none is handed out twice. A closed Account is removed from accounts altogether.
+    """
+    if record[0] == "TRX":
+        for index in range(1, len(record), 5):
+            transaction = tuple(record[index:index + 5])
+            transaction_ids.observe(transaction_ids.number(transaction[0]))
+            if transaction[1] in accounts:
+                accounts[transaction[1]].add_transaction(transaction)
+                accounts[transaction[1]].balance += Money(to_cents(transaction[4]))
+
+    elif record[0] == "OPEN":
+        account_ids.observe(account_ids.number(record[2]))
+        if record[2] in acc_ids:
+            if record[3] == "Savings":
+                accounts[record[2]] = SavingAccount(acc_id=record[2])
+            else:
+                accounts[record[2]] = CheckingAccount(acc_id=record[2])
+            if record[1] in customers:
+                customers[record[1]].add_acc(accounts[record[2]])
+
+    elif record[0] == "CLOSE":
+        if record[2] in accounts:
+            acc = accounts.pop(record[2])
+            if acc.owner is not None:
+                acc.owner.accounts.remove(acc)
+                acc.owner = None
+
+    elif record[0] == "PIN":
+        if record[1] in customers:
+            customers[record[1]].set_pin(record[2])
+
+    elif record[0] == "CUSTOMER":
+        customer_ids.observe(customer_ids.number(record[1]))
+
+    elif record[0] == "IDS":
+        apply_record(record, customers, accounts)
+
+
+def sync_directory():
+    """ Makes renamed and newly created files in the current directory durable, where the system allows it. """
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def finish_snapshot():
+    """
+    Moves a complete snapshot from the temporary files into place and empties the journal.
+    The marker is removed last, so this can safely be run again if a crash interrupts it.
+    """
+    marker = open(SNAPSHOT_MARKER, "r")
+    snapshot_format = marker.read().split()
+    marker.close()
+
+    for name in snapshot_files():
+        if os.path.exists(name + ".tmp"):
+            os.replace(name + ".tmp", name)
+
+    # The text files only take over from the binary snapshot once it is gone, and both from the shards
+    if snapshot_format[0] == "text" and os.path.exists(BINARY_SNAPSHOT):
+        os.remove(BINARY_SNAPSHOT)
+    if snapshot_format[0] != "sharded" and os.path.isdir(SHARD_DIRECTORY):
+        shutil.rmtree(SHARD_DIRECTORY)
+
+    # The shards take over from both, so neither is left behind to go out of date
+    if snapshot_format[0] == "sharded":
+        for name in TEXT_FILES + [BINARY_SNAPSHOT]:
+            if os.path.exists(name):
+                os.remove(name)
+
+    # Shards beyond the new number of shards are left over from before the bank was split again
+    if snapshot_format[0] == "sharded":
+        for number in range(int(snapshot_format[1]), existing_shards()):
+            shutil.rmtree(shard_directory(number))
+
+    if journal is not None:
+        journal.reset()
+    else:
+        Journal().reset()
+
+    sync_directory()
+    os.remove(SNAPSHOT_MARKER)
+    sync_directory()
+
+
+def recover_snapshot():
+    """ Completes a snapshot interrupted by a crash, or throws away one that was not fully written. """
+    if os.path.exists(SNAPSHOT_MARKER):
+        finish_snapshot()
+    else:
+        for name in snapshot_files():
+            if os.path.exists(name + ".tmp"):
+                os.remove(name + ".tmp")
+
+        # Shards that were being added were never complete
+        for number in reversed(range(existing_shards())):
+            if not os.path.exists(os.path.join(shard_directory(number), "customers.txt")):
+                shutil.rmtree(shard_directory(number))
+        if os.path.isdir(SHARD_DIRECTORY) and existing_shards() == 0:
+            shutil.rmtree(SHARD_DIRECTORY)
+
+
+def shard_directory(number):
+    """ Returns the directory of a shard. """
+    return os.path.join(SHARD_DIRECTORY, "%03d" % number)
+
+
+def existing_shards():
+    """ Returns the number of shard directories there are. """
+    if not os.path.isdir(SHARD_DIRECTORY):
+        return 0
+    return len([name for name in os.listdir(SHARD_DIRECTORY) if name.isdigit()])
+
+
+def shard_of(acc_id, count):
+    """ Returns the number of the shard that holds an Account, out of count shards. """
+    return zlib.crc32(acc_id.encode()) % count
+
+
+def snapshot_files():
+    """
+    Returns the files of a snapshot in every format, including the text files of each shard and any archive segment
+    being written, which only takes over the transactions it holds together with the snapshot that leaves them out.
+    """
+    files = list(SNAPSHOT_FILES)
+    for number in range(existing_shards()):
+        for name in TEXT_FILES:
+            files.append(os.path.join(shard_directory(number), name))
+    if os.path.isdir(ARCHIVE_DIRECTORY):
+        for name in os.listdir(ARCHIVE_DIRECTORY):
+            if name.endswith(".arc.tmp"):
+                files.append(os.path.join(ARCHIVE_DIRECTORY, name[:-4]))
+    return files
+
+
+def current_format():
+    """ Returns the format of the snapshot on disk: "sharded", "binary" or "text". """
+    if os.path.isdir(SHARD_DIRECTORY):
+        return "sharded"
+    if os.path.exists(BINARY_SNAPSHOT):
+        return "binary"
+    return "text"
+
+
+def mark_dirty(record):
+    """ Notes which shards a journal record (a list of fields) changes, if the bank is sharded. """
+    if shard_count == 0:
+        return
+
+    if record[0] == "TRX":
+        for index in range(2, len(record), 5):
+            dirty_shards.add(shard_of(record[index], shard_count))
+    elif record[0] in ["OPEN", "CLOSE"]:
+        dirty_shards.add(shard_of(record[2], shard_count))
+    elif record[0] == "PIN":
+        # The PIN is written with each of the customer's Accounts, which can be in any shard
+        dirty_shards.update(range(shard_count))
+
+
+class FileStorage(object):
+    """
+    FileStorage class: Keeps the bank in a snapshot (the text files or the binary snapshot) and a journal of every
+    change made since. The journal is folded into a new snapshot by save().
+    """
+
+    def __init__(self):
+        self.partial = False    # Only some Accounts are loaded, so no snapshot can be written
+
+    def load(self, customers, accounts, acc_ids=None):
+        """
+        Loads the snapshot and replays the journal on top of it, or only the Accounts in acc_ids and their Customers.
+        Returns False if the snapshot could not be opened.
+        """
+        global journal, shard_count
+
+        recover_snapshot()
+        shard_count = 0
+        dirty_shards.clear()
+
+        snapshot_format = current_format()
+        if snapshot_format == "sharded":
+            loaded = load_shards(customers, accounts, acc_ids)
+        elif snapshot_format == "binary":
+            loaded = load_binary_snapshot(customers, accounts, BINARY_SNAPSHOT, acc_ids)
+        else:
+            loaded = load_text_files(customers, accounts, acc_ids)
+        if not loaded:
+            return False
+        load_ids_file(IDS_FILE)
+        self.partial = acc_ids is not None
+
+        # Apply the changes made since the snapshot, new changes are appended to the same journal
+        journal = Journal()
+        journal.replay(customers, accounts, acc_ids)
+        return True
+
+    @property
+    def autoflush(self):
+        return journal.autoflush
+
+    @autoflush.setter
+    def autoflush(self, value):
+        journal.autoflush = value
+
+    def record(self, *fields):
+        """ Appends a change to the journal. """
+        mark_dirty(fields)
+        journal.append(*fields)
+
+    def pending(self):
+        """ Returns the number of changes made since the last snapshot. """
+        return journal.records
+
+    def flush(self):
+        """ Hands all recorded changes to the operating system. """
+        journal.flush()
+
+    def history(self, acc, count):
+        """ Returns the last count transactions of the Account, most recent first. """
+        last = len(acc.transactions)
+        transactions = acc.transactions[max(last - count, 0):last]
+        transactions.reverse()
+        return transactions
+
+    def save(self, customers, snapshot_format=None):
+        """ Writes a new snapshot and empties the journal, see update_files. """
+        if self.partial:
+            raise RuntimeError("only part of the bank is loaded, a snapshot of it would lose the rest")
+        update_files(customers, snapshot_format)
+
+    def close(self):
+        journal.close()
+
+
+# Tables of the SQLite database. Amounts are stored in cents and dates as ordinals, like in a Ledger. Closed Accounts are
+# only marked as closed, so their IDs and transactions are kept. Transactions are numbered by seq in the order they
+# were made, so a history can be read up to a given point.
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    pin TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    acc_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    type INTEGER NOT NULL,
+    balance INTEGER NOT NULL DEFAULT 0,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    last_debit INTEGER NOT NULL DEFAULT 0,
+    closed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY,
+    number INTEGER NOT NULL,
+    acc_id TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ids (
+    prefix TEXT PRIMARY KEY,
+    last INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS accounts_customer ON accounts (customer_id);
+CREATE INDEX IF NOT EXISTS transactions_account ON transactions (acc_id, seq);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_number ON transactions (number);
+"""
+
+
+def connect_database(path, synchronous="NORMAL"):
+    """
+    Opens a connection to the SQLite database in WAL mode, so readers never wait for the writer.
+    Statements are written with ? parameters, so each one is prepared once and then reused from the connection's cache.
+    With synchronous NORMAL a commit can be lost if the machine goes down, with FULL it is synced before it returns.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=" + synchronous)
+    return connection
+
+
+class ConnectionPool(object):
+    """ ConnectionPool class: A fixed set of read connections to the SQLite database, shared by all threads. """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(connect_database(path))
+
+    def get(self):
+        """ Returns a free connection, waiting for one if all are in use. """
+        return self.connections.get()
+
+    def put(self, connection):
+        """ Hands a connection back to the pool. """
+        self.connections.put(connection)
+
+    def close(self):
+        """ Closes every connection in the pool. """
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+class SQLiteSource(object):
+    """ SQLiteSource class: Reads stored transactions from the SQLite database. """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def read(self, key):
+        """ Returns a Ledger of an Account's transactions. key is the Account ID and the last seq that belongs to the history. """
+        transactions = Ledger(key[0])
+        connection = self.pool.get()
+        try:
+            for number, ordinal, trx_type, cents in connection.execute(
+                    "SELECT number, date, type, cents FROM transactions WHERE acc_id = ? AND seq <= ? ORDER BY seq", key):
+                transactions.add(number, ordinal, trx_type, cents)
+        finally:
+            self.pool.put(connection)
+        return transactions
+
+    def last_date(self, key):
+        """ Returns the date ordinal of an Account's last transaction, see read. """
+        connection = self.pool.get()
+        try:
+            return connection.execute("SELECT date FROM transactions WHERE acc_id = ? AND seq <= ? ORDER BY seq DESC "
+                                      "LIMIT 1", key).fetchone()[0]
+        finally:
+            self.pool.put(connection)
+
+    def location(self):
+        """ Returns the kind of source and its file, so that another process can open it again. """
+        return ("sqlite", self.pool.path)
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage(object):
+    """
+    SQLiteStorage class: Keeps the bank in a SQLite database. Each change updates only the rows it touches, in place of
+    the journal and the snapshot files. Changes go through one writer connection, reads through a pool of connections.
+    """
+
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self.writer = None
+        self.pool = None
+        self.source = None
+        self.records = 0        # Number of changes made since the last save
+        self.autoflush = True   # Commit each change as soon as it is made
+        self.lock = threading.Lock()
+
+    def load(self, customers, accounts, acc_ids=None):
+        """
+        Creates the Customers and Accounts from the database, or only the Accounts in acc_ids and their Customers, each
+        found through its primary key. Returns False if it could not be opened.
+        """
+        global transaction_source
+
+        try:
+            self.writer = connect_database(self.path, "FULL" if DURABILITY == "fsync" else "NORMAL")
+            self.writer.executescript(DATABASE_SCHEMA)
+            self.pool = ConnectionPool(self.path, DATABASE_POOL_SIZE if acc_ids is None else 1)
+        except sqlite3.Error:
+            print("File could not be opened.")
+            return False
+        self.source = SQLiteSource(self.pool)
+
+        # Histories read transactions up to the last one made before loading, later ones are kept in memory
+        last_seq = self.writer.execute("SELECT COALESCE(MAX(seq), 0) FROM transactions").fetchone()[0]
+
+        if acc_ids is None:
+            customer_rows = self.writer.execute("SELECT customer_id, name, age, pin FROM customers ORDER BY rowid")
+            account_rows = self.writer.execute("SELECT acc_id, customer_id, type, balance, transactions, last_debit, "
+                                               "closed FROM accounts ORDER BY rowid")
+        else:
+            wanted = sorted(acc_ids)
+            marks = ", ".join("?" * len(wanted))
+            customer_rows = self.writer.execute("SELECT customer_id, name, age, pin FROM customers WHERE customer_id IN "
+                                                "(SELECT customer_id FROM accounts WHERE acc_id IN (%s))" % marks, wanted)
+            account_rows = self.writer.execute("SELECT acc_id, customer_id, type, balance, transactions, last_debit, "
+                                               "closed FROM accounts WHERE acc_id IN (%s)" % marks, wanted)
+
+        for customer_id, name, age, pin in customer_rows:
+            customers[customer_id] = Customer(customer_id=customer_id, name=name, age=age, pin=pin)
+
+        for acc_id, customer_id, acc_type, balance, count, last_debit, closed in account_rows.fetchall():
+            # The IDs of closed Accounts are never handed out again
+            account_ids.observe(account_ids.number(acc_id))
+            if closed:
+                continue
+
+            transactions = TransactionHistory(self.source, (acc_id, last_seq), count, acc_id)
+            if acc_type == 0:
+                accounts[acc_id] = SavingAccount(acc_id=acc_id, balance=Money(balance), transactions=transactions,
+                                                 last_debit=last_debit)
+            else:
+                accounts[acc_id] = CheckingAccount(acc_id=acc_id, balance=Money(balance), transactions=transactions,
+                                                   last_debit=last_debit)
+            customers[customer_id].add_acc(accounts[acc_id])
+
+        transaction_ids.observe(self.writer.execute("SELECT COALESCE(MAX(number), 0) FROM transactions").fetchone()[0])
+        allocators = {allocator.prefix: allocator for allocator in ALLOCATORS}
+        for prefix, last in self.writer.execute("SELECT prefix, last FROM ids"):
+            if prefix in allocators:
+                allocators[prefix].observe(last)
+
+        transaction_source = self.source
+        return True
+
+    def record(self, *fields):
+        """ Applies a change, given as the fields of a journal record, to the rows it touches. See apply_record. """
+        with self.lock:
+            cursor = self.writer.cursor()
+
+            if fields[0] == "TRX":
+                for index in range(1, len(fields), 5):
+                    number, acc_id, day, trx_type, amount = fields[index:index + 5]
+                    ordinal = date_ordinal(day)
+                    cents = to_cents(amount)
+                    cursor.execute("INSERT INTO transactions (number, acc_id, date, type, cents) VALUES (?, ?, ?, ?, ?)",
+                                   (transaction_ids.number(number), acc_id, ordinal, TRANSACTION_CODES[trx_type], cents))
+                    if trx_type in DEBIT_TYPES and cents < 0:
+                        cursor.execute("UPDATE accounts SET balance = balance + ?, transactions = transactions + 1, "
+                                       "last_debit = ? WHERE acc_id = ?", (cents, ordinal, acc_id))
+                    else:
+                        cursor.execute("UPDATE accounts SET balance = balance + ?, transactions = transactions + 1 "
+                                       "WHERE acc_id = ?", (cents, acc_id))
+
+            elif fields[0] == "OPEN":
+                cursor.execute("INSERT INTO accounts (acc_id, customer_id, type) VALUES (?, ?, ?)",
+                               (fields[2], fields[1], ACCOUNT_TYPES.index(fields[3])))
+
+            elif fields[0] == "CLOSE":
+                cursor.execute("UPDATE accounts SET closed = 1 WHERE acc_id = ?", (fields[2],))
+
+            elif fields[0] == "PIN":
+                cursor.execute("UPDATE customers SET pin = ? WHERE customer_id = ?", (fields[2], fields[1]))
+
+            elif fields[0] == "CUSTOMER":
+                cursor.execute("INSERT INTO customers (customer_id, name, age, pin) VALUES (?, ?, ?, ?)",
+                               (fields[1], fields[2], int(fields[3]), fields[4]))
+
+            elif fields[0] == "IDS":
+                cursor.execute("INSERT OR REPLACE INTO ids (prefix, last) VALUES (?, ?)", (fields[1], int(fields[2])))
+
+            if self.autoflush:
+                self.writer.commit()
+            self.records += 1
+
+    def pending(self):
+        """ Returns the number of changes made since the last save. """
+        return self.records
+
+    def flush(self):
+        """ Commits all recorded changes. """
+        with self.lock:
+            self.writer.commit()
+
+    def history(self, acc, count):
+        """ Returns the last count committed transactions of the Account, most recent first, read in one query. """
+        connection = self.pool.get()
+        try:
+            rows = connection.execute("SELECT number, date, type, cents FROM transactions WHERE acc_id = ? "
+                                      "ORDER BY seq DESC LIMIT ?", (acc.acc_id, count)).fetchall()
+        finally:
+            self.pool.put(connection)
+        return [(transaction_ids.format(number), acc.acc_id, date_string(ordinal), TRANSACTION_TYPES[trx_type],
+                 format_cents(cents))
+                for number, ordinal, trx_type, cents in rows]
+
+    @metrics.timed("save")
+    def save(self, customers, snapshot_format=None):
+        """
+        Commits all changes and lets every history read its transactions from the database again, so the ones made
+        since loading no longer have to be kept in memory. Nothing is rewritten; snapshot_format is only there to match
+        FileStorage.
+        """
+        with bank_lock.exclusive:
+            with self.lock:
+                for allocator in ALLOCATORS:
+                    self.writer.execute("INSERT OR REPLACE INTO ids (prefix, last) VALUES (?, ?)",
+                                        (allocator.prefix, allocator.last))
+                self.writer.commit()
+                last_seq = self.writer.execute("SELECT COALESCE(MAX(seq), 0) FROM transactions").fetchone()[0]
+                self.writer.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                self.records = 0
+
+            for key in customers:
+                for acc in customers[key].accounts:
+                    acc.transactions.rebase(self.source, (acc.acc_id, last_seq))
+
+    def close(self):
+        """ Commits all changes and closes the connections. """
+        with self.lock:
+            self.writer.commit()
+            self.writer.close()
+        self.pool.close()
+
+
+def write_database(customers, path):
+    """
+    Writes the whole bank into a new SQLite database. The database is written to a temporary file first and only
+    moved into place once it is complete.
+    """
+    if os.path.exists(path + ".tmp"):
+        os.remove(path + ".tmp")
+    connection = sqlite3.connect(path + ".tmp")
+    connection.executescript(DATABASE_SCHEMA)
+
+    for key in customers:
+        customer = customers[key]
+        connection.execute("INSERT INTO customers (customer_id, name, age, pin) VALUES (?, ?, ?, ?)",
+                           (customer.customer_id, customer.name, customer.age, customer.get_pin()))
+
+        for acc in customer.accounts:
+            connection.execute("INSERT INTO accounts (acc_id, customer_id, type, balance, transactions, last_debit) "
+                               "VALUES (?, ?, ?, ?, ?, ?)",
+                               (acc.acc_id, customer.customer_id, ACCOUNT_TYPES.index(acc.accType),
+                                acc.balance.cents, acc.transactions.hot_length(), acc.last_debit))
+            for ledger in acc.transactions.ledgers():
+                connection.executemany("INSERT INTO transactions (number, acc_id, date, type, cents) VALUES (?, ?, ?, ?, ?)",
+                                       zip(ledger.numbers, [acc.acc_id] * len(ledger), ledger.dates, ledger.types,
+                                           ledger.cents))
+
+    connection.executemany("INSERT INTO ids (prefix, last) VALUES (?, ?)",
+                           [(allocator.prefix, allocator.last) for allocator in ALLOCATORS])
+    connection.commit()
+    connection.close()
+    os.replace(path + ".tmp", path)
+    sync_directory()
+
+
+def get_next_trx_id():
+    """ Returns the next transaction ID. """
+    return transaction_ids.next()
+
+
+def open_account(customer, accounts, acc_type):
+    """
+    Opens a new Account of acc_type ("Savings" or "Checking") for the customer without printing anything.
+    Returns the Account, or raises TransactionError if the customer is too young for that type of Account.
+    """
+    # Savings Accounts can be opened from 14 years of age, Checking Accounts from 18
+    if acc_type == "Savings":
+        min_age = 14
+    else:
+        min_age = 18
+
+    # Check if the customer is eligible to open the Account
+    if customer.age < min_age:
+        raise TransactionError("too_young", "You should be %d years or older to open a %s Account!" % (min_age, acc_type))
+
+    with bank_lock.shared:
+        unqid = account_ids.next()
+        journal_append("OPEN", customer.customer_id, unqid, acc_type)
+
+        # Creates a new Account object and stores it in the accounts dictionary with the Account ID as key
+        if acc_type == "Savings":
+            accounts[unqid] = SavingAccount(acc_id=unqid)
+        else:
+            accounts[unqid] = CheckingAccount(acc_id=unqid)
+        # Add the newly created Account to the customer
+        customer.add_acc(accounts[unqid])
+
+    return accounts[unqid]
+
+
+def create_savings_account(customer, accounts):
+    """ Checks the age of the customer and creates a savings account for the customer if he is eligible. """
+    try:
+        acc = open_account(customer, accounts, "Savings")
+    except TransactionError as error:
+        print(error)
+    else:
+        print("Account created successfully!\n")
+        print(acc)
+
+    print()
+
+
+def create_checking_account(customer, accounts):
+    """ Checks the age of the customer and creates a checking account for the customer if he is eligible. """
+    try:
+        acc = open_account(customer, accounts, "Checking")
+    except TransactionError as error:
+        print(error)
+    else:
+        print("Account created successfully!\n")
+        print(acc)
+
+    print()
+
+
+def parse_amount(value):
+    """ Converts an amount given as a number or a string into Money, or raises TransactionError if it is not one. """
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise TransactionError("invalid_amount", "Amount is not a number")
+    if not math.isfinite(amount):
+        raise TransactionError("invalid_amount", "Amount is not a number")
+    return to_money(amount)
+
+
+class StringTable(object):
+    """ StringTable class: Collects the distinct strings of a binary snapshot and numbers them. """
+
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def add(self, text):
+        """ Returns the number of the string, adding it to the table if it is new. """
+        if text not in self.index:
+            self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return self.index[text]
+
+
+class TextSnapshotWriter(object):
+    """ TextSnapshotWriter class: Writes Accounts and their transactions to temporary copies of the text files in a directory. """
+
+    def __init__(self, directory="."):
+        self.customers_file = open(os.path.join(directory, "customers.txt.tmp"), "w")
+        self.accounts_file = open(os.path.join(directory, "accounts.txt.tmp"), "w")
+        self.transactions_file = open(os.path.join(directory, "accountsTransactions.txt.tmp"), "wb")
+        self.index = {}         # Byte offsets of each Account's transactions
+        self.position = 0
+
+    def write(self, line, acc):
+        """ Writes an Account with line, the details of the Customer holding it, and all of its transactions. """
+        # Write the details of the customer to the file customer.txt
+        print(line + acc.acc_id, file=self.customers_file)
+
+        # Write the details of the account to the file accounts.txt
+        line2 = acc.acc_id + " " + acc.accType + " " + str(acc.balance)
+        print(line2, file=self.accounts_file)
+
+        # Writes details of each transaction that is not archived to the file accountsTransactions.txt, noting where each one starts
+        offsets = array("q")
+        for ledger in acc.transactions.ledgers():
+            for transaction in ledger:
+                record = (" ".join(transaction) + "\n").encode()
+                self.transactions_file.write(record)
+                offsets.append(self.position)
+                self.position += len(record)
+        self.index[acc.acc_id] = offsets
+
+    def close(self):
+        """ Makes sure the files are on disk before they replace the old ones. Returns the offsets of each Account's transactions. """
+        for snapshot_file in (self.customers_file, self.accounts_file, self.transactions_file):
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+            snapshot_file.close()
+        return self.index
+
+
+def customer_line(customer):
+    """ Returns the details of a Customer as written in front of each of their Accounts in customers.txt. """
+    return customer.customer_id + " " + customer.name + " %d" % customer.age + " " + customer.get_pin() + " "
+
+
+def write_text_files(customers):
+    """
+    Writes the bank to temporary copies of the files:
+        customers.txt            -  With the information about each Customer
+        accounts.txt             -  With the information about each Accounts
+        accountsTransactions.txt -  With the information about each Transaction
+    Returns a dictionary with the byte offsets of each Account's transactions, or None if the files could not be opened.
+    """
+
+    # Open temporary files to write data of all the Customers and Accounts
+    try:
+        writer = TextSnapshotWriter()
+    except IOError:
+        print("File could not be opened.")
+        return None
+
+    # Writes details of each customer, accounts and transactions to the files
+    for key in customers:
+        line = customer_line(customers[key])
+
+        # Write the customer detail only if he has an account
+        for acc in customers[key].accounts:
+            writer.write(line, acc)
+
+    return writer.close()
+
+
+def write_shard_files(customers, count, dirty):
+    """
+    Writes temporary copies of the text files of each shard in dirty, out of count shards. Each Account is written to
+    the shard given by its Account ID, together with the line of its Customer and its transactions.
+    Returns a dictionary with the byte offsets of the transactions of each Account written, or None if the files could
+    not be opened.
+    """
+    writers = {}
+    try:
+        for number in dirty:
+            os.makedirs(shard_directory(number), exist_ok=True)
+            writers[number] = TextSnapshotWriter(shard_directory(number))
+    except IOError:
+        print("File could not be opened.")
+        return None
+
+    for key in customers:
+        line = customer_line(customers[key])
+        for acc in customers[key].accounts:
+            number = shard_of(acc.acc_id, count)
+            if number in writers:
+                writers[number].write(line, acc)
+
+    index = {}
+    for number in writers:
+        index.update(writers[number].close())
+    return index
+
+
+def write_binary_snapshot(customers, path):
+    """
+    Writes the bank to a binary snapshot file. After the header come the string table (offsets, then the text),
+    then fixed-width Customer, Account and transaction records. Each Account's transactions are stored together.
+    Returns a dictionary with the position of each Account's transactions, or None if the file could not be opened.
+    """
+    strings = StringTable()
+    customer_records = []
+    account_records = []
+    columns = Ledger()
+    index = {}
+
+    for key in customers:
+        customer = customers[key]
+        customer_records.append(SNAPSHOT_CUSTOMER.pack(strings.add(customer.customer_id), strings.add(customer.name),
+                                                       customer.age, strings.add(customer.get_pin())))
+
+        for acc in customer.accounts:
+            index[acc.acc_id] = (acc.acc_id, len(columns), acc.transactions.hot_length())
+            account_records.append(SNAPSHOT_ACCOUNT.pack(strings.add(acc.acc_id), len(customer_records) - 1,
+                                                         ACCOUNT_TYPES.index(acc.accType), acc.balance.cents,
+                                                         len(columns), acc.transactions.hot_length(), acc.last_debit))
+
+            for ledger in acc.transactions.ledgers():
+                columns.numbers.extend(ledger.numbers)
+                columns.dates.extend(ledger.dates)
+                columns.types.extend(ledger.types)
+                columns.cents.extend(ledger.cents)
+
+    # The string table stores the character offset where each string starts, followed by all the strings joined
+    offsets = [0]
+    for text in strings.strings:
+        offsets.append(offsets[-1] + len(text))
+    text = "".join(strings.strings).encode()
+
+    try:
+        snapshot_file = open(path, "wb")
+    except IOError:
+        print("File could not be opened.")
+        return None
+
+    snapshot_file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(strings.strings), len(text),
+                                             len(customer_records), len(account_records), len(columns),
+                                             transaction_ids.last))
+    snapshot_file.write(struct.pack("<%dI" % len(offsets), *offsets))
+    snapshot_file.write(text)
+    snapshot_file.write(b"".join(customer_records))
+    snapshot_file.write(b"".join(account_records))
+
+    # The snapshot is little-endian
+    if sys.byteorder == "big":
+        for column in (columns.numbers, columns.dates, columns.cents):
+            column.byteswap()
+    for column in (columns.numbers, columns.dates, columns.types, columns.cents):
+        snapshot_file.write(column.tobytes())
+
+    snapshot_file.flush()
+    os.fsync(snapshot_file.fileno())
+    snapshot_file.close()
+    return index
+
+
+@metrics.timed("update_files")
+def update_files(customers, snapshot_format=None, shards=None):
+    """
+    Writes a snapshot of the bank in snapshot_format: "text" for the text files, "binary" for the binary snapshot or
+    "sharded" for the text files split into shards (as many as given, by default as many as before or one per CPU).
+    By default the snapshot is written in the format the bank was loaded from.
+    Changes to the bank from other threads wait until the snapshot is written.
+    """
+    if snapshot_format is None:
+        snapshot_format = current_format()
+
+    with bank_lock.exclusive:
+        write_snapshot(customers, snapshot_format, shards)
+
+
+def write_snapshot(customers, snapshot_format, shards=None):
+    """
+    Writes the snapshot for update_files. The snapshot is written to temporary files first. Only once they are on disk
+    is the marker created, the old files replaced and the journal emptied, so a crash at any point leaves either the old
+    snapshot and its journal or the new one. Of a sharded bank only the shards that changed are written.
+    """
+    global transaction_source, shard_count
+
+    if snapshot_format == "sharded":
+        count = shards or shard_count or os.cpu_count() or 1
+        if count == shard_count:
+            dirty = set(dirty_shards)
+        else:
+            dirty = set(range(count))
+        index = write_shard_files(customers, count, dirty)
+        marker_text = "sharded %d" % count
+    elif snapshot_format == "binary":
+        index = write_binary_snapshot(customers, BINARY_SNAPSHOT + ".tmp")
+        marker_text = "binary"
+    else:
+        index = write_text_files(customers)
+        marker_text = "text"
+    if index is None:
+        return
+    write_ids_file(IDS_FILE + ".tmp")
+
+    # The marker records the format, so that the snapshot it replaces can be removed if the format changed
+    marker = open(SNAPSHOT_MARKER, "w")
+    marker.write(marker_text)
+    marker.flush()
+    os.fsync(marker.fileno())
+    marker.close()
+    sync_directory()
+
+    finish_snapshot()
+    dirty_shards.clear()
+
+    # Point every history written to at the new snapshot, which now holds all of its transactions
+    old_source = transaction_source
+    if snapshot_format == "sharded":
+        transaction_source = None
+        shard_count = count
+        sources = {number: TextSource(os.path.join(shard_directory(number), "accountsTransactions.txt"))
+                   for number in dirty}
+        for key in customers:
+            for acc in customers[key].accounts:
+                if acc.acc_id in index:
+                    acc.transactions.rebase(sources[shard_of(acc.acc_id, count)], index[acc.acc_id])
+    else:
+        shard_count = 0
+        if snapshot_format == "binary":
+            transaction_source = BinarySource(BINARY_SNAPSHOT)
+        else:
+            transaction_source = TextSource()
+        for key in customers:
+            for acc in customers[key].accounts:
+                acc.transactions.rebase(transaction_source, index[acc.acc_id])
+    if old_source is not None:
+        old_source.close()
+
+
+def input_date(prompt):
+    """ Asks for a date until a valid one such as "2021-12-18" is entered and returns it. """
+    while True:
+        text = input(prompt)
+        try:
+            date.fromisoformat(text)
+            return text
+        except ValueError:
+            pass
+
+
+def find_customer(allcustomers):
+    """
+    Lists the customers whose names start with the letters entered, a page at a time, and returns the one whose ID is
+    entered. Returns None if the customer cancels instead.
+    """
+    prefix = input("Enter the start of the name: ").strip()
+    page = 0
+    while True:
+        found, total = name_index.search(prefix, page)
+        if total == 0:
+            print("No customers found\n")
+            return None
+
+        print()
+        for customer_id in found:
+            print("ID: " + customer_id + " | Name: " + allcustomers[customer_id].name)
+        pages = (total + CUSTOMER_PAGE_SIZE - 1) // CUSTOMER_PAGE_SIZE
+        print("\nPage %d of %d" % (page + 1, pages))
+
+        choice = input("Enter Customer ID, n for the next page, p for the previous page or 0 to cancel: ").strip()
+        if choice == "0":
+            return None
+        if choice == "n":
+            page = min(page + 1, pages - 1)
+        elif choice == "p":
+            page = max(page - 1, 0)
+        elif choice in allcustomers:
+            print()
+            return allcustomers[choice]
+        else:
+            print("Customer does not exist")
+
+
+def choose_receiver(allcustomers, accounts):
+    """
+    Asks for the Account to transfer to, either by its Account ID or by finding its owner by name.
+    Returns None if the customer cancels instead.
+    """
+    while True:
+        print("1. Enter the Account ID to transfer to")
+        print("2. Find the customer by name")
+        print("0. Cancel")
+
+        choice = ""
+        while choice not in ["0", "1", "2"]:
+            choice = input("Enter your choice: ")
+        print()
+
+        if choice == "0":
+            return None
+
+        # Choice 1: The Account ID, looked up directly
+        if choice == "1":
+            acc = accounts.get(input("Enter Account ID: ").strip())
+            if acc is None or acc.owner is None:
+                print("Account does not exist\n")
+                continue
+            print("Transferring to " + acc.acc_id + " held by " + acc.owner.name + "\n")
+            return acc
+
+        # Choice 2: Find the customer, then choose one of their Accounts
+        receiver = find_customer(allcustomers)
+        if receiver is None:
+            continue
+        if not receiver.accounts:
+            print("The customer has no accounts!\n")
+            continue
+        print("Choose an account to transfer to:\n")
+        index = receiver.choose_account()
+        if index != -1:
+            return receiver.accounts[index]
+
+
+def menu(customer, allcustomers, accounts):
+    """ Displays the menu after logging in and calls the respective functions as the user chooses. """
+
+    while True:
+        print("1. Create a New Account")
+        print("2. View Balance")
+        print("3. Deposit")
+        print("4. Withdraw")
+        print("5. Transfer")
+        print("6. View Transactions")
+        print("7. View Statement")
+        print("8. Close an Account")
+        print("9. Change PIN")
+        print("10. Logout")
+
+        menu_choice = ""
+        while menu_choice not in ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]:
+            menu_choice = input("Enter your choice: ")
+        print()
+
+        menu_choice = int(menu_choice)
+
+        # Choice 1: Create a New Account
+        if menu_choice == 1:
+            print("Which type of account would you like to make?")
+            print("1. Savings Account")
+            print("2. Checking Account")
+
+            choice = ""
+            while choice not in ["1", "2"]:
+                choice = input("Enter your choice: ")
+            print()
+
+            # Customer chooses Savings Account
+            if choice == "1":
+                create_savings_account(customer, accounts)
+            # Customer chooses Checking Account
+            else:
+                create_checking_account(customer, accounts)
+
+        # Choice 2: View Balance
+        elif menu_choice == 2:
+            customer.print_balance()
+
+        # Choice 3: Deposit
+        elif menu_choice == 3:
+            # If customer has no accounts
+            if not customer.accounts:
+                print("You have no accounts!")
+            else:
+                print("Choose an account to deposit to:\n")
+                choice = customer.choose_account()
+
+                # If choice is not exit
+                if choice != -1:
+                    amount = ""
+                    while not amount.isdigit():
+                        amount = input("Enter amount to deposit: ")
+                    print()
+
+                    amount = Money(to_cents(amount))
+                    customer.accounts[choice].deposit(amount)
+            print()
+
+        # Choice 4: Withdraw
+        elif menu_choice == 4:
+            # If customer has no accounts
+            if not customer.accounts:
+                print("You have no accounts!")
+            else:
+                print("Choose an account to withdraw from:\n")
+                choice = customer.choose_account()
+
+                # If choice is not exit
+                if choice != -1:
+                    amount = ""
+                    while not amount.isdigit():
+                        amount = input("Enter amount to withdraw: ")
+                    print()
+
+                    amount = Money(to_cents(amount))
+                    customer.accounts[choice].withdraw(amount)
+            print()
+
+        # Choice 5: Transfer
+        elif menu_choice == 5:
+            # If customer has no accounts
+            if not customer.accounts:
+                print("You have no accounts!")
+            else:
+                print("Choose an account to transfer from:\n")
+                choice = customer.choose_account()
+
+                # If choice is not exit
+                if choice != -1:
+                    receiver_acc = choose_receiver(allcustomers, accounts)
+
+                    # If choice is not exit
+                    if receiver_acc is not None:
+                        amount = ""
+                        while not amount.isdigit():
+                            amount = input("Enter amount to transfer: ")
+                        print()
+
+                        amount = Money(to_cents(amount))
+                        customer.accounts[choice].transfer(amount, receiver_acc)
+            print()
+
+        # Choice 6: View Transactions
+        elif menu_choice == 6:
+            # If customer has no accounts
+            if not customer.accounts:
+                print("You have no accounts!")
+            else:
+                print("Choose an account to view transactions:\n")
+                choice = customer.choose_account()
+                print()
+
+                # If choice is not exit
+                if choice != -1:
+                    customer.accounts[choice].print_transactions()
+
+            print()
+
+        # Choice 7: View Statement
+        elif menu_choice == 7:
+            # If customer has no accounts
+            if not customer.accounts:
+                print("You have no accounts!")
+            else:
+                print("Choose an account to view a statement:\n")
+                choice = customer.choose_account()
+                print()
+
+                # If choice is not exit
+                if choice != -1:
+                    first = input_date("Enter the first day (YYYY-MM-DD): ")
+                    last = input_date("Enter the last day (YYYY-MM-DD): ")
+                    print()
+                    customer.accounts[choice].print_statement(first, last)
+
+            print()
+
+        # Choice 8: Close an Account
+        elif menu_choice == 8:
+            customer.close_account()
+
+        # Choice 9: Change PIN
+        elif menu_choice == 9:
+            customer.change_pin()
+
+        # Choice 10: Logout
+        else:
+            break
+
+
+def find_transactions(transactions_file, wanted, offsets, last_debits):
+    """
+    Fills in the byte offsets of the transactions of each Account ID in wanted (as bytes) and the date of its last
+    withdraw or transfer, like read_text_files, by searching the memory mapped file for the IDs instead of reading
+    every line.
+    """
+    if os.fstat(transactions_file.fileno()).st_size == 0:
+        return
+    data = mmap.mmap(transactions_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    for acc_id in wanted:
+        # The Account ID is the second field of a line, and no other field can hold it with spaces around it
+        pattern = b" " + acc_id + b" "
+        position = data.find(pattern)
+        while position != -1:
+            start = data.rfind(b"\n", 0, position) + 1
+            end = data.find(b"\n", position)
+            if end == -1:
+                end = len(data)
+            record = data[start:end].split(None, 2)
+
+            if record[1] == acc_id:
+                if acc_id not in offsets:
+                    offsets[acc_id] = array("q")
+                offsets[acc_id].append(start)
+                if b" -" in record[2] and record[2].startswith((b"Withdraw", b"Transfer"), 11):
+                    last_debits[acc_id] = record[2][:10]
+            position = data.find(pattern, end)
+    data.close()
+
+
+def find_records(records_file, wanted, field):
+    """
+    Returns the lines, split into fields and in file order, whose field (counting from 0) is one of the IDs in wanted
+    (as bytes), by searching the memory mapped file for the IDs instead of reading every line.
+    """
+    if os.fstat(records_file.fileno()).st_size == 0:
+        return []
+    data = mmap.mmap(records_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    found = []
+    for acc_id in wanted:
+        position = data.find(acc_id)
+        while position != -1:
+            start = data.rfind(b"\n", 0, position) + 1
+            end = data.find(b"\n", position)
+            if end == -1:
+                end = len(data)
+            record = data[start:end].split()
+
+            # An ID can also be the start of a longer one
+            if len(record) > field and record[field] == acc_id:
+                found.append((start, [value.decode() for value in record]))
+            position = data.find(acc_id, end)
+    data.close()
+
+    found.sort()
+    return [record for start, record in found]
+
+
+def read_text_files(directory=".", acc_ids=None):
+    """
+    Reads the text files in a directory without creating any objects, so that it can be done in another process.
+    Returns the customer records, the Account records and the highest transaction number, or None if the files could
+    not be opened. Transactions are left in the file until they are first needed.
+    Records are ready to make objects from, with every field parsed: a customer record is the Customer ID, name, age,
+    PIN and Account ID, an Account record is the Account ID, type, balance in cents, byte offsets of its transactions
+    (None if it has none) and the date ordinal of its last withdraw or transfer (0 if none).
+    With a set of acc_ids only those Accounts and the lines of their Customers are returned.
+    """
+
+    # Open files to get data to create all the previous Customers and Accounts
+    try:
+        customers_file = open(os.path.join(directory, "customers.txt"), "r")
+        accounts_file = open(os.path.join(directory, "accounts.txt"), "r")
+        transactions_file = open(os.path.join(directory, "accountsTransactions.txt"), "rb")
+    except IOError:
+        return None
+
+    wanted = None
+    if acc_ids is None:
+        account_records = [line.strip().split() for line in accounts_file]
+        customer_records = [line.strip().split() for line in customers_file]
+    else:
+        # Only the lines of the Accounts asked for are found and split
+        wanted = {acc_id.encode() for acc_id in acc_ids}
+        account_records = find_records(accounts_file, wanted, 0)
+        customer_records = find_records(customers_file, wanted, 4)
+
+    last_trx = 0
+
+    # Index where each account's transactions start in the transactions file
+    offsets = {}
+    last_debits = {}    # Date of the last withdraw or transfer from each account
+    position = 0
+    if wanted is not None:
+        find_transactions(transactions_file, wanted, offsets, last_debits)
+
+        # The highest transaction number is in the IDs file if there is one, otherwise only the number of each line is read
+        if not os.path.exists(IDS_FILE):
+            transactions_file.seek(0)
+            for line in transactions_file:
+                if line.strip():
+                    number = int(line[3:line.find(b" ")])
+                    if last_trx < number:
+                        last_trx = number
+    else:
+        for line in transactions_file:
+            record = line.split(None, 2)
+
+            if record:
+                # To get the max Transaction ID
+                number = int(record[0][3:])
+                if last_trx < number:
+                    last_trx = number
+
+                # record[1] is the Account ID of the transaction
+                if record[1] not in offsets:
+                    offsets[record[1]] = array("q")
+                offsets[record[1]].append(position)
+
+                # record[2] holds the date, type and amount. Only the amount can start with a minus sign.
+                if b" -" in record[2] and record[2].startswith((b"Withdraw", b"Transfer"), 11):
+                    last_debits[record[1]] = record[2][:10]
+
+            position += len(line)
+
+    # Close all the files
+    customers_file.close()
+    accounts_file.close()
+    transactions_file.close()
+
+    # Everything an Account needs goes into its record here, so that building the objects is left with no parsing
+    ready = []
+    for record in account_records:
+        if record:
+            key = record[0].encode()
+            last_debit = date_ordinal(last_debits[key].decode()) if key in last_debits else 0
+            ready.append((record[0], record[1], to_cents(record[2]), offsets.get(key), last_debit))
+    customer_records = [(record[0], record[1], int(record[2]), record[3], record[4])
+                        for record in customer_records if record]
+    return customer_records, ready, last_trx
+
+
+def build_from_text(records, customers, accounts, source):
+    """ Creates the Customer and Account objects from what read_text_files returned. Their transactions are read from source. """
+    customer_records, account_records, last_trx = records
+
+    # Create all the account objects and store them in the accounts dictionary with their ID as the key
+    for acc_id, acc_type, cents, offsets, last_debit in account_records:
+        transactions = None
+        if offsets is not None:
+            transactions = TransactionHistory(source, offsets, len(offsets), acc_id)
+        if acc_type == 'Savings':
+            accounts[acc_id] = SavingAccount(acc_id=acc_id, balance=Money(cents), transactions=transactions,
+                                             last_debit=last_debit)
+        else:
+            accounts[acc_id] = CheckingAccount(acc_id=acc_id, balance=Money(cents), transactions=transactions,
+                                               last_debit=last_debit)
+
+    # Create all the customer objects and store them in the customers dictionary with their ID as the key
+    for customer_id, name, age, pin, acc_id in customer_records:
+        # If the Customer object already exists, add the Account to the customer
+        if customer_id in customers:
+            customers[customer_id].add_acc(accounts[acc_id])
+        # If the Customer object does not exist, create a Customer with the Account
+        else:
+            customers[customer_id] = Customer(customer_id=customer_id, name=name, age=age, pin=pin,
+                                              acc_id=accounts[acc_id])
+
+    transaction_ids.observe(last_trx)
+
+
+def load_text_files(customers, accounts, acc_ids=None):
+    """
+    Creates previous customer objects and Account objects with information from the text files, or only the Accounts in
+    acc_ids and their Customers. Returns False if they could not be opened.
+    """
+    global transaction_source
+
+    records = read_text_files(".", acc_ids)
+    if records is None:
+        print("File could not be opened.")
+        return False
+
+    transaction_source = TextSource()
+    build_from_text(records, customers, accounts, transaction_source)
+    return True
+
+
+def load_shards(customers, accounts, acc_ids=None):
+    """
+    Creates previous customer objects and Account objects from every shard. The files of the shards are read in
+    parallel by a pool of SHARD_WORKERS processes, one shard at a time each, and they hand back records with every
+    field parsed, so only the objects are created here.
+    With a set of acc_ids only the shards holding those Accounts are read, and only they and their Customers are created.
+    Returns False if the files of any shard could not be opened.
+    """
+    global transaction_source, shard_count
+
+    shard_count = existing_shards()
+    if acc_ids is None:
+        directories = [shard_directory(number) for number in range(shard_count)]
+    else:
+        directories = [shard_directory(number) for number in sorted({shard_of(acc_id, shard_count) for acc_id in acc_ids})]
+    workers = min(len(directories), SHARD_WORKERS or os.cpu_count() or 1)
+    if acc_ids is not None:
+        shards = [read_text_files(directory, acc_ids) for directory in directories]
+    elif workers > 1:
+        # Imported here, it takes longer than the rest of the module and only sharded banks need it
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(read_text_files, directories))
+    else:
+        shards = [read_text_files(directory) for directory in directories]
+
+    if any(records is None for records in shards):
+        print("File could not be opened.")
+        return False
+
+    for directory, records in zip(directories, shards):
+        build_from_text(records, customers, accounts, TextSource(os.path.join(directory, "accountsTransactions.txt")))
+
+    transaction_source = None
+    return True
+
+
+def load_binary_snapshot(customers, accounts, path, acc_ids=None):
+    """
+    Creates previous customer objects and Account objects from a binary snapshot, read through a memory map, or only
+    the Accounts in acc_ids and their Customers. Transactions are left in the snapshot until they are first needed.
+    Returns False if the file could not be opened.
+    """
+    global transaction_source
+
+    try:
+        source = BinarySource(path)
+    except (IOError, ValueError):
+        print("File could not be opened.")
+        return False
+    strings = source.strings
+
+    # Create all the customer objects, or only those holding the Accounts asked for once they are found
+    customer_list = []
+    if acc_ids is None:
+        for customer_id, name, age, pin in source.customers():
+            customer = Customer(customer_id=strings[customer_id], name=strings[name], age=age, pin=strings[pin])
+            customers[customer.customer_id] = customer
+            customer_list.append(customer)
+
+    # Create all the account objects, each with the position of its transactions in the snapshot
+    for acc_id, owner, acc_type, balance, first, count, last_debit in source.accounts():
+        acc_id = strings[acc_id]
+        if acc_ids is None:
+            customer = customer_list[owner]
+        elif acc_id in acc_ids:
+            customer_id, name, age, pin = source.customer(owner)
+            if strings[customer_id] not in customers:
+                customers[strings[customer_id]] = Customer(customer_id=strings[customer_id], name=strings[name], age=age,
+                                                           pin=strings[pin])
+            customer = customers[strings[customer_id]]
+        else:
+            continue
+
+        transactions = TransactionHistory(source, (acc_id, first, count), count, acc_id)
+
+        if acc_type == 0:
+            accounts[acc_id] = SavingAccount(acc_id=acc_id, balance=Money(balance), transactions=transactions,
+                                             last_debit=last_debit)
+        else:
+            accounts[acc_id] = CheckingAccount(acc_id=acc_id, balance=Money(balance), transactions=transactions,
+                                               last_debit=last_debit)
+        customer.add_acc(accounts[acc_id])
+
+    transaction_ids.observe(source.last_trx)
+    transaction_source = source
+    return True
+
+
+def read_archive_index(path, acc_ids=None):
+    """
+    Returns the ArchiveBlocks listed in the block index of an archive segment, or None if it could not be read.
+    With a set of acc_ids only the blocks of those Accounts are returned.
+    """
+    try:
+        archive_file = open(path, "rb")
+    except IOError:
+        return None
+
+    magic, version, compression, count, index_offset = ARCHIVE_HEADER.unpack(archive_file.read(ARCHIVE_HEADER.size))
+    if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+        archive_file.close()
+        return None
+    archive_file.seek(index_offset)
+    data = archive_file.read()
+    archive_file.close()
+
+    wanted = None
+    if acc_ids is not None:
+        wanted = {acc_id.encode() for acc_id in acc_ids}
+
+    blocks = []
+    position = 0
+    for _ in range(count):
+        size = data[position]
+        acc_id = data[position + 1:position + 1 + size]
+        position += 1 + size
+        # Entries of other Accounts are stepped over without being unpacked
+        if wanted is None or acc_id in wanted:
+            blocks.append(ArchiveBlock(acc_id.decode(), path, ARCHIVE_COMPRESSION[compression],
+                                       *ARCHIVE_BLOCK.unpack_from(data, position)))
+        position += ARCHIVE_BLOCK.size
+    return blocks
+
+
+def load_archive(accounts, acc_ids=None):
+    """
+    Puts the archived transactions of every archive segment, oldest segment first, in front of their Accounts' histories.
+    With a set of acc_ids only the blocks of those Accounts are read from the block indexes.
+    """
+    if not os.path.isdir(ARCHIVE_DIRECTORY):
+        return
+
+    for name in sorted(os.listdir(ARCHIVE_DIRECTORY)):
+        if not name.endswith(".arc"):
+            continue
+        blocks = read_archive_index(os.path.join(ARCHIVE_DIRECTORY, name), acc_ids)
+        if blocks is None:
+            print("File could not be opened.")
+            continue
+
+        for block in blocks:
+            # Blocks of closed Accounts stay in the archive but are not loaded
+            if block.acc_id in accounts:
+                history = accounts[block.acc_id].transactions
+                if history.archive is EMPTY_ARCHIVE:
+                    history.archive = ArchivedHistory()
+                history.archive.add_block(block)
+
+
+@contextmanager
+def collector_paused():
+    """
+    Turns the cyclic garbage collector off while the bank is loaded. Every object made then lives on, and each
+    collection would go over all of those made before it again.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@metrics.timed("create_bank_obj")
+def create_bank_obj(customers, accounts, acc_ids=None):
+    """
+    Creates previous customer objects and Account objects from the SQLite database if there is one, otherwise from the
+    binary snapshot or the text files and the journal of changes made since the snapshot was written. Archived
+    transactions are put in front of each history from the index of the archive segments.
+    With a set of acc_ids only those Accounts (the ones that are open) and their Customers are created. Changes can be
+    made to them as usual, but a FileStorage then refuses to write a snapshot.
+    The storage they were loaded from keeps every change made from then on.
+    """
+    global storage
+
+    for allocator in ALLOCATORS:
+        allocator.last = 0
+    load_limits(LIMITS_FILE)
+
+    if os.path.exists(DATABASE_FILE):
+        bank_storage = SQLiteStorage(DATABASE_FILE)
+    else:
+        bank_storage = FileStorage()
+    with collector_paused():
+        if not bank_storage.load(customers, accounts, acc_ids):
+            return
+        load_archive(accounts, acc_ids)
+
+        # Start the IDs after the highest ones ever handed out or in use
+        customer_ids.observe(max(map(customer_ids.number, customers), default=0))
+        account_ids.observe(max(map(account_ids.number, accounts), default=0))
+
+        name_index.rebuild(customers)
+    storage = bank_storage
+
+
+def main():
+    """ Main function. """
+
+# =============================================================================================
+#                                   Create Previous Instances
+# =============================================================================================
+
+    customers = {}  # Dictionary to store all the customer objects
+    accounts = {}   # Dictionary to store all the account objects
+
+    create_bank_obj(customers, accounts)
+
+    # Optionally check every balance against its transactions before starting, see reconcile.py
+    if "--reconcile" in sys.argv[1:] and storage is not None:
+        import reconcile
+        reconcile.report(customers)
+        print()
+
+# =============================================================================================
+#                                           Main Menu
+# =============================================================================================
+
+    while True:
+        print("1. Create an Account")
+        print("2. Login to an Account")
+        print("3. Exit")
+
+        choice = ""
+        while choice not in ["1", "2", "3"]:
+            choice = input("Enter your choice: ")
+        print()
+
+        # Choice 1: Create an Account
+        if choice == "1":
+            name = ""
+            age = ""
+            pin = ""
+
+            while not name.isalpha():
+                name = input("Enter your first name (only letters): ")
+
+            while not age.isdigit():
+                age = input("Enter your age: ")
+
+            while len(pin) != 4 or not pin.isdigit():
+                pin = input("Enter a 4-digit PIN: ")
+
+            with bank_lock.shared:
+                unqid = customer_ids.next()
+                journal_append("CUSTOMER", unqid, name, age, pin)
+
+                # Creates a new Customer object and stores it in the customers dictionary with the Customer ID as the key
+                customers[unqid] = Customer(customer_id=unqid, name=name, age=int(age), pin=pin)
+                name_index.add(customers[unqid])
+
+            print("\nAccount created successfully!\n")
+            print(customers[unqid])
+
+        # Choice 2: Login to an Account
+        elif choice == "2":
+            customer_id = input("Enter your ID: ")
+
+            if customer_id in customers:
+
+                if customers[customer_id].pin_verify():
+                    print("Login Successful\n")
+                    menu(customers[customer_id], customers, accounts)  # Main menu function after login
+                else:
+                    print("Wrong PIN entered\n")
+
+            else:
+                print("Account does not exist\n")
+
+        # Choice 3: Exit
+        else:
+            break
+
+        # Every change is already stored, fold the journal into a new snapshot once it has grown large
+        if storage is not None and storage.pending() >= JOURNAL_COMPACT_SIZE:
+            storage.save(customers)
+
+    if storage is not None:
+        storage.save(customers)
+        storage.close()
+
+    print("Thank you for using our services. Exiting Bank...")
+    return
+
+
+# Call the main function when run as a program, so that other scripts can import the bank
+if __name__ == "__main__":
+    main()
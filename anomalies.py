@@ -0,0 +1,469 @@
+"""
+Nightly anomaly scan: flags unusual activity in the transactions of the snapshot and the journal and writes a report,
+ranked by score, to anomalies.txt. Three kinds of activity are flagged:
+    large_transfer  -  A transfer out of an account at least LARGE_SCORE standard deviations above the mean of the
+                       account's previous ROLLING_WINDOW withdraws and transfers out
+    transfer_burst  -  BURST_COUNT or more transfers from one account to the same other account within BURST_DAYS days
+    drained         -  The balance falling below 1 - DRAIN_SHARE of what it was right after a deposit of at least
+                       DRAIN_MINIMUM, within DRAIN_DAYS days of the deposit
+The score tells how far past its threshold each finding is: the standard deviations over LARGE_SCORE, the number of
+transfers over BURST_COUNT, or the amount the balance fell by over DRAIN_MINIMUM.
+
+Transactions are read into NumPy columns. The text files are cut into blocks of whole lines which a pool of processes
+parses in parallel with array operations, never a Python loop over the lines; the binary snapshot and the SQLite
+database are read as columns straight away. The accounts are then split between the processes, which work out the
+rolling statistics of their accounts, again with array operations. Archived transactions are not scanned, only their
+totals from the block index of the archive, which the running balances start from.
+
+    python anomalies.py [--days 1] [--workers 4] [--top 20]
+
+    --days      Report only the activity of the last days days, all of it by default
+    --workers   Number of processes, the number of CPUs by default
+    --top       Number of findings printed, all of them are written to anomalies.txt
+
+Needs NumPy (pip install numpy).
+"""
+import argparse
+import mmap
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+
+import Bank
+
+REPORT_FILE = "anomalies.txt"
+BLOCK_SIZE = 64 << 20           # Bytes of a text file parsed by a process at a time
+ROLLING_WINDOW = 50             # Number of earlier withdraws and transfers out a transfer is compared with
+MINIMUM_HISTORY = 10            # Number of earlier withdraws and transfers out needed to judge a transfer
+MINIMUM_DEVIATION = 100         # Smallest standard deviation used, in cents, so that steady accounts are judged too
+LARGE_SCORE = 4.0               # Standard deviations above the mean from which a transfer is large
+BURST_COUNT = 3                 # Transfers to the same account from which they are a burst
+BURST_DAYS = 1                  # Days the transfers of a burst are made in
+DRAIN_MINIMUM = 100000          # Smallest deposit, in cents, checked for being taken out again
+DRAIN_SHARE = 0.9               # Share of the balance after the deposit taken out from which the account is drained
+DRAIN_DAYS = 2                  # Days after the deposit in which it is taken out
+DATE_BITS = 20                  # Date ordinals fit in this many bits, so (account, date) can be one sortable key
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+KINDS = ["large_transfer", "transfer_burst", "drained"]
+
+# Code of each transaction type by the first letter of its name
+TYPE_CODES = np.zeros(256, dtype=np.uint8)
+for code, name in enumerate(Bank.TRANSACTION_TYPES):
+    TYPE_CODES[ord(name[0])] = code
+DEPOSIT = Bank.TRANSACTION_CODES["Deposit"]
+WITHDRAW = Bank.TRANSACTION_CODES["Withdraw"]
+TRANSFER = Bank.TRANSACTION_CODES["Transfer"]
+
+
+class Columns(object):
+    """
+    Columns class: Transactions as NumPy arrays of the transaction numbers, account numbers (IDs without the prefix),
+    date ordinals, type codes and signed amounts in cents. to is the account number a transfer out went to, or -1.
+    """
+    __slots__ = ("numbers", "accounts", "dates", "types", "cents", "to")
+
+    def __init__(self, numbers, accounts, dates, types, cents, to=None):
+        self.numbers = numbers
+        self.accounts = accounts
+        self.dates = dates
+        self.types = types
+        self.cents = cents
+        self.to = to
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def take(self, index):
+        """ Returns the transactions at index, an array of positions or a slice, as new Columns. """
+        return Columns(self.numbers[index], self.accounts[index], self.dates[index], self.types[index],
+                       self.cents[index], None if self.to is None else self.to[index])
+
+    @staticmethod
+    def empty():
+        """ Returns Columns with no transactions. """
+        empty = np.zeros(0, dtype=np.int64)
+        return Columns(empty, empty, empty, np.zeros(0, dtype=np.uint8), empty)
+
+    @staticmethod
+    def join(parts):
+        """ Returns the transactions of a list of Columns as one. """
+        if not parts:
+            return Columns.empty()
+        return Columns(*(np.concatenate([getattr(part, name) for part in parts]) for name in Columns.__slots__[:5]))
+
+
+def in_days(days):
+    """ Returns a number of days in words, as in "in 2 days". """
+    return "in one day" if days == 1 else "in %d days" % days
+
+
+def parse_digits(buffer, first, last):
+    """ Returns the numbers written in buffer from each position in first up to (not including) the one in last. """
+    width = int((last - first).max(initial=0))
+    values = np.zeros(len(first), dtype=np.int64)
+
+    # One digit of every number at a time, right-aligned, with the places in front of shorter numbers counted as 0
+    for digit in range(width):
+        positions = last - (width - digit)
+        values *= 10
+        values += np.where(positions >= first, buffer[np.maximum(positions, 0)].astype(np.int64) - 48, 0)
+    return values
+
+
+def parse_lines(buffer):
+    """
+    Parses a buffer (NumPy bytes) of whole lines of accountsTransactions.txt, LF or CRLF ended, into Columns.
+    Empty lines are skipped.
+    """
+    ends = np.flatnonzero(buffer == 10)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # Where each line's text stops, before the CR of a CRLF line end
+    lasts = ends - (buffer[np.maximum(ends - 1, 0)] == 13)
+    filled = lasts > starts
+    if not filled.all():
+        starts, ends, lasts = starts[filled], ends[filled], lasts[filled]
+
+    spaces = np.flatnonzero(buffer == 32)
+    if len(spaces) != 4 * len(ends):
+        raise ValueError("a line does not have five fields")
+    spaces = spaces.reshape(-1, 4)
+
+    numbers = parse_digits(buffer, starts + len(Bank.transaction_ids.prefix), spaces[:, 0])
+    accounts = parse_digits(buffer, spaces[:, 0] + 1 + len(Bank.account_ids.prefix), spaces[:, 1])
+
+    # Dates are written as YYYY-MM-DD
+    years = parse_digits(buffer, spaces[:, 1] + 1, spaces[:, 1] + 5)
+    months = parse_digits(buffer, spaces[:, 1] + 6, spaces[:, 1] + 8)
+    days = parse_digits(buffer, spaces[:, 1] + 9, spaces[:, 1] + 11)
+    dates = ((years - 1970) * 12 + months - 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    dates += days - 1 + EPOCH_ORDINAL
+
+    types = TYPE_CODES[buffer[spaces[:, 2] + 1]]
+
+    # Amounts are a sign, whole units and up to two decimals, such as +1000.0 or -12.50
+    dots = lasts.copy()
+    found = np.flatnonzero(buffer == 46)
+    dots[np.searchsorted(ends, found)] = found
+    units = parse_digits(buffer, spaces[:, 3] + 2, dots)
+    decimals = np.clip(np.minimum(lasts, dots + 3) - dots - 1, 0, None)
+    fractions = parse_digits(buffer, dots + 1, dots + 1 + decimals) * 10 ** (2 - decimals)
+    cents = np.where(buffer[spaces[:, 3] + 1] == 45, -1, 1) * (units * 100 + fractions)
+    return Columns(numbers, accounts, dates, types, cents)
+
+
+def text_blocks(path, size=BLOCK_SIZE):
+    """ Returns (path, start, end) for blocks of whole lines of about size bytes that make up a text file. """
+    blocks = []
+    text_file = open(path, "rb")
+    length = os.fstat(text_file.fileno()).st_size
+    start = 0
+    while start < length:
+        text_file.seek(min(start + size, length))
+        text_file.readline()
+        end = min(text_file.tell(), length)
+        blocks.append((path, start, end))
+        start = end
+    text_file.close()
+    return blocks
+
+
+def parse_block(block):
+    """ Parses a block of a text file, given by text_blocks, in a worker process. """
+    path, start, end = block
+    text_file = open(path, "rb")
+    text_map = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = np.frombuffer(text_map, dtype=np.uint8, count=end - start, offset=start)
+    if end > start and buffer[-1] != 10:
+        buffer = np.append(buffer, np.uint8(10))
+    columns = parse_lines(buffer)
+    del buffer
+    text_map.close()
+    text_file.close()
+    return columns
+
+
+def read_binary(path):
+    """ Reads the transactions of a binary snapshot into Columns, straight from its columns. """
+    source = Bank.BinarySource(path)
+    count = source.n_transactions
+    numbers = np.frombuffer(source.map, dtype="<i8", count=count, offset=source.numbers_start).astype(np.int64)
+    dates = np.frombuffer(source.map, dtype="<i4", count=count, offset=source.dates_start).astype(np.int64)
+    types = np.frombuffer(source.map, dtype=np.uint8, count=count, offset=source.types_start).copy()
+    cents = np.frombuffer(source.map, dtype="<i8", count=count, offset=source.cents_start).astype(np.int64)
+
+    # Each Account's transactions are stored together, from its first one
+    accounts = np.zeros(count, dtype=np.int64)
+    for acc_id, owner, acc_type, balance, first, stored, last_debit in source.accounts():
+        accounts[first:first + stored] = Bank.account_ids.number(source.strings[acc_id])
+    source.close()
+    return Columns(numbers, accounts, dates, types, cents)
+
+
+def read_database(path):
+    """ Reads the transactions of the SQLite database into Columns. """
+    connection = sqlite3.connect(path)
+    rows = np.array(connection.execute("SELECT number, CAST(SUBSTR(acc_id, ?) AS INTEGER), date, type, cents "
+                                       "FROM transactions", (len(Bank.account_ids.prefix) + 1,)).fetchall(),
+                    dtype=np.int64).reshape(-1, 5)
+    connection.close()
+    return Columns(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3].astype(np.uint8), rows[:, 4])
+
+
+def read_journal(path):
+    """ Reads the transactions in the journal records into Columns. There are few of them, so they are parsed one by one. """
+    fields = []
+    try:
+        journal_file = open(path, "r")
+    except IOError:
+        return None
+    for line in journal_file:
+        record = line.split()
+        if record and record[0] == "TRX" and line.endswith("\n"):
+            for index in range(1, len(record), 5):
+                number, acc_id, day, trx_type, amount = record[index:index + 5]
+                fields.append((Bank.transaction_ids.number(number), Bank.account_ids.number(acc_id),
+                               Bank.date_ordinal(day), Bank.TRANSACTION_CODES[trx_type], Bank.to_cents(amount)))
+    journal_file.close()
+
+    rows = np.array(fields, dtype=np.int64).reshape(-1, 5)
+    return Columns(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3].astype(np.uint8), rows[:, 4])
+
+
+def read_transactions(pool):
+    """ Reads every transaction of the bank, from its database or its snapshot and journal, into Columns. """
+    if os.path.exists(Bank.DATABASE_FILE):
+        return read_database(Bank.DATABASE_FILE)
+
+    snapshot_format = Bank.current_format()
+    if snapshot_format == "binary":
+        parts = [read_binary(Bank.BINARY_SNAPSHOT)]
+    else:
+        if snapshot_format == "sharded":
+            paths = [os.path.join(Bank.shard_directory(number), Bank.TEXT_FILES[2])
+                     for number in range(Bank.existing_shards())]
+        else:
+            paths = [Bank.TEXT_FILES[2]]
+        blocks = [block for path in paths for block in text_blocks(path)]
+        parts = list(pool.map(parse_block, blocks)) if pool is not None else [parse_block(block) for block in blocks]
+
+    journal = read_journal(Bank.JOURNAL_FILE)
+    if journal is not None:
+        parts.append(journal)
+    return Columns.join(parts)
+
+
+def read_archived_totals():
+    """ Returns NumPy arrays of the numbers of the accounts with archived transactions, sorted, and their totals. """
+    totals = {}
+    if os.path.isdir(Bank.ARCHIVE_DIRECTORY):
+        for name in sorted(os.listdir(Bank.ARCHIVE_DIRECTORY)):
+            if not name.endswith(".arc"):
+                continue
+            blocks = Bank.read_archive_index(os.path.join(Bank.ARCHIVE_DIRECTORY, name))
+            if blocks is None:
+                raise IOError("archive segment " + name + " could not be read")
+            for block in blocks:
+                number = Bank.account_ids.number(block.acc_id)
+                totals[number] = totals.get(number, 0) + block.total
+
+    numbers = np.array(sorted(totals), dtype=np.int64)
+    return numbers, np.array([totals[number] for number in numbers.tolist()], dtype=np.int64)
+
+
+def pair_transfers(columns):
+    """ Sets columns.to: each transfer out is matched with the transfer in numbered right after it, on the same day. """
+    columns.to = np.full(len(columns), -1, dtype=np.int64)
+    transfers = np.flatnonzero(columns.types == TRANSFER)
+    transfers = transfers[np.argsort(columns.numbers[transfers], kind="stable")]
+    sent = transfers[:-1]
+    received = transfers[1:]
+    matched = ((columns.numbers[received] == columns.numbers[sent] + 1) & (columns.cents[sent] < 0) &
+               (columns.cents[received] == -columns.cents[sent]) & (columns.dates[received] == columns.dates[sent]))
+    columns.to[sent[matched]] = columns.accounts[received[matched]]
+
+
+def group_starts(keys):
+    """ Returns, for each position in a sorted array, the position where its run of equal keys starts. """
+    positions = np.arange(len(keys))
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return np.maximum.accumulate(np.where(first, positions, 0))
+
+
+def large_transfers(columns):
+    """ Returns the findings of transfers out far above the account's earlier withdraws and transfers out. """
+    debits = np.flatnonzero((columns.cents < 0) & ((columns.types == WITHDRAW) | (columns.types == TRANSFER)))
+    amounts = -columns.cents[debits].astype(np.float64)
+    positions = np.arange(len(debits))
+    window_start = np.maximum(group_starts(columns.accounts[debits]), positions - ROLLING_WINDOW)
+    earlier = positions - window_start
+
+    # Mean and standard deviation of the earlier amounts from running sums
+    sums = np.concatenate(([0.0], np.cumsum(amounts)))
+    squares = np.concatenate(([0.0], np.cumsum(amounts * amounts)))
+    judged = (earlier >= MINIMUM_HISTORY) & (columns.types[debits] == TRANSFER)
+    count = np.where(judged, earlier, 1)
+    means = (sums[positions] - sums[window_start]) / count
+    deviations = np.sqrt(np.maximum((squares[positions] - squares[window_start]) / count - means * means, 0))
+    scores = (amounts - means) / np.maximum(deviations, MINIMUM_DEVIATION)
+
+    found = np.flatnonzero(judged & (scores >= LARGE_SCORE))
+    return [(score / LARGE_SCORE, 0, index,
+             "%s out, mean %s of the last %d" % (Bank.Money(amount), Bank.Money(mean), count))
+            for score, index, amount, mean, count in zip(scores[found].tolist(), debits[found].tolist(),
+                                                         amounts[found].astype(np.int64).tolist(),
+                                                         np.rint(means[found]).astype(np.int64).tolist(),
+                                                         earlier[found].tolist())]
+
+
+def transfer_bursts(columns):
+    """ Returns a finding for each pair of accounts with a burst of transfers between them, at its largest. """
+    sent = np.flatnonzero(columns.to >= 0)
+    sent = sent[np.lexsort((columns.numbers[sent], columns.dates[sent], columns.to[sent], columns.accounts[sent]))]
+    senders = columns.accounts[sent]
+    receivers = columns.to[sent]
+    new_pair = np.ones(len(sent), dtype=bool)
+    new_pair[1:] = (senders[1:] != senders[:-1]) | (receivers[1:] != receivers[:-1])
+    pairs = np.cumsum(new_pair)
+    keys = (pairs << DATE_BITS) | columns.dates[sent]
+
+    # Transfers of the pair made in the BURST_DAYS days up to each one
+    counts = np.arange(len(sent)) - np.searchsorted(keys, keys - (BURST_DAYS - 1), "left") + 1
+    burst = np.flatnonzero(counts >= BURST_COUNT)
+
+    # Only the largest burst of each pair
+    largest = burst[np.lexsort((counts[burst], pairs[burst]))]
+    last = np.ones(len(largest), dtype=bool)
+    last[:-1] = pairs[largest][1:] != pairs[largest][:-1]
+    largest = largest[last]
+    return [(count / BURST_COUNT, 1, index,
+             "%d transfers to %s %s" % (count, Bank.account_ids.format(to), in_days(BURST_DAYS)))
+            for count, index, to in zip(counts[largest].tolist(), sent[largest].tolist(),
+                                        columns.to[sent[largest]].tolist())]
+
+
+def drained_accounts(columns, archived):
+    """
+    Returns the findings of balances that fell far below what they were right after a large deposit, within a few days.
+    Columns are sorted by account and date. archived holds the sorted account numbers and archived totals in cents that
+    the running balances start from, see read_archived_totals.
+    """
+    keys = (columns.accounts << DATE_BITS) | columns.dates
+    deposits = np.flatnonzero((columns.types == DEPOSIT) & (columns.cents >= DRAIN_MINIMUM))
+    if len(deposits) == 0:
+        return []
+
+    # Running balance of each account after each transaction
+    running = np.concatenate(([0], np.cumsum(columns.cents)))
+    starts = group_starts(columns.accounts)
+    numbers, totals = archived
+    positions = np.minimum(np.searchsorted(numbers, columns.accounts), max(len(numbers) - 1, 0))
+    opening = np.where(numbers[positions] == columns.accounts, totals[positions], 0) if len(numbers) else 0
+    balances = running[1:] - running[starts] + opening
+
+    # Lowest balance from the transaction after each deposit up to the end of its DRAIN_DAYS days
+    firsts = deposits + 1
+    ends = np.searchsorted(keys, keys[deposits] + DRAIN_DAYS, "right")
+    bounds = np.empty(2 * len(deposits), dtype=np.int64)
+    bounds[0::2] = firsts
+    bounds[1::2] = ends
+    lowest = np.minimum.reduceat(np.append(balances, 0), bounds)[0::2]
+
+    after = balances[deposits]
+    fallen = after - lowest
+    found = np.flatnonzero((ends > firsts) & (after > 0) & (lowest < (1 - DRAIN_SHARE) * after))
+    return [(amount / DRAIN_MINIMUM, 2, index, "balance down from %s to %s %s after a %s deposit" %
+             (Bank.Money(balance), Bank.Money(balance - amount), in_days(DRAIN_DAYS), Bank.Money(deposit)))
+            for amount, index, balance, deposit in zip(fallen[found].tolist(), deposits[found].tolist(),
+                                                       after[found].tolist(), columns.cents[deposits[found]].tolist())]
+
+
+def scan(task):
+    """
+    Scans the transactions of some accounts, sorted by account, date and number, in a worker process. Returns
+    (score, kind, account number, date ordinal, transaction number, details) for each finding dated from since on.
+    """
+    columns, since, archived = task
+    findings = []
+    for finding in large_transfers(columns) + transfer_bursts(columns) + drained_accounts(columns, archived):
+        score, kind, index, details = finding
+        if columns.dates[index] >= since:
+            findings.append((score, kind, int(columns.accounts[index]), int(columns.dates[index]),
+                             int(columns.numbers[index]), details))
+    return findings
+
+
+def split_accounts(columns, parts):
+    """ Returns slices of the sorted columns, about parts of them, that each hold all the transactions of their accounts. """
+    targets = np.linspace(0, len(columns), parts + 1)[1:-1].astype(np.int64)
+    cuts = np.searchsorted(columns.accounts, columns.accounts[targets])
+    bounds = np.unique(np.concatenate(([0], cuts, [len(columns)])))
+    return [slice(start, end) for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()) if end > start]
+
+
+def find_anomalies(workers=None, days=None):
+    """ Scans every transaction of the bank. Returns the findings, highest score first, and the number of transactions. """
+    workers = workers or os.cpu_count() or 1
+    since = date.today().toordinal() - days + 1 if days else 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        columns = read_transactions(pool)
+        if len(columns) == 0:
+            return [], 0
+        pair_transfers(columns)
+        columns = columns.take(np.lexsort((columns.numbers, columns.dates, columns.accounts)))
+
+        archived = read_archived_totals()
+        tasks = [(columns.take(part), since, archived) for part in split_accounts(columns, 4 * workers)]
+        if pool is not None:
+            results = pool.map(scan, tasks)
+        else:
+            results = map(scan, tasks)
+        findings = [finding for result in results for finding in result]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    findings.sort(key=lambda finding: -finding[0])
+    return findings, len(columns)
+
+
+def report_line(rank, finding):
+    """ Returns the line of the report for a finding. """
+    score, kind, account, ordinal, number, details = finding
+    return "%5d %8.2f  %-15s %-8s %s %-10s %s" % (rank, score, KINDS[kind], Bank.account_ids.format(account),
+                                                  Bank.date_string(ordinal), Bank.transaction_ids.format(number),
+                                                  details)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flags unusual activity in the transactions")
+    parser.add_argument("--days", type=int, help="report only the activity of the last days days")
+    parser.add_argument("--workers", type=int, help="number of processes, the number of CPUs by default")
+    parser.add_argument("--top", type=int, default=20, help="number of findings printed")
+    args = parser.parse_args()
+
+    try:
+        findings, scanned = find_anomalies(args.workers, args.days)
+    except (IOError, ValueError) as error:
+        print("Transactions could not be read: " + str(error))
+        return 2
+
+    report_file = open(REPORT_FILE, "w")
+    for rank, finding in enumerate(findings, 1):
+        print(report_line(rank, finding), file=report_file)
+    report_file.close()
+
+    for rank, finding in enumerate(findings[:args.top], 1):
+        print(report_line(rank, finding))
+    print("Scanned %d transactions, %d findings written to %s" % (scanned, len(findings), REPORT_FILE))
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Archives old transactions: moves every transaction older than a number of days out of the snapshot into a new
+compressed archive segment in archive/.
+
+A segment holds blocks of up to ARCHIVE_BLOCK_SIZE transactions of one Account each, compressed with zlib or lzma, and
+ends with a block index giving the Account, dates, number and total of the transactions in each block. Only the index is
+read at launch, so each Account keeps just the number and total of its archived transactions (carried forward into its
+statements) and its recent transactions in the snapshot. Statements and exports read the archived blocks they need
+through the index, one block at a time. The date of the last withdraw or transfer is kept with each Account, so the 30
+days rule of Savings Accounts never needs the archive, and at least 30 days are always kept in the snapshot.
+
+The segment is written as a .tmp file and only takes its place together with the new snapshot, so a crash leaves the
+transactions either in the archive or in the snapshot, never both or neither.
+
+    python archive.py [--days 365] [--compression zlib|lzma]
+"""
+import argparse
+import lzma
+import os
+import sys
+import zlib
+from bisect import bisect_left
+from datetime import date
+
+import Bank
+
+ARCHIVE_AGE = 365       # Default number of days of transactions kept in the snapshot
+MINIMUM_AGE = 30        # The 30 days rule of Savings Accounts looks this far back
+
+
+def next_segment_path():
+    """ Returns the path of the next archive segment, numbered after the existing ones. """
+    numbers = [int(name[8:12]) for name in os.listdir(Bank.ARCHIVE_DIRECTORY)
+               if name.startswith("segment-") and name.endswith(".arc")]
+    return os.path.join(Bank.ARCHIVE_DIRECTORY, "segment-%04d.arc" % (max(numbers, default=0) + 1))
+
+
+def hot_ledger(history):
+    """ Returns one Ledger with all of the history's transactions that are not archived yet. """
+    transactions = Bank.Ledger(history.acc_id)
+    for ledger in history.ledgers():
+        transactions.numbers.extend(ledger.numbers)
+        transactions.dates.extend(ledger.dates)
+        transactions.types.extend(ledger.types)
+        transactions.cents.extend(ledger.cents)
+    return transactions
+
+
+def compress(data, compression):
+    """ Compresses a block with the named compression. """
+    if compression == "lzma":
+        return lzma.compress(data)
+    return zlib.compress(data, 6)
+
+
+def archive_transactions(customers, cutoff, compression="zlib", block_size=Bank.ARCHIVE_BLOCK_SIZE):
+    """
+    Writes every transaction dated before the cutoff date ordinal to a new archive segment, as a .tmp file, and leaves
+    only the later ones in each history, in memory until the next snapshot is written. Returns the number of
+    transactions archived. The segment is removed again if there are none.
+    """
+    os.makedirs(Bank.ARCHIVE_DIRECTORY, exist_ok=True)
+    path = next_segment_path()
+    archive_file = open(path + ".tmp", "wb")
+    archive_file.write(Bank.ARCHIVE_HEADER.pack(Bank.ARCHIVE_MAGIC, Bank.ARCHIVE_VERSION, 0, 0, 0))
+    position = Bank.ARCHIVE_HEADER.size
+    index = []
+    archived = 0
+
+    for key in customers:
+        for acc in customers[key].accounts:
+            history = acc.transactions
+            transactions = hot_ledger(history)
+            split = bisect_left(transactions.dates, cutoff)
+            if split == 0:
+                continue
+
+            if history.archive is Bank.EMPTY_ARCHIVE:
+                history.archive = Bank.ArchivedHistory()
+            for start in range(0, split, block_size):
+                end = min(start + block_size, split)
+                data = compress(transactions.numbers[start:end].tobytes() + transactions.dates[start:end].tobytes() +
+                                transactions.types[start:end].tobytes() + transactions.cents[start:end].tobytes(),
+                                compression)
+                archive_file.write(data)
+
+                block = Bank.ArchiveBlock(acc.acc_id, path, compression, position, len(data), end - start,
+                                          transactions.dates[start], transactions.dates[end - 1],
+                                          sum(transactions.cents[start:end]))
+                history.archive.add_block(block)
+                index.append(block)
+                position += len(data)
+
+            # The rest stays in memory until the snapshot written next holds it
+            recent = Bank.Ledger(acc.acc_id)
+            recent.numbers = transactions.numbers[split:]
+            recent.dates = transactions.dates[split:]
+            recent.types = transactions.types[split:]
+            recent.cents = transactions.cents[split:]
+            Bank.history_cache.discard(history)
+            history.source = None
+            history.stored = 0
+            history.new = recent
+            archived += split
+
+    # The block index, then the header again now that it is known where the index starts
+    for block in index:
+        acc_id = block.acc_id.encode()
+        archive_file.write(bytes([len(acc_id)]) + acc_id)
+        archive_file.write(Bank.ARCHIVE_BLOCK.pack(block.offset, block.length, block.count, block.first, block.last,
+                                                   block.total))
+    archive_file.seek(0)
+    archive_file.write(Bank.ARCHIVE_HEADER.pack(Bank.ARCHIVE_MAGIC, Bank.ARCHIVE_VERSION,
+                                                Bank.ARCHIVE_COMPRESSION.index(compression), len(index), position))
+    archive_file.flush()
+    os.fsync(archive_file.fileno())
+    archive_file.close()
+
+    if archived == 0:
+        os.remove(path + ".tmp")
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moves old transactions into a compressed archive segment")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AGE, help="days of transactions to keep in the snapshot")
+    parser.add_argument("--compression", choices=Bank.ARCHIVE_COMPRESSION, default="zlib")
+    args = parser.parse_args()
+
+    if args.days < MINIMUM_AGE:
+        print("At least %d days must be kept for the savings withdraw rule" % MINIMUM_AGE)
+        return 1
+
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return 1
+    if isinstance(Bank.storage, Bank.SQLiteStorage):
+        print("The SQLite database keeps its history in indexed tables, archiving works on the snapshot files")
+        Bank.storage.close()
+        return 1
+
+    with Bank.bank_lock.exclusive:
+        archived = archive_transactions(customers, date.today().toordinal() - args.days, args.compression)
+
+    # Every shard may have lost transactions to the archive
+    Bank.dirty_shards.update(range(Bank.shard_count))
+
+    # The segment takes its place together with the snapshot that no longer holds its transactions
+    if archived:
+        Bank.storage.save(customers)
+    Bank.storage.close()
+
+    print("Archived %d transactions older than %s" % (archived, date.fromordinal(date.today().toordinal() - args.days)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
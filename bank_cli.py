@@ -0,0 +1,152 @@
+"""
+Non-interactive command line for scripts: one operation per call, with no prompts.
+
+Each command loads only the Accounts it names (and their Customers), not the whole bank: from the SQLite database
+through its keys, from the binary snapshot by its fixed-width records, or from the text files of just the shard holding
+the Account. The journal of changes since the last snapshot is replayed for those Accounts only. Changes are made with
+the same rules as the menu and journaled as usual. Once the journal has grown to JOURNAL_COMPACT_SIZE records, the
+command that finds it so loads the whole bank once to fold it into a new snapshot.
+
+    python bank_cli.py balance AC001
+    python bank_cli.py deposit AC001 100
+    python bank_cli.py withdraw AC001 50
+    python bank_cli.py transfer AC001 AC002 25
+    python bank_cli.py history AC001 [--count 5]
+    python bank_cli.py statement AC001 2021-10-01 2021-12-31
+
+Add --json before the command for one line of JSON instead of text. Exits with 0 on success, 1 if the operation was
+turned away by the rules and 2 if the Account does not exist or the bank could not be loaded. Commands must not run at
+the same time as each other, the menu or the server.
+"""
+import argparse
+import json
+import sys
+
+import Bank
+
+
+def load_accounts(acc_ids):
+    """ Loads the open Accounts with the given IDs. Returns the accounts dictionary, or None if the bank could not be loaded. """
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts, set(acc_ids))
+    if Bank.storage is None:
+        return None
+    return accounts
+
+
+def compact():
+    """ Folds a long journal into a new snapshot, which needs the whole bank to be loaded. """
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+    if Bank.storage is not None:
+        Bank.storage.save(customers)
+        Bank.storage.close()
+
+
+def run(args, accounts):
+    """ Runs a command on the loaded Accounts. Returns what to print, or raises TransactionError. """
+    acc = accounts[args.account]
+
+    if args.command == "balance":
+        return {"account": acc.acc_id, "balance": "%.2f" % acc.balance}
+
+    if args.command == "deposit":
+        return {"account": acc.acc_id, "transactions": [acc.post_deposit(Bank.parse_amount(args.amount))[0]],
+                "balance": "%.2f" % acc.balance}
+
+    if args.command == "withdraw":
+        return {"account": acc.acc_id, "transactions": [acc.post_withdraw(Bank.parse_amount(args.amount))[0]],
+                "balance": "%.2f" % acc.balance}
+
+    if args.command == "transfer":
+        sent, received = acc.post_transfer(Bank.parse_amount(args.amount), accounts[args.to])
+        return {"account": acc.acc_id, "transactions": [sent[0], received[0]], "balance": "%.2f" % acc.balance}
+
+    if args.command == "history":
+        return {"account": acc.acc_id, "history": [list(transaction) for transaction in
+                                                   Bank.storage.history(acc, args.count)]}
+
+    try:
+        statement = acc.statement(args.first, args.last)
+    except ValueError:
+        raise Bank.TransactionError("invalid_date", "Dates must be given as YYYY-MM-DD")
+    return {"account": acc.acc_id, "opening_balance": "%.2f" % statement.opening_balance,
+            "closing_balance": "%.2f" % statement.closing_balance,
+            "history": [list(transaction) for transaction in statement.transactions[statement.start:statement.end]]}
+
+
+def print_result(result):
+    """ Prints the result of a command as text. """
+    if "opening_balance" in result:
+        print("Opening Balance: " + result["opening_balance"])
+    for transaction in result.get("history", []):
+        print(" ".join(transaction))
+    if "opening_balance" in result:
+        print("Closing Balance: " + result["closing_balance"])
+    for trx_id in result.get("transactions", []):
+        print(trx_id)
+    if "balance" in result:
+        print(result["balance"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs one bank operation without any prompts")
+    parser.add_argument("--json", action="store_true", help="print one line of JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("balance", help="print the balance of an account")
+    command.add_argument("account")
+    for name in ["deposit", "withdraw"]:
+        command = commands.add_parser(name, help=name + " an amount")
+        command.add_argument("account")
+        command.add_argument("amount")
+    command = commands.add_parser("transfer", help="transfer an amount to another account")
+    command.add_argument("account")
+    command.add_argument("to")
+    command.add_argument("amount")
+    command = commands.add_parser("history", help="print the last transactions, most recent first")
+    command.add_argument("account")
+    command.add_argument("--count", type=int, default=5)
+    command = commands.add_parser("statement", help="print the transactions between two dates")
+    command.add_argument("account")
+    command.add_argument("first")
+    command.add_argument("last")
+    args = parser.parse_args()
+
+    acc_ids = [args.account] + ([args.to] if args.command == "transfer" else [])
+    accounts = load_accounts(acc_ids)
+    if accounts is None:
+        return 2
+
+    status = 0
+    missing = [acc_id for acc_id in acc_ids if acc_id not in accounts]
+    if missing:
+        result = {"status": "error", "reason": "unknown_account", "message": "Account does not exist: " + missing[0]}
+        status = 2
+    else:
+        try:
+            result = run(args, accounts)
+        except Bank.TransactionError as error:
+            result = {"status": "error", "reason": error.reason, "message": str(error)}
+            status = 1
+
+    pending = Bank.storage.pending() if isinstance(Bank.storage, Bank.FileStorage) else 0
+    Bank.storage.close()
+    if pending >= Bank.JOURNAL_COMPACT_SIZE:
+        compact()
+
+    if args.json:
+        if status == 0:
+            result["status"] = "ok"
+        print(json.dumps(result))
+    elif status == 0:
+        print_result(result)
+    else:
+        print(result["message"], file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Posts a file of deposits, withdrawals and transfers, such as a payroll or settlement file, without any prompts.
+
+The file is CSV with a header row, or JSON Lines (one object per line) if its name ends in .jsonl. Each operation has:
+    op       -  deposit, withdraw or transfer
+    account  -  Account ID the money goes into (deposit) or comes out of (withdraw and transfer)
+    amount   -  Positive amount
+    to       -  Account ID the money goes to, for transfers only
+
+Each operation is checked with the same rules as the menu, and a result is written for it as a line of JSON:
+    {"row": 1, "status": "ok", "transactions": ["TRX012"]}
+    {"row": 2, "status": "error", "reason": "insufficient_funds", "message": "Sorry, you can't withdraw that much"}
+
+Changes are written out once, after the whole file has been posted: the journal in one go, or one SQLite commit.
+
+    python batch.py payroll.csv [results.jsonl]
+"""
+import csv
+import json
+import sys
+from datetime import date
+
+import Bank
+
+OPERATIONS = ["deposit", "withdraw", "transfer"]
+
+
+def read_operations(stream, jsonl=False):
+    """ Yields each operation in a CSV or JSON Lines stream as a dictionary, or None for a line that is not a JSON object. """
+    if jsonl:
+        for line in stream:
+            if line.strip():
+                try:
+                    operation = json.loads(line)
+                except ValueError:
+                    operation = None
+                yield operation if isinstance(operation, dict) else None
+    else:
+        # Like csv.DictReader, without its cost for each row
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        for row in reader:
+            if row:
+                yield dict(zip(header, row))
+
+
+def post_operation(operation, accounts, today):
+    """ Posts one operation dated today (a date string). Returns the IDs of the transactions made, or raises TransactionError. """
+    if operation is None:
+        raise Bank.TransactionError("bad_request", "Row is not a JSON object")
+    op = operation.get("op")
+    if op not in OPERATIONS:
+        raise Bank.TransactionError("invalid_operation", "Unknown operation: " + str(op))
+
+    # Closed accounts stay in accounts without an owner
+    acc = accounts.get(operation.get("account"))
+    if acc is None or acc.owner is None:
+        raise Bank.TransactionError("unknown_account", "Account does not exist")
+
+    amount = Bank.parse_amount(operation.get("amount"))
+
+    if op == "deposit":
+        acc.check_amount(amount, "deposit")
+        return [acc.apply_deposit(amount, today)[0]]
+    if op == "withdraw":
+        return [acc.apply_withdraw(amount, today)[0]]
+
+    receiver_acc = accounts.get(operation.get("to"))
+    if receiver_acc is None or receiver_acc.owner is None:
+        raise Bank.TransactionError("unknown_account", "Receiving account does not exist")
+    if receiver_acc is acc:
+        raise Bank.TransactionError("same_account", "You can't transfer to the same account")
+    sent, received = acc.apply_transfer(amount, receiver_acc, today)
+    return [sent[0], received[0]]
+
+
+def post_operations(operations, accounts):
+    """
+    Posts each operation in turn and yields a result dictionary for each, numbering the rows from 1.
+    The bank is locked once for the whole file rather than for each operation, and every operation is dated the day the
+    posting started.
+    """
+    today = str(date.today())
+    with Bank.bank_lock.exclusive:
+        for row, operation in enumerate(operations, 1):
+            try:
+                transactions = post_operation(operation, accounts, today)
+            except Bank.TransactionError as error:
+                yield {"row": row, "status": "error", "reason": error.reason, "message": str(error).strip()}
+            else:
+                yield {"row": row, "status": "ok", "transactions": transactions}
+
+
+def format_result(result):
+    """ Returns a result as a line of JSON. Transaction IDs need no escaping, so the rows that were posted are formatted directly. """
+    if result["status"] == "ok":
+        return '{"row": %d, "status": "ok", "transactions": ["%s"]}\n' % (result["row"], '", "'.join(result["transactions"]))
+    return json.dumps(result) + "\n"
+
+
+def main():
+    """ Loads the bank, posts the file given on the command line and saves the bank once at the end. """
+    if len(sys.argv) not in [2, 3]:
+        print(__doc__)
+        return 1
+
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return 1
+
+    # Changes are only written out in one go at the end
+    Bank.storage.autoflush = False
+
+    operations_file = open(sys.argv[1], "r", newline="")
+    if len(sys.argv) == 3:
+        results_file = open(sys.argv[2], "w")
+    else:
+        results_file = sys.stdout
+
+    posted = 0
+    failed = 0
+    for result in post_operations(read_operations(operations_file, sys.argv[1].endswith(".jsonl")), accounts):
+        if result["status"] == "ok":
+            posted += 1
+        else:
+            failed += 1
+        results_file.write(format_result(result))
+
+    operations_file.close()
+    if results_file is not sys.stdout:
+        results_file.close()
+
+    Bank.storage.flush()
+    if Bank.storage.pending() >= Bank.JOURNAL_COMPACT_SIZE:
+        Bank.storage.save(customers)
+    Bank.storage.close()
+
+    print("Posted %d operations, %d failed" % (posted, failed), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
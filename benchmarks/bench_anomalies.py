@@ -0,0 +1,99 @@
+"""
+Measures the anomaly scan of anomalies.py: reading the transactions into NumPy columns and scanning them, in
+transactions per second. A bank is generated in a temporary directory, and its transactions file is repeated to reach
+the number of rows asked for, with the transaction numbers of each copy moved past the ones before.
+
+First the parser is checked against the sample transactions that come with the bank, whose lines end in CRLF: every
+column must match the lines read one by one with Bank's own functions, also with empty lines put among them.
+
+    python benchmarks/bench_anomalies.py [--transactions 1000000] [--rows 10000000] [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import anomalies  # noqa: E402
+import generate_bank  # noqa: E402
+import Bank  # noqa: E402
+
+
+def repeat_transactions(path, rows, generated):
+    """ Appends copies of the generated transactions to the file until it holds at least rows lines. """
+    lines = open(path, "r").readlines()
+    transactions_file = open(path, "a")
+    copy = 1
+    while (copy + 1) * generated <= rows:
+        shift = copy * generated
+        for line in lines:
+            number, rest = line.split(" ", 1)
+            transactions_file.write(Bank.transaction_ids.format(Bank.transaction_ids.number(number) + shift) + " " + rest)
+        copy += 1
+    transactions_file.close()
+    return copy * generated
+
+
+def check_sample():
+    """ Parses the sample accountsTransactions.txt with anomalies.py and compares it with the lines read by Bank. """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", Bank.TEXT_FILES[2])
+    columns = anomalies.parse_block((path, 0, os.path.getsize(path)))
+
+    transactions_file = open(path, "r")
+    records = [line.split() for line in transactions_file if line.strip()]
+    transactions_file.close()
+
+    assert columns.numbers.tolist() == [Bank.transaction_ids.number(record[0]) for record in records], "numbers"
+    assert columns.accounts.tolist() == [Bank.account_ids.number(record[1]) for record in records], "accounts"
+    assert columns.dates.tolist() == [Bank.date_ordinal(record[2]) for record in records], "dates"
+    assert columns.types.tolist() == [Bank.TRANSACTION_CODES[record[3]] for record in records], "types"
+    assert columns.cents.tolist() == [Bank.to_cents(record[4]) for record in records], "amounts"
+    print("Sample transactions parsed the same as by Bank: %d rows" % len(records))
+
+    # Empty lines, LF or CRLF ended, are skipped
+    sample_file = open(path, "rb")
+    data = sample_file.read()
+    sample_file.close()
+    handle, spaced = tempfile.mkstemp(suffix=".txt")
+    os.write(handle, b"\n" + data.replace(b"\r\n", b"\r\n\r\n\n", 3) + b"\n")
+    os.close(handle)
+    spaced_columns = anomalies.parse_block((spaced, 0, os.path.getsize(spaced)))
+    os.remove(spaced)
+    for name in ["numbers", "accounts", "dates", "types", "cents"]:
+        assert getattr(spaced_columns, name).tolist() == getattr(columns, name).tolist(), "empty lines: " + name
+    print("Empty lines are skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the anomaly scan")
+    parser.add_argument("--transactions", type=int, default=1000000, help="transactions in the generated bank")
+    parser.add_argument("--rows", type=int, default=10000000, help="rows scanned, repeating the generated ones")
+    parser.add_argument("--workers", type=int, help="number of processes, the number of CPUs by default")
+    args = parser.parse_args()
+
+    check_sample()
+
+    directory = tempfile.mkdtemp(prefix="bank-anomalies-")
+    generated = generate_bank.generate(directory, 10000, 2, args.transactions)
+    os.chdir(directory)
+    try:
+        rows = repeat_transactions(Bank.TEXT_FILES[2], args.rows, generated)
+        size = os.path.getsize(Bank.TEXT_FILES[2])
+
+        start = time.perf_counter()
+        findings, scanned = anomalies.find_anomalies(args.workers)
+        elapsed = time.perf_counter() - start
+
+        assert scanned == rows, "not every row was read"
+        print("%d rows (%.0f MB) scanned in %.2f s, %.0f rows/s, %d findings" %
+              (scanned, size / 1e6, elapsed, scanned / elapsed, len(findings)))
+    finally:
+        os.chdir("/")
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
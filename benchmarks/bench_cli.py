@@ -0,0 +1,65 @@
+"""
+Measures the cold start of bank_cli.py: the wall time of whole calls, each a new Python process, as a shell script
+would make them. A bank is generated in a temporary directory and converted to each format in turn. For comparison
+the time of starting Python alone and of loading the whole bank in a new process are shown as well.
+
+    python benchmarks/bench_cli.py [--customers 10000] [--transactions 1000000] [--calls 20]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import generate_bank  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLI = os.path.join(ROOT, "bank_cli.py")
+FORMATS = ["text", "binary", "sharded", "sqlite"]
+
+
+def time_calls(command, calls):
+    """ Runs a command calls times and returns the average milliseconds per call. """
+    start = time.perf_counter()
+    for number in range(calls):
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the time of each bank_cli.py call")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bank-cli-")
+    generate_bank.generate(directory, args.customers, 2, args.transactions)
+    os.chdir(directory)
+    env_python = [sys.executable]
+
+    try:
+        print("%-8s %12s %12s %12s %12s" % ("format", "python ms", "import ms", "balance ms", "deposit ms"))
+        python_ms = time_calls(env_python + ["-c", "pass"], args.calls)
+        import_ms = time_calls(env_python + ["-c", "import sys; sys.path.insert(0, %r); import Bank" % ROOT], args.calls)
+        for snapshot_format in FORMATS:
+            subprocess.run(env_python + [os.path.join(ROOT, "convert.py"), snapshot_format], check=True,
+                           stdout=subprocess.DEVNULL)
+            balance_ms = time_calls(env_python + [CLI, "balance", "AC100"], args.calls)
+            deposit_ms = time_calls(env_python + [CLI, "deposit", "AC100", "1"], args.calls)
+            print("%-8s %12.1f %12.1f %12.1f %12.1f" % (snapshot_format, python_ms, import_ms, balance_ms, deposit_ms))
+
+        load_ms = time_calls(env_python + ["-c", "import sys; sys.path.insert(0, %r); import Bank; "
+                                                 "Bank.create_bank_obj({}, {})" % ROOT], 3)
+        print("Loading the whole bank from SQLite in a new process: %.1f ms" % load_ms)
+    finally:
+        os.chdir("/")
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
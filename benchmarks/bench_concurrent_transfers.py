@@ -0,0 +1,78 @@
+"""
+Stress test for transfers made from many threads at once.
+
+Each run gives every thread its own stream of random transfers between a shared set of Checking Accounts, then checks
+that no money was created or lost: the total of all balances is unchanged, and every account's balance still equals its
+opening balance plus the amounts in its history. Throughput is reported for each number of threads.
+
+    python benchmarks/bench_concurrent_transfers.py [accounts] [transfers per thread]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Bank  # noqa: E402
+
+THREADS = [1, 2, 4, 8, 16]
+OPENING_BALANCE = 1000
+
+
+def make_accounts(count):
+    """ Returns a list of Checking Accounts with the opening balance. """
+    return [Bank.CheckingAccount(acc_id="AC{:03}".format(number), balance=float(OPENING_BALANCE))
+            for number in range(1, count + 1)]
+
+
+def worker(accounts, transfers, seed, rejected):
+    """ Makes random transfers of whole amounts between the accounts. """
+    rng = random.Random(seed)
+    for transfer in range(transfers):
+        sender, receiver = rng.sample(accounts, 2)
+        try:
+            sender.post_transfer(float(rng.randint(1, 500)), receiver)
+        except Bank.TransactionError:
+            rejected[seed] += 1
+
+
+def run(n_accounts, n_threads, transfers):
+    """ Runs one stress test and returns the transfers made per second. """
+    accounts = make_accounts(n_accounts)
+    rejected = [0] * n_threads
+    threads = [threading.Thread(target=worker, args=(accounts, transfers, seed, rejected))
+               for seed in range(n_threads)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    # No money may appear or disappear
+    total = sum(acc.balance for acc in accounts)
+    assert total.cents == OPENING_BALANCE * 100 * n_accounts, "total balance changed: %.2f" % total
+    for acc in accounts:
+        assert acc.balance.cents == OPENING_BALANCE * 100 + acc.transactions.total_cents(), \
+            "balance of " + acc.acc_id + " does not match its history"
+
+    made = n_threads * transfers - sum(rejected)
+    return made / elapsed, sum(rejected)
+
+
+def main():
+    n_accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    transfers = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    print("%8s %16s %10s" % ("threads", "transfers/sec", "rejected"))
+    for n_threads in THREADS:
+        rate, rejected = run(n_accounts, n_threads, transfers)
+        print("%8d %16.0f %10d" % (n_threads, rate, rejected))
+    print("Total balance conserved in every run")
+
+
+if __name__ == "__main__":
+    main()
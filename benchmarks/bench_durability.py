@@ -0,0 +1,59 @@
+"""
+Measures deposits per second in each durability mode of the journal, from one thread and from several at once.
+
+Each mode writes its journal in a temporary directory. After each run the journal is read back to check that it holds
+a record for every deposit made.
+
+    python benchmarks/bench_durability.py [deposits] [threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Bank  # noqa: E402
+
+
+def run(mode, deposits, threads):
+    """ Makes deposits spread over threads with the journal in the given mode. Returns the seconds they took. """
+    os.chdir(tempfile.mkdtemp())
+    Bank.storage = Bank.FileStorage()
+    Bank.journal = Bank.Journal(durability=mode)
+    accounts = [Bank.CheckingAccount(acc_id="AC%03d" % number) for number in range(threads)]
+
+    def deposit(acc):
+        for number in range(deposits // threads):
+            acc.post_deposit(1.0)
+
+    workers = [threading.Thread(target=deposit, args=(acc,)) for acc in accounts]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    Bank.journal.close()
+
+    journal_file = open(Bank.JOURNAL_FILE, "r")
+    records = sum(1 for line in journal_file)
+    journal_file.close()
+    assert records == deposits // threads * threads, mode + " journal is missing records"
+    return elapsed
+
+
+def main():
+    deposits = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print("%-6s %18s %18s" % ("mode", "1 thread ops/s", "%d threads ops/s" % threads))
+    for mode in Bank.DURABILITY_MODES:
+        single = run(mode, deposits, 1)
+        several = run(mode, deposits, threads)
+        print("%-6s %18.0f %18.0f" % (mode, deposits / single, deposits // threads * threads / several))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures the month-end run over a bank made by generate_bank.py, loaded from each kind of snapshot, so that every
+Account that gets a transaction has a stored history to check the date order against.
+
+The run's journal record is written to the bank's journal, so the time includes building it. Afterwards every
+Account's balance is checked against the sum of its transactions, and a run dated before the last transactions must
+be refused.
+
+    python benchmarks/bench_month_end.py [--customers 50000] [--transactions 1000000]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import Bank  # noqa: E402
+import generate_bank  # noqa: E402
+import month_end  # noqa: E402
+
+FORMATS = ["text", "binary", "sqlite"]
+
+
+def run(directory, day):
+    """ Loads the bank in directory and posts the month-end run on day. Prints the times taken. """
+    os.chdir(directory)
+    customers = {}
+    accounts = {}
+    start = time.perf_counter()
+    Bank.create_bank_obj(customers, accounts)
+    loaded = time.perf_counter() - start
+    open_accounts = [acc for key in customers for acc in customers[key].accounts]
+
+    # A run dated before the generated transactions must be refused before anything is posted
+    try:
+        month_end.post_month_end(open_accounts, date.fromordinal(generate_bank.FIRST_DAY))
+        raise AssertionError("a month-end run before the last transactions was posted")
+    except Bank.TransactionError:
+        pass
+
+    start = time.perf_counter()
+    made = month_end.post_month_end(open_accounts, day)
+    elapsed = time.perf_counter() - start
+
+    # Every balance must equal the sum of the Account's transactions, the month-end ones included
+    for acc in open_accounts:
+        assert acc.balance.cents == acc.transactions.total_cents(), \
+            "balance of " + acc.acc_id + " does not match its history"
+    Bank.storage.close()
+    return loaded, made, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the month-end run over a generated bank")
+    parser.add_argument("--customers", type=int, default=50000)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix="bank-month-end-")
+    generated = os.path.join(base, "generated")
+    os.mkdir(generated)
+    generate_bank.generate(generated, args.customers, 2, args.transactions)
+
+    # The day after the last generated transaction
+    day = date.fromordinal(generate_bank.FIRST_DAY + args.transactions // generate_bank.TRANSACTIONS_PER_DAY + 1)
+
+    try:
+        print("%-8s %10s %14s %10s" % ("format", "load s", "transactions", "run s"))
+        for snapshot_format in FORMATS:
+            directory = os.path.join(base, snapshot_format)
+            shutil.copytree(generated, directory)
+            subprocess.run([sys.executable, os.path.join(ROOT, "convert.py"), snapshot_format], cwd=directory,
+                           check=True, stdout=subprocess.DEVNULL)
+            loaded, made, elapsed = run(directory, day)
+            print("%-8s %10.2f %14d %10.2f" % (snapshot_format, loaded, made, elapsed))
+        print("Balances match the posted transactions")
+    finally:
+        os.chdir("/")
+        shutil.rmtree(base)
+
+
+if __name__ == "__main__":
+    main()
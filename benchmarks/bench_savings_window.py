@@ -0,0 +1,48 @@
+"""
+Measures how long a Savings Account withdraw takes as the account's history grows.
+
+Each account is given a history of deposits ending with a withdraw made today, so every timed withdraw is turned away
+by the 30 days rule. The time per attempt should stay the same whatever the length of the history.
+
+    python benchmarks/bench_savings_window.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Bank  # noqa: E402
+
+SIZES = [10, 100, 1000, 10000, 100000]
+ATTEMPTS = 20000
+
+
+def make_account(size):
+    """ Returns a Savings Account with size transactions, the last of them a withdraw made today. """
+    acc = Bank.SavingAccount(acc_id="AC001", balance=float(size))
+    for number in range(1, size):
+        acc.add_transaction(("TRX{:03}".format(number), "AC001", "2021-01-01", "Deposit", "+1.0"))
+    acc.add_transaction(("TRX{:03}".format(size), "AC001", str(date.today()), "Withdraw", "-1.0"))
+    return acc
+
+
+def main():
+    print("%12s %16s" % ("transactions", "usec/withdraw"))
+    for size in SIZES:
+        acc = make_account(size)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for attempt in range(ATTEMPTS):
+                acc.withdraw(1.0)
+            elapsed = time.perf_counter() - start
+
+        print("%12d %16.3f" % (size, elapsed / ATTEMPTS * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures loading a sharded bank with each number of worker processes. A bank is generated with generate_bank.py in a
+temporary directory and split into shards with convert.py, then loaded with SHARD_WORKERS set to each count in turn.
+The time spent creating the objects from what the workers read is shown apart, it is done by the loading process alone.
+
+    python benchmarks/bench_shards.py [--customers 100000] [--transactions 2000000] [--shards 8] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import Bank  # noqa: E402
+import generate_bank  # noqa: E402
+
+
+def timed_load(workers):
+    """ Loads the bank in the current directory with the given number of workers. Returns the total and build times. """
+    build_from_text = Bank.build_from_text
+    spent = [0.0]
+
+    def timed_build(*args):
+        start = time.perf_counter()
+        build_from_text(*args)
+        spent[0] += time.perf_counter() - start
+
+    Bank.SHARD_WORKERS = workers
+    Bank.build_from_text = timed_build
+    try:
+        customers = {}
+        accounts = {}
+        start = time.perf_counter()
+        Bank.create_bank_obj(customers, accounts)
+        elapsed = time.perf_counter() - start
+        Bank.storage.close()
+    finally:
+        Bank.build_from_text = build_from_text
+    assert len(accounts) > 0, "the bank could not be loaded"
+    return elapsed, spent[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures loading a sharded bank with each number of workers")
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=2000000)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bank-shards-")
+    generate_bank.generate(directory, args.customers, 2, args.transactions)
+    subprocess.run([sys.executable, os.path.join(ROOT, "convert.py"), "sharded", str(args.shards)], cwd=directory,
+                   check=True, stdout=subprocess.DEVNULL)
+    os.chdir(directory)
+
+    try:
+        print("%d shards, %d CPUs" % (args.shards, os.cpu_count() or 1))
+        print("%8s %10s %10s" % ("workers", "load s", "build s"))
+        for workers in args.workers:
+            elapsed, built = timed_load(workers)
+            print("%8d %10.2f %10.2f" % (workers, elapsed, built))
+    finally:
+        os.chdir("/")
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
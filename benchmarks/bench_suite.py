@@ -0,0 +1,197 @@
+"""
+Benchmark suite for the main operations of the bank, with results as JSON so that runs of two versions can be compared.
+
+The bank is copied into a temporary directory first, so the journal and snapshots written while measuring never touch
+the original. Without --bank a bank is generated with generate_bank.py. Each benchmark reports the number of
+operations, the seconds they took, operations per second and microseconds per operation:
+    load                -  create_bank_obj, reading the files and replaying the journal
+    login               -  Looking up a customer and checking the PIN
+    deposit             -  Account.post_deposit, including the journal record
+    savings_withdraw    -  Account.post_withdraw from Savings Accounts, allowed once per account by the 30 days rule
+    transfer            -  Account.post_transfer between Checking Accounts
+    print_transactions  -  Account.print_transactions, with the output thrown away
+    statement           -  Account.statement over a random range of days, with the first page read
+    update_files        -  Writing a text snapshot of the whole bank
+
+    python benchmarks/bench_suite.py [--bank DIRECTORY] [--operations 10000] [--output results.json]
+                                     [--compare previous.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Bank  # noqa: E402
+import generate_bank  # noqa: E402
+
+BANK_FILES = Bank.TEXT_FILES + [Bank.BINARY_SNAPSHOT, Bank.IDS_FILE, Bank.JOURNAL_FILE, Bank.DATABASE_FILE,
+                                Bank.LIMITS_FILE]
+BANK_DIRECTORIES = [Bank.SHARD_DIRECTORY, Bank.ARCHIVE_DIRECTORY]
+
+
+def result(count, elapsed):
+    """ Returns the measurements of count operations that took elapsed seconds. """
+    return {"operations": count, "seconds": round(elapsed, 6),
+            "per_second": round(count / elapsed, 1) if elapsed else None,
+            "usec_per_operation": round(elapsed / count * 1e6, 3) if count else None}
+
+
+def timed(func, items):
+    """ Calls func on each item and returns the measurements. """
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return result(len(items), time.perf_counter() - start)
+
+
+def ignore_rejected(post):
+    """ Wraps a post_* call so that operations turned away by the rules still count as done. """
+    def call(item):
+        try:
+            post(item)
+        except Bank.TransactionError:
+            pass
+    return call
+
+
+def run_suite(operations, rng):
+    """ Runs every benchmark on the bank in the current directory and returns the results. """
+    results = {}
+
+    customers = {}
+    accounts = {}
+    start = time.perf_counter()
+    Bank.create_bank_obj(customers, accounts)
+    results["load"] = result(1, time.perf_counter() - start)
+    if Bank.storage is None:
+        raise SystemExit("The bank could not be loaded")
+
+    customer_list = list(customers.values())
+    logins = [rng.choice(customer_list) for number in range(operations)]
+    results["login"] = timed(lambda customer: customers.get(customer.customer_id).check_pin(customer.get_pin()),
+                             logins)
+
+    account_list = [acc for customer in customer_list for acc in customer.accounts]
+    savings = [acc for acc in account_list if isinstance(acc, Bank.SavingAccount)]
+    checking = [acc for acc in account_list if isinstance(acc, Bank.CheckingAccount)]
+
+    results["deposit"] = timed(lambda acc: acc.post_deposit(100.0),
+                               [rng.choice(account_list) for number in range(operations)])
+
+    results["savings_withdraw"] = timed(ignore_rejected(lambda acc: acc.post_withdraw(1.0)),
+                                        [rng.choice(savings) for number in range(operations)] if savings else [])
+
+    if len(checking) >= 2:
+        pairs = [rng.sample(checking, 2) for number in range(operations)]
+    else:
+        pairs = []
+    results["transfer"] = timed(ignore_rejected(lambda pair: pair[0].post_transfer(1.0, pair[1])), pairs)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["print_transactions"] = timed(lambda acc: acc.print_transactions(),
+                                              [rng.choice(account_list) for number in range(operations)])
+
+    # A range that ends before it starts is an empty statement, not an error
+    reversed_range = account_list[0].statement("2022-01-01", "2021-01-01")
+    assert len(reversed_range) == 0 and reversed_range.pages() == 0, "reversed statement range"
+    assert reversed_range.opening_balance == reversed_range.closing_balance, "reversed statement range"
+
+    ranges = []
+    for number in range(operations):
+        first = date(2020, 1, 1).toordinal() + rng.randrange(730)
+        ranges.append((rng.choice(account_list), str(date.fromordinal(first)),
+                       str(date.fromordinal(first + rng.randrange(90)))))
+    results["statement"] = timed(lambda item: item[0].statement(item[1], item[2]).page(0), ranges)
+
+    start = time.perf_counter()
+    Bank.update_files(customers, "text")
+    results["update_files"] = result(1, time.perf_counter() - start)
+
+    Bank.storage.close()
+    return {"customers": len(customers), "accounts": len(account_list),
+            "archived": sum(len(acc.transactions.archive) for acc in account_list)}, results
+
+
+def git_version():
+    """ Returns the git commit of the working tree, if there is one. """
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(previous, current):
+    """ Prints the change in time per operation of each benchmark against an earlier run. """
+    print("\n%-20s %14s %14s %9s" % ("benchmark", "before usec", "now usec", "change"), file=sys.stderr)
+    for name in current["results"]:
+        before = previous["results"].get(name, {}).get("usec_per_operation")
+        now = current["results"][name]["usec_per_operation"]
+        if before and now:
+            print("%-20s %14.3f %14.3f %+8.1f%%" % (name, before, now, (now - before) / before * 100), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the main operations of the bank")
+    parser.add_argument("--bank", help="directory of the bank to measure, generated when not given")
+    parser.add_argument("--customers", type=int, default=1000, help="customers in a generated bank")
+    parser.add_argument("--transactions", type=int, default=100000, help="transactions in a generated bank")
+    parser.add_argument("--operations", type=int, default=10000, help="operations timed in each benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="file to write the JSON results to instead of standard output")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    # Work on a copy of the bank, the original is never changed
+    directory = tempfile.mkdtemp(prefix="bank-bench-")
+    if args.bank is not None:
+        for name in BANK_FILES:
+            if os.path.exists(os.path.join(args.bank, name)):
+                shutil.copy(os.path.join(args.bank, name), directory)
+        for name in BANK_DIRECTORIES:
+            if os.path.isdir(os.path.join(args.bank, name)):
+                shutil.copytree(os.path.join(args.bank, name), os.path.join(directory, name))
+    else:
+        generate_bank.generate(directory, args.customers, 2, args.transactions, args.seed)
+
+    os.chdir(directory)
+    try:
+        bank, results = run_suite(args.operations, random.Random(args.seed))
+    finally:
+        os.chdir("/")
+        shutil.rmtree(directory)
+
+    report = {"version": git_version(), "python": platform.python_version(), "machine": platform.machine(),
+              "bank": bank, "results": results}
+
+    for name in results:
+        print("%-20s %10d ops %12.3f usec/op" % (name, results[name]["operations"],
+                                                  results[name]["usec_per_operation"] or 0), file=sys.stderr)
+
+    if args.output is not None:
+        output_file = open(args.output, "w")
+        json.dump(report, output_file, indent=2)
+        output_file.close()
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare is not None:
+        previous_file = open(args.compare, "r")
+        compare(json.load(previous_file), report)
+        previous_file.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Generates a bank of any size in the text files that create_bank_obj reads: customers.txt, accounts.txt,
+accountsTransactions.txt and ids.txt.
+
+Transactions are written in date order, a few per day, each one to a random Account, and follow the same rules as the
+menu: Savings Accounts make at most one withdraw or transfer every 30 days and never go below zero, Checking Accounts
+never go below their minimum balance. Transfers are written as both of their transactions. Every balance is the sum
+of the Account's transactions, so the bank reconciles. Lines are written as they are made, so tens of millions of
+transactions need no more memory than the balances of the Accounts.
+
+    python benchmarks/generate_bank.py DIRECTORY [--customers 1000] [--accounts 2] [--transactions 100000] [--seed 1]
+
+Use convert.py in DIRECTORY afterwards for the binary snapshot or the SQLite database.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Bank  # noqa: E402
+
+NAMES = ["Aayush", "Priya", "Liam", "Olivia", "Noah", "Emma", "Arjun", "Sofia", "Lucas", "Mia", "Ethan", "Aisha"]
+FIRST_DAY = date(2020, 1, 1).toordinal()
+TRANSACTIONS_PER_DAY = 200
+CHECKING_MINIMUM = -100000      # Minimum balance of a Checking Account in cents, as in CheckingAccount
+
+
+def generate(directory, n_customers, accounts_per_customer, n_transactions, seed=1):
+    """ Writes the files of a new bank into directory. Returns the number of transactions written. """
+    rng = random.Random(seed)
+    n_accounts = n_customers * accounts_per_customer
+    acc_ids = [Bank.account_ids.format(number) for number in range(1, n_accounts + 1)]
+    savings = [rng.random() < 0.5 for number in range(n_accounts)]
+
+    customers_file = open(os.path.join(directory, "customers.txt"), "w")
+    for number in range(n_customers):
+        line = "%s %s %d %04d " % (Bank.customer_ids.format(number + 1), rng.choice(NAMES), rng.randint(18, 80),
+                                   rng.randint(0, 9999))
+        for acc_number in range(number * accounts_per_customer, (number + 1) * accounts_per_customer):
+            customers_file.write(line + acc_ids[acc_number] + "\n")
+    customers_file.close()
+
+    balances = [0] * n_accounts         # In cents
+    last_debits = [0] * n_accounts      # Date ordinal of the last withdraw or transfer
+    lines = []
+    trx_number = 0
+
+    transactions_file = open(os.path.join(directory, "accountsTransactions.txt"), "w")
+    while trx_number < n_transactions:
+        ordinal = FIRST_DAY + trx_number // TRANSACTIONS_PER_DAY
+        day = str(date.fromordinal(ordinal))
+        index = rng.randrange(n_accounts)
+        cents = rng.randint(1, 2000) * 100
+        op = rng.random()
+
+        # A debit the rules do not allow becomes a deposit
+        if savings[index]:
+            allowed = ordinal - last_debits[index] >= 30 and balances[index] - cents >= 0
+        else:
+            allowed = balances[index] - cents >= CHECKING_MINIMUM
+
+        if op < 0.5 or not allowed:
+            trx_number += 1
+            lines.append("%s %s %s Deposit %s\n" % (Bank.transaction_ids.format(trx_number), acc_ids[index], day,
+                                                    Bank.format_cents(cents)))
+            balances[index] += cents
+        elif op < 0.8 or n_accounts < 2 or trx_number + 2 > n_transactions:
+            trx_number += 1
+            lines.append("%s %s %s Withdraw %s\n" % (Bank.transaction_ids.format(trx_number), acc_ids[index], day,
+                                                     Bank.format_cents(-cents)))
+            balances[index] -= cents
+            last_debits[index] = ordinal
+        else:
+            receiver = rng.randrange(n_accounts - 1)
+            if receiver >= index:
+                receiver += 1
+            lines.append("%s %s %s Transfer %s\n" % (Bank.transaction_ids.format(trx_number + 1), acc_ids[index], day,
+                                                     Bank.format_cents(-cents)))
+            lines.append("%s %s %s Transfer %s\n" % (Bank.transaction_ids.format(trx_number + 2), acc_ids[receiver], day,
+                                                     Bank.format_cents(cents)))
+            trx_number += 2
+            balances[index] -= cents
+            balances[receiver] += cents
+            last_debits[index] = ordinal
+
+        if len(lines) >= 10000:
+            transactions_file.writelines(lines)
+            lines = []
+    transactions_file.writelines(lines)
+    transactions_file.close()
+
+    accounts_file = open(os.path.join(directory, "accounts.txt"), "w")
+    for index in range(n_accounts):
+        accounts_file.write("%s %s %.2f\n" % (acc_ids[index], "Savings" if savings[index] else "Checking",
+                                              balances[index] / 100))
+    accounts_file.close()
+
+    # The highest IDs, as a saved bank has them, so that loading a few Accounts does not read every transaction
+    ids_file = open(os.path.join(directory, Bank.IDS_FILE), "w")
+    for allocator, last in [(Bank.customer_ids, n_customers), (Bank.account_ids, n_accounts),
+                            (Bank.transaction_ids, trx_number)]:
+        ids_file.write("%s %d\n" % (allocator.prefix, last))
+    ids_file.close()
+    return trx_number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a bank in the text file format")
+    parser.add_argument("directory")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--accounts", type=int, default=2, help="accounts per customer")
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Anything else in the directory would be loaded in place of, or on top of, the new files
+    for name in [Bank.JOURNAL_FILE, Bank.BINARY_SNAPSHOT, Bank.DATABASE_FILE, Bank.IDS_FILE]:
+        if os.path.exists(os.path.join(args.directory, name)):
+            print(name + " already exists in " + args.directory + ", please remove it first")
+            return 1
+    os.makedirs(args.directory, exist_ok=True)
+
+    written = generate(args.directory, args.customers, args.accounts, args.transactions, args.seed)
+    print("Wrote %d customers, %d accounts and %d transactions" %
+          (args.customers, args.customers * args.accounts, written))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Converts the bank between the text files, the binary snapshot, the sharded text files and the SQLite database.
+
+    python convert.py binary    -  Writes the bank to bank.snap, which is loaded at launch from then on
+    python convert.py text      -  Writes the bank back to the text files and removes bank.snap
+    python convert.py sqlite    -  Writes the bank to bank.db, which is loaded at launch in place of the files from then on
+    python convert.py sharded [N]  -  Splits the text files into N shards under shards/, one per CPU by default, which
+                                      are loaded in parallel at launch from then on
+
+Converting from the SQLite database to the text files or the binary snapshot removes bank.db.
+"""
+import os
+import sys
+
+import Bank
+
+
+def main():
+    """ Loads the bank in its current format and writes it in the format given on the command line. """
+    if len(sys.argv) < 2 or sys.argv[1] not in ["binary", "text", "sqlite", "sharded"]:
+        print(__doc__)
+        return 1
+
+    # Number of shards, only given for the sharded files
+    shards = None
+    if sys.argv[1] == "sharded" and len(sys.argv) == 3 and sys.argv[2].isdigit() and int(sys.argv[2]) > 0:
+        shards = int(sys.argv[2])
+    elif len(sys.argv) != 2:
+        print(__doc__)
+        return 1
+
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return 1
+
+    from_database = isinstance(Bank.storage, Bank.SQLiteStorage)
+    if sys.argv[1] == "sqlite":
+        if not from_database:
+            # Fold the journal into the files first, so they still hold the same bank as the database
+            Bank.update_files(customers)
+            Bank.write_database(customers, Bank.DATABASE_FILE)
+        Bank.storage.close()
+    else:
+        Bank.update_files(customers, sys.argv[1], shards)
+        Bank.storage.close()
+        if from_database:
+            os.remove(Bank.DATABASE_FILE)
+
+    print("Converted %d customers and %d accounts" % (len(customers), len(accounts)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Exports transactions as CSV or JSON Lines, for one Account, one customer or the whole bank.
+
+Transactions are streamed one at a time from each Account's history straight into the output, so only one Account's
+stored transactions are in memory at any moment, and histories in the cache are not pushed out. Filtering by date and
+type happens inside the stream: the date range is found by bisect, so transactions outside it are never formatted.
+
+Each transaction has the same fields as a line of accountsTransactions.txt:
+    trx,account,date,type,amount
+    TRX002,AC001,2021-12-18,Deposit,+1000.00
+
+    python export.py csv|jsonl [--account AC001 | --customer C001] [--from 2021-10-01] [--to 2021-12-31]
+                               [--type Deposit ...] [--output statement.csv]
+"""
+import argparse
+import csv
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import Bank
+
+FIELDS = ["trx", "account", "date", "type", "amount"]
+
+
+def account_ledgers(acc, first=None, last=None):
+    """
+    Yields the Ledgers of the Account's history in order: its archived blocks, each read only when it is reached and
+    skipped if the block index shows it is outside the dates, then the transactions in the snapshot and new ones.
+    """
+    for block in acc.transactions.archive.blocks:
+        if (first is None or block.last >= first) and (last is None or block.first <= last):
+            yield block.read()
+    yield from acc.transactions.ledgers()
+
+
+def account_transactions(acc, first=None, last=None, types=None):
+    """
+    Yields the Account's transactions in order as tuples of strings, optionally only those dated from the first to the
+    last date ordinal and of the given types (names from TRANSACTION_TYPES).
+    """
+    codes = None
+    if types:
+        codes = {Bank.TRANSACTION_CODES[trx_type] for trx_type in types}
+
+    for ledger in account_ledgers(acc, first, last):
+        # Dates are in order, so the range is found without looking at the transactions outside it
+        start = 0 if first is None else bisect_left(ledger.dates, first)
+        end = len(ledger) if last is None else bisect_right(ledger.dates, last)
+
+        for index in range(start, end):
+            if codes is None or ledger.types[index] in codes:
+                yield ledger[index]
+
+
+def customer_transactions(customer, first=None, last=None, types=None):
+    """ Yields the transactions of each of the customer's Accounts in turn, see account_transactions. """
+    for acc in customer.accounts:
+        yield from account_transactions(acc, first, last, types)
+
+
+def bank_transactions(customers, first=None, last=None, types=None):
+    """ Yields the transactions of every Account in the bank, customer by customer, see account_transactions. """
+    for key in customers:
+        yield from customer_transactions(customers[key], first, last, types)
+
+
+def write_csv(transactions, stream):
+    """ Writes the transactions to the stream as CSV with a header row. Returns the number written. """
+    writer = csv.writer(stream)
+    writer.writerow(FIELDS)
+    count = 0
+    for transaction in transactions:
+        writer.writerow(transaction)
+        count += 1
+    return count
+
+
+def write_jsonl(transactions, stream):
+    """ Writes the transactions to the stream as JSON Lines, one object per transaction. Returns the number written. """
+    count = 0
+    for transaction in transactions:
+        stream.write(json.dumps(dict(zip(FIELDS, transaction))) + "\n")
+        count += 1
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def date_argument(text):
+    """ Turns a date such as "2021-12-18" given on the command line into its ordinal. """
+    try:
+        return date.fromisoformat(text).toordinal()
+    except ValueError:
+        raise argparse.ArgumentTypeError("dates must look like 2021-12-18")
+
+
+def main():
+    """ Loads the bank and exports the transactions chosen on the command line. """
+    parser = argparse.ArgumentParser(description="Exports transactions as CSV or JSON Lines")
+    parser.add_argument("format", choices=sorted(WRITERS))
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--account", help="export only this Account ID")
+    scope.add_argument("--customer", help="export only this customer's Accounts")
+    parser.add_argument("--from", dest="first", type=date_argument, help="first day, such as 2021-10-01")
+    parser.add_argument("--to", dest="last", type=date_argument, help="last day, such as 2021-12-31")
+    parser.add_argument("--type", dest="types", action="append", choices=Bank.TRANSACTION_TYPES,
+                        help="export only this type of transaction, can be given more than once")
+    parser.add_argument("--output", help="file to write to instead of standard output")
+    args = parser.parse_args()
+
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return 1
+
+    if args.account is not None:
+        if args.account not in accounts:
+            print("Account does not exist", file=sys.stderr)
+            return 1
+        transactions = account_transactions(accounts[args.account], args.first, args.last, args.types)
+    elif args.customer is not None:
+        if args.customer not in customers:
+            print("Customer does not exist", file=sys.stderr)
+            return 1
+        transactions = customer_transactions(customers[args.customer], args.first, args.last, args.types)
+    else:
+        transactions = bank_transactions(customers, args.first, args.last, args.types)
+
+    if args.output is not None:
+        output_file = open(args.output, "w", newline="")
+    else:
+        output_file = sys.stdout
+
+    count = WRITERS[args.format](transactions, output_file)
+
+    if output_file is not sys.stdout:
+        output_file.close()
+    Bank.storage.close()
+
+    print("Exported %d transactions" % count, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Load generator for server.py. Opens many connections at once, logs each one in and sends a mix of balance, history
+and deposit requests, then reports the request rate and the p50 and p99 latency.
+
+    python loadgen.py [--port 8765] [--connections 1000] [--requests 20] [--login C001:1111 ...]
+
+Each connection logs in as one of the --login customers in turn (by default the two sample customers) and uses that
+customer's first Account.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import server
+
+MIX = ["balance", "balance", "history", "deposit"]     # Share of each request type
+
+
+async def client(host, port, login, requests, latencies, failures):
+    """ Runs one connection: logs in, then sends requests one after another, timing each. """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def call(request):
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        return json.loads(await reader.readline())
+
+    customer_id, pin = login.split(":")
+    reply = await call({"op": "login", "customer": customer_id, "pin": pin})
+    if not reply["ok"] or not reply["accounts"]:
+        failures.append(reply)
+        writer.close()
+        return
+    acc_id = reply["accounts"][0]
+
+    rng = random.Random()
+    for number in range(requests):
+        op = rng.choice(MIX)
+        request = {"op": op}
+        if op != "balance":
+            request["account"] = acc_id
+        if op == "deposit":
+            request["amount"] = rng.randint(1, 100)
+
+        start = time.perf_counter()
+        reply = await call(request)
+        latencies.append(time.perf_counter() - start)
+        if not reply["ok"]:
+            failures.append(reply)
+
+    writer.close()
+
+
+def percentile(values, fraction):
+    """ Returns the value below which the given fraction of the sorted values lie. """
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run(args):
+    latencies = []
+    failures = []
+    logins = args.login or ["C001:1111", "C002:1234"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(args.host, args.port, logins[number % len(logins)], args.requests, latencies,
+                                  failures)
+                           for number in range(args.connections)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print("Connections:  %d" % args.connections)
+    print("Requests:     %d in %.2f s (%.0f per second)" % (len(latencies), elapsed, len(latencies) / elapsed))
+    if latencies:
+        print("Latency p50:  %.2f ms" % (percentile(latencies, 0.50) * 1000))
+        print("Latency p99:  %.2f ms" % (percentile(latencies, 0.99) * 1000))
+    print("Failures:     %d" % len(failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the bank server")
+    parser.add_argument("--host", default=server.HOST)
+    parser.add_argument("--port", type=int, default=server.PORT)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20, help="requests per connection after logging in")
+    parser.add_argument("--login", action="append", help="CUSTOMER:PIN to log in as, can be given more than once")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Latency histograms and outcome counters for the operations of the bank, written out in the Prometheus text format.
+
+Metrics are off unless the BANK_METRICS environment variable is set (to anything but 0) when the bank is started.
+Operations are marked with the timed() decorator, which returns the function unchanged while metrics are off, so they
+then cost nothing at all. While on, each call is timed into a histogram and counted by its outcome: "ok", or the reason
+of the error it raised, such as "insufficient_funds" or "savings_limit".
+
+The metrics are written to a file:
+    BANK_METRICS_FILE=metrics.prom  -  File written when the program exits, and whenever it gets SIGUSR1
+or can be read at any time with render() or written with dump(path).
+"""
+import atexit
+import functools
+import os
+import signal
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+ENABLED = os.environ.get("BANK_METRICS", "0") not in ["", "0"]
+METRICS_FILE = os.environ.get("BANK_METRICS_FILE")
+
+# Upper bounds in seconds of the latency histogram buckets, from 1 microsecond to 10 seconds
+LATENCY_BUCKETS = [scale * power for power in [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0] for scale in [1, 2.5, 5]] + [10.0]
+
+
+class OperationMetrics(object):
+    """ OperationMetrics class: Latency histogram of one operation, with fixed bucket bounds, and its count of each outcome. """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # The last one counts latencies above every bound
+        self.sum = 0.0
+        self.outcomes = {}                          # Outcome to the number of calls
+        self.lock = threading.Lock()
+
+    def record(self, seconds, outcome):
+        """ Adds one call that took seconds and ended with the outcome. """
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+
+operations = {}     # Operation name to its OperationMetrics
+
+
+def timed(operation, outcome=None):
+    """
+    Decorator that times each call of a function into the operation's histogram and counts its outcome.
+    outcome, if given, turns the return value into the outcome, otherwise every call that returns is "ok".
+    Calls that raise are counted by the reason of the error, or by the name of its type.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        record = operations.setdefault(operation, OperationMetrics()).record
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                record(perf_counter() - start, getattr(error, "reason", type(error).__name__))
+                raise
+            record(perf_counter() - start, "ok" if outcome is None else outcome(result))
+            return result
+        return wrapper
+    return decorate
+
+
+def render():
+    """ Returns every metric in the Prometheus text format. """
+    histogram_lines = ["# HELP bank_operation_seconds Time taken by each bank operation.",
+                       "# TYPE bank_operation_seconds histogram"]
+    counter_lines = ["# HELP bank_operations_total Bank operations by outcome, ok or the reason they were turned away.",
+                     "# TYPE bank_operations_total counter"]
+
+    for operation in sorted(operations):
+        metrics = operations[operation]
+        with metrics.lock:
+            counts = list(metrics.counts)
+            total = metrics.sum
+            outcomes = dict(metrics.outcomes)
+
+        cumulative = 0
+        for bound, bucket in zip(metrics.buckets + ["+Inf"], counts):
+            cumulative += bucket
+            histogram_lines.append('bank_operation_seconds_bucket{operation="%s",le="%s"} %d' %
+                                   (operation, bound, cumulative))
+        histogram_lines.append('bank_operation_seconds_sum{operation="%s"} %r' % (operation, total))
+        histogram_lines.append('bank_operation_seconds_count{operation="%s"} %d' % (operation, cumulative))
+
+        for outcome in sorted(outcomes):
+            counter_lines.append('bank_operations_total{operation="%s",outcome="%s"} %d' %
+                                 (operation, outcome, outcomes[outcome]))
+
+    return "\n".join(histogram_lines + counter_lines) + "\n"
+
+
+def dump(path):
+    """ Writes every metric to a file in the Prometheus text format, replacing it in one step. """
+    metrics_file = open(path + ".tmp", "w")
+    metrics_file.write(render())
+    metrics_file.close()
+    os.replace(path + ".tmp", path)
+
+
+# Write the metrics file at exit and on SIGUSR1, where the system has it
+if ENABLED and METRICS_FILE:
+    atexit.register(dump, METRICS_FILE)
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: dump(METRICS_FILE))
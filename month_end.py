@@ -0,0 +1,122 @@
+"""
+Month-end run: pays interest on Savings Accounts and charges an overdraft fee to Checking Accounts below zero.
+
+The amounts for every Account are worked out at once with NumPy arrays of the balances in cents. Each one is then posted as a
+normal transaction ("Interest" or "Fee") with a transaction ID from a block reserved for the whole run, and all of
+them are journaled as a single record, so a crash leaves either the whole run or none of it.
+
+    python month_end.py [YYYY-MM-DD]    -  Date to post the transactions on, today by default
+
+Needs NumPy (pip install numpy).
+"""
+import sys
+from datetime import date
+
+import numpy as np
+
+import Bank
+
+SAVINGS_INTEREST_RATE = 0.03    # Yearly interest on positive Savings balances, paid each month
+OVERDRAFT_FEE = 1500            # Cents charged each month to a Checking Account with a balance below zero
+
+
+def month_end_amounts(accounts):
+    """
+    Works out the month-end amount for each Account in the list, in cents, and the transaction type of each.
+    Returns NumPy arrays of the positions in the list of the Accounts that get a transaction, their amounts and types.
+    """
+    count = len(accounts)
+    cents = np.fromiter((acc.balance.cents for acc in accounts), dtype=np.int64, count=count)
+    savings = np.fromiter((isinstance(acc, Bank.SavingAccount) for acc in accounts), dtype=bool, count=count)
+
+    # Interest for one month on positive Savings balances, rounded to the cent
+    interest = np.where(savings & (cents > 0), np.rint(cents * (SAVINGS_INTEREST_RATE / 12)), 0).astype(np.int64)
+
+    # A flat fee for Checking Accounts that are overdrawn
+    fees = np.where(~savings & (cents < 0), -OVERDRAFT_FEE, 0).astype(np.int64)
+
+    amounts = interest + fees
+    posted = np.flatnonzero(amounts)
+    types = np.where(savings[posted], Bank.TRANSACTION_CODES["Interest"], Bank.TRANSACTION_CODES["Fee"])
+    return posted, amounts[posted], types
+
+
+def post_month_end(accounts, day=None):
+    """
+    Posts the month-end interest and fees to the Accounts in the list, dated day (a date, today by default).
+    No other change can be made to the bank meanwhile. Returns the number of transactions posted, or raises
+    TransactionError if day comes before the last transaction of an Account that gets one.
+    """
+    if day is None:
+        day = date.today()
+    today = str(day)
+    ordinal = day.toordinal()
+
+    with Bank.bank_lock.exclusive:
+        posted, amounts, types = month_end_amounts(accounts)
+        if len(posted) == 0:
+            return 0
+
+        # Histories are kept in date order, which statements rely on to find transactions with bisect
+        for index in posted.tolist():
+            if accounts[index].transactions.last_date() > ordinal:
+                raise Bank.TransactionError("date_order", "Account %s already has transactions after %s"
+                                            % (accounts[index].acc_id, today))
+
+        numbers = Bank.transaction_ids.reserve(len(posted))
+
+        # One journal record for the whole run, so it is never half applied
+        fields = []
+        for index, number, cents, trx_type in zip(posted.tolist(), numbers, amounts.tolist(), types.tolist()):
+            fields.extend((Bank.transaction_ids.format(number), accounts[index].acc_id, today,
+                           Bank.TRANSACTION_TYPES[trx_type], Bank.format_cents(cents)))
+        Bank.journal_append("TRX", *fields)
+
+        for index, number, cents, trx_type in zip(posted.tolist(), numbers, amounts.tolist(), types.tolist()):
+            acc = accounts[index]
+            acc.transactions.add(number, ordinal, trx_type, cents)
+            acc.balance += Bank.Money(cents)
+
+    return len(posted)
+
+
+def main():
+    """ Loads the bank, posts the month-end run to every open Account and writes a new snapshot. """
+    if len(sys.argv) > 2:
+        print(__doc__)
+        return 1
+
+    day = None
+    if len(sys.argv) == 2:
+        try:
+            day = date.fromisoformat(sys.argv[1])
+        except ValueError:
+            print(__doc__)
+            return 1
+
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return 1
+
+    open_accounts = [acc for key in customers for acc in customers[key].accounts]
+    try:
+        posted = post_month_end(open_accounts, day)
+    except Bank.TransactionError as error:
+        print(error)
+        Bank.storage.close()
+        return 1
+
+    # The run touches every Account at once, so it goes straight into a new snapshot
+    Bank.storage.save(customers)
+    Bank.storage.close()
+
+    print("Posted %d month-end transactions to %d accounts" % (posted, len(open_accounts)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
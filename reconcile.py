@@ -0,0 +1,183 @@
+"""
+Checks that the balance of every Account equals the sum of the signed amounts of its transactions, and reports the
+Accounts where they differ.
+
+Accounts are split into shards that a pool of processes checks in parallel, each process reading the transactions from
+the snapshot (or database) itself. As each shard finishes, the Accounts that matched are added to a checkpoint file,
+reconcile.txt. Later runs skip every Account whose balance and number of transactions have not changed since it was
+last found to match, so only changed Accounts are checked again.
+
+    python reconcile.py [--full] [--workers 4]
+
+    --full      Check every Account, ignoring the checkpoint
+    --workers   Number of processes, the number of CPUs by default
+
+The bank can also be checked at launch with: python Bank.py --reconcile
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import Bank
+
+CHECKPOINT_FILE = "reconcile.txt"   # "<account id> <balance in cents> <transactions>" for each Account that matched
+SHARD_SIZE = 1000                   # Number of Accounts checked by a process at a time
+
+worker_sources = {}     # Global variable holding the sources each worker process has opened, by their location
+
+
+def open_source(location):
+    """ Opens the source of stored transactions described by location(), see TextSource.location. """
+    kind, path = location
+    if kind == "text":
+        return Bank.TextSource(path)
+    if kind == "binary":
+        return Bank.BinarySource(path)
+    return Bank.SQLiteSource(Bank.ConnectionPool(path, 1))
+
+
+def worker_source(location):
+    """ Returns the source of stored transactions at location, opened once in each worker process. """
+    if location not in worker_sources:
+        worker_sources[location] = open_source(location)
+    return worker_sources[location]
+
+
+def check_accounts(source, shard):
+    """
+    Checks a shard of Accounts, each given as (Account ID, key of its stored transactions, number stored, balance in
+    cents, total in cents of the transactions made since the snapshot and the archived ones). Returns (Account ID, balance, total) for each
+    Account that does not match.
+    """
+    mismatches = []
+    for acc_id, key, stored, balance, new_total in shard:
+        total = new_total
+        if stored:
+            total += source.read(key).total()
+        if total != balance:
+            mismatches.append((acc_id, balance, total))
+    return mismatches
+
+
+def check_shard(shard):
+    """ Checks a shard, given with the location of its Accounts' transactions, in a worker process. See check_accounts. """
+    location, accounts = shard
+    return check_accounts(worker_source(location) if location is not None else None, accounts)
+
+
+def load_checkpoint(path):
+    """ Returns the balance and number of transactions of each Account in the checkpoint file, if there is one. """
+    checkpoint = {}
+    try:
+        checkpoint_file = open(path, "r")
+    except IOError:
+        return checkpoint
+
+    for line in checkpoint_file:
+        record = line.split()
+        # A line cut short by a crash is ignored
+        if len(record) == 3 and line.endswith("\n"):
+            checkpoint[record[0]] = (int(record[1]), int(record[2]))
+    checkpoint_file.close()
+    return checkpoint
+
+
+def write_checkpoint(path, checkpoint):
+    """ Rewrites the checkpoint file with one line for each Account. """
+    checkpoint_file = open(path + ".tmp", "w")
+    for acc_id in checkpoint:
+        print(acc_id + " %d %d" % checkpoint[acc_id], file=checkpoint_file)
+    checkpoint_file.flush()
+    os.fsync(checkpoint_file.fileno())
+    checkpoint_file.close()
+    os.replace(path + ".tmp", path)
+
+
+def reconcile(customers, full=False, workers=None, path=CHECKPOINT_FILE):
+    """
+    Checks every open Account that changed since the last run, or all of them if full is True.
+    Returns the number of Accounts checked and a list of (Account ID, balance, total) in cents for those that do not match.
+    """
+    checkpoint = {} if full else load_checkpoint(path)
+    fingerprints = {}   # Balance and number of transactions of each open Account
+    tasks = {}          # Accounts to check, by the location of their stored transactions (one for each shard of the bank)
+    checked = 0
+
+    for key in customers:
+        for acc in customers[key].accounts:
+            history = acc.transactions
+            fingerprints[acc.acc_id] = (acc.balance.cents, len(history))
+
+            if checkpoint.get(acc.acc_id) != fingerprints[acc.acc_id]:
+                location = history.source.location() if history.stored else None
+                tasks.setdefault(location, []).append((acc.acc_id, history.key, history.stored,
+                                                       fingerprints[acc.acc_id][0],
+                                                       history.new.total() + history.archive.total))
+                checked += 1
+
+    shards = [(location, tasks[location][start:start + SHARD_SIZE])
+              for location in tasks for start in range(0, len(tasks[location]), SHARD_SIZE)]
+    mismatches = []
+
+    # Accounts that match are appended to the checkpoint as each shard finishes, so an interrupted run is not lost
+    checkpoint_file = open(path, "w" if full else "a")
+
+    def finish(shard, found):
+        mismatched = {mismatch[0] for mismatch in found}
+        for task in shard[1]:
+            if task[0] not in mismatched:
+                print(task[0] + " %d %d" % fingerprints[task[0]], file=checkpoint_file)
+        checkpoint_file.flush()
+        mismatches.extend(found)
+
+    if len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shard, found in zip(shards, pool.map(check_shard, shards)):
+                finish(shard, found)
+    else:
+        for shard in shards:
+            finish(shard, check_shard(shard))
+        for location in list(worker_sources):
+            worker_sources.pop(location).close()
+    checkpoint_file.close()
+
+    # Keep only the open Accounts that match, each on one line
+    checkpoint = load_checkpoint(path)
+    write_checkpoint(path, {acc_id: checkpoint[acc_id] for acc_id in checkpoint
+                            if fingerprints.get(acc_id) == checkpoint[acc_id]})
+    return checked, mismatches
+
+
+def report(customers, full=False, workers=None):
+    """ Reconciles the bank and prints each Account that does not match. Returns the number that do not match. """
+    checked, mismatches = reconcile(customers, full, workers)
+
+    for acc_id, balance, total in mismatches:
+        print("%s  Balance: %s  Transactions: %s  Difference: %s" %
+              (acc_id, Bank.format_cents(balance), Bank.format_cents(total), Bank.format_cents(balance - total)))
+    print("Checked %d accounts, %d do not match their transactions" % (checked, len(mismatches)))
+    return len(mismatches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks every balance against the account's transactions")
+    parser.add_argument("--full", action="store_true", help="check every account, ignoring the checkpoint")
+    parser.add_argument("--workers", type=int, help="number of processes, the number of CPUs by default")
+    args = parser.parse_args()
+
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return 2
+
+    mismatched = report(customers, args.full, args.workers)
+    Bank.storage.close()
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
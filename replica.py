@@ -0,0 +1,230 @@
+"""
+Read replicas: several worker processes that answer balance, history and statement requests in parallel, while
+server.py stays the only process that changes the bank.
+
+Every worker loads the binary snapshot through a memory map, so the stored transactions are shared by all of them
+through the page cache, and then follows the journal the server appends to: every REPLICA_POLL_INTERVAL seconds it
+applies the complete records added since it last looked. When the server writes a new snapshot the workers load it
+again. Workers never write to any file.
+
+Requests and replies are the same as server.py's, for the operations that only read:
+    {"op": "login", "customer": "C001", "pin": "1111"}
+    {"op": "balance"}
+    {"op": "history", "account": "AC001", "count": 5}
+    {"op": "statement", "account": "AC001", "from": "2021-10-01", "to": "2021-12-31", "page": 0}
+    {"op": "status"}
+    {"op": "logout"}
+Every reply also has "staleness": the seconds since the worker last had every record in the journal, as written to
+disk by the server (records the server keeps in memory in the async durability mode are not counted).
+Operations that change the bank are turned away with the reason "read_only".
+
+The bank must be stored as a binary snapshot (python convert.py binary). Workers share the port where the system
+supports SO_REUSEPORT, otherwise one worker is started.
+
+    python replica.py [port] [--workers N]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import Bank
+from server import BankServer, HOST
+
+PORT = 8766
+REPLICA_POLL_INTERVAL = 0.1     # Seconds between checks of the journal for new records
+
+
+def snapshot_identity():
+    """ Returns what identifies the current binary snapshot, or None while the server is moving a new one into place. """
+    if os.path.exists(Bank.SNAPSHOT_MARKER):
+        return None
+    try:
+        status = os.stat(Bank.BINARY_SNAPSHOT)
+    except OSError:
+        return None
+    return (status.st_ino, status.st_mtime_ns, status.st_size)
+
+
+def load_snapshot():
+    """ Loads the binary snapshot and the archive without writing anything. Returns the customers and accounts, or None. """
+    customers = {}
+    accounts = {}
+    with Bank.collector_paused():
+        if not Bank.load_binary_snapshot(customers, accounts, Bank.BINARY_SNAPSHOT):
+            return None
+        Bank.load_ids_file(Bank.IDS_FILE)
+        Bank.load_archive(accounts)
+    return customers, accounts
+
+
+class ReplicaServer(BankServer):
+    """ ReplicaServer class: Answers the requests that only read from a copy of the bank that follows the journal. """
+
+    def __init__(self, number):
+        BankServer.__init__(self, {}, {})
+        self.number = number
+        self.identity = None    # Snapshot the copy was loaded from
+        self.offset = 0         # Length of the journal applied so far
+        self.records = 0        # Journal records applied since the snapshot was loaded
+        self.reloads = 0
+        self.caught_up = None   # time.monotonic() when the copy last had every record in the journal
+
+    def staleness(self):
+        """ Returns the seconds since the copy was last up to date with the journal, or None before it is loaded. """
+        if self.caught_up is None:
+            return None
+        return round(time.monotonic() - self.caught_up, 3)
+
+    def tail(self):
+        """ Applies the complete records added to the journal since the last call. """
+        try:
+            journal_file = open(Bank.JOURNAL_FILE, "rb")
+        except IOError:
+            return
+        journal_file.seek(self.offset)
+        for line in journal_file:
+            # The rest of a record still being written is read on the next call
+            if not line.endswith(b"\n"):
+                break
+            Bank.apply_record(line.decode().split(), self.customers, self.accounts)
+            self.offset += len(line)
+            self.records += 1
+        journal_file.close()
+
+    async def follow(self):
+        """ Keeps the copy up to date: loads each new snapshot and applies new journal records as they appear. """
+        loop = asyncio.get_running_loop()
+        while True:
+            identity = snapshot_identity()
+            if identity is not None and identity != self.identity:
+                old_source = Bank.transaction_source
+                loaded = await loop.run_in_executor(None, load_snapshot)
+                if loaded is not None:
+                    # Nothing reads the old copy any more: its cached histories are dropped and its snapshot unmapped
+                    Bank.history_cache.clear()
+                    if old_source is not None:
+                        old_source.close()
+                    self.customers, self.accounts = loaded
+                    self.identity = identity
+                    self.offset = 0
+                    self.records = 0
+                    self.reloads += 1
+
+            if identity is not None and identity == self.identity:
+                self.tail()
+                # Records read while the server replaced the snapshot may not belong to it, so load it again
+                if snapshot_identity() == identity:
+                    self.caught_up = time.monotonic()
+                else:
+                    self.identity = None
+
+            await asyncio.sleep(REPLICA_POLL_INTERVAL)
+
+    def dispatch(self, session, request):
+        """ Carries out one request that only reads, and adds the staleness of the copy to the reply. """
+        if self.caught_up is None:
+            reply = {"ok": False, "reason": "not_ready", "error": "The replica is still loading the bank"}
+        elif request.get("op") in self.write_ops:
+            reply = {"ok": False, "reason": "read_only", "error": "This is a read replica, send changes to the server"}
+        else:
+            # Loading a new snapshot replaces every Customer, so the session's one is looked up again
+            if session["customer"] is not None:
+                session["customer"] = self.customers.get(session["customer"].customer_id)
+            reply = BankServer.dispatch(self, session, request)
+        reply["staleness"] = self.staleness()
+        return reply
+
+    def history(self, customer, request):
+        acc = self.own_account(customer, request)
+        count = request.get("count", 5)
+        if not isinstance(count, int) or count < 0:
+            raise Bank.TransactionError("bad_request", "count must be a whole number")
+
+        # Most recent transaction first, like the menu
+        last = len(acc.transactions)
+        transactions = acc.transactions[max(last - count, 0):last]
+        transactions.reverse()
+        return {"ok": True, "account": acc.acc_id, "balance": float(acc.balance),
+                "transactions": [{"trx": trx[0], "date": trx[2], "type": trx[3], "amount": trx[4]}
+                                 for trx in transactions]}
+
+    def status(self, customer, request):
+        return {"ok": True, "replica": self.number, "pid": os.getpid(), "journal_records": self.records,
+                "journal_offset": self.offset, "reloads": self.reloads}
+
+    write_ops = ["deposit", "withdraw", "transfer", "open", "close"]
+    # Reads never wait for the bank lock here, and answering them on the event loop means none is still reading the
+    # old snapshot when a new one replaces it
+    blocking = set()
+    handlers = {"logout": BankServer.logout, "balance": BankServer.balance, "history": history,
+                "statement": BankServer.statement, "status": status}
+
+
+async def serve_replica(port, number, reuse_port):
+    """ Runs one worker until it is told to stop. """
+    replica = ReplicaServer(number)
+    follow_task = asyncio.ensure_future(replica.follow())
+    server = await asyncio.start_server(replica.handle, HOST, port, backlog=4096, reuse_port=reuse_port)
+
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        follow_task.cancel()
+
+
+def run_worker(port, number, reuse_port):
+    """ Entry point of each worker process. """
+    try:
+        asyncio.run(serve_replica(port, number, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves balance and history requests from read replicas")
+    parser.add_argument("port", type=int, nargs="?", default=PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if Bank.current_format() != "binary" or os.path.exists(Bank.DATABASE_FILE):
+        print("Replicas share the binary snapshot, please convert the bank first: python convert.py binary")
+        return 1
+
+    reuse_port = hasattr(socket, "SO_REUSEPORT")
+    workers = args.workers if reuse_port else 1
+    processes = [multiprocessing.Process(target=run_worker, args=(args.port, number, reuse_port))
+                 for number in range(workers)]
+    for process in processes:
+        process.start()
+    print("Serving %d read replicas on %s:%d" % (workers, HOST, args.port))
+
+    # Pass Ctrl+C or a request to terminate on to every worker
+    def stop(signum, frame):
+        for process in processes:
+            process.terminate()
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop(signal.SIGINT, None)
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
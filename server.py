@@ -0,0 +1,245 @@
+"""
+Serves the bank to many clients at once over TCP. Each request is one line of JSON and gets one line of JSON back.
+
+Requests have an "op" and its fields. Any "id" given in a request is copied into the reply.
+    {"op": "login", "customer": "C001", "pin": "1111"}
+    {"op": "balance"}
+    {"op": "deposit", "account": "AC001", "amount": 100}
+    {"op": "withdraw", "account": "AC001", "amount": 100}
+    {"op": "transfer", "account": "AC001", "to": "AC002", "amount": 100}
+    {"op": "history", "account": "AC001", "count": 5}
+    {"op": "statement", "account": "AC001", "from": "2021-10-01", "to": "2021-12-31", "page": 0}
+    {"op": "open", "type": "Savings"}
+    {"op": "close", "account": "AC001"}
+    {"op": "logout"}
+
+Replies have "ok": true and the result, or "ok": false with the "reason" and an "error" message:
+    {"ok": true, "transactions": ["TRX012"]}
+    {"ok": false, "reason": "insufficient_funds", "error": "Sorry, you can't withdraw that much"}
+
+All operations except login need a logged in customer, and only the customer's own Accounts can be used, apart from
+the Account a transfer goes to. Every change is stored as it is made; a background task folds the journal into a
+new snapshot once it grows large, and when the server stops. Changes and history reads are carried out in a pool of
+worker threads, so while a snapshot is being written only they wait and other requests are still answered.
+
+    python server.py [port]
+"""
+import asyncio
+import json
+import signal
+import sys
+
+import Bank
+
+HOST = "127.0.0.1"
+PORT = 8765
+SNAPSHOT_INTERVAL = 5.0     # Seconds between checks whether the journal should be folded into a snapshot
+
+
+class BankServer(object):
+    """ BankServer class: Answers requests from every connection against one in-memory bank. """
+
+    def __init__(self, customers, accounts):
+        self.customers = customers
+        self.accounts = accounts
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        """ Serves one connection until the client disconnects. """
+        session = {"customer": None}
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is longer than the stream limit, and what was read of it is dropped
+                    reply = {"ok": False, "reason": "bad_request", "error": "Request is too long"}
+                else:
+                    if not line:
+                        break
+                    reply = await self.answer(session, line)
+
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def answer(self, session, line):
+        """ Carries out the request on one line for the session and returns the reply. """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError
+        except ValueError:
+            return {"ok": False, "reason": "bad_request", "error": "Request is not a JSON object"}
+
+        # Changes wait for the bank lock and the journal, and histories can be read from disk, so they are carried
+        # out in worker threads and a snapshot being written does not hold up the other connections
+        if request.get("op") in self.blocking:
+            reply = await asyncio.get_running_loop().run_in_executor(None, self.dispatch, session, request)
+        else:
+            reply = self.dispatch(session, request)
+        if "id" in request:
+            reply["id"] = request["id"]
+        return reply
+
+    def dispatch(self, session, request):
+        """ Carries out one request for the session and returns the reply. """
+        op = request.get("op")
+        if op == "login":
+            return self.login(session, request)
+
+        handler = self.handlers.get(op)
+        if handler is None:
+            return {"ok": False, "reason": "bad_request", "error": "Unknown operation: " + str(op)}
+        if session["customer"] is None:
+            return {"ok": False, "reason": "not_logged_in", "error": "Please login first"}
+
+        try:
+            return handler(self, session["customer"], request)
+        except Bank.TransactionError as error:
+            return {"ok": False, "reason": error.reason, "error": str(error).strip()}
+
+    def login(self, session, request):
+        customer = self.customers.get(request.get("customer"))
+        if customer is None:
+            return {"ok": False, "reason": "unknown_customer", "error": "Account does not exist"}
+        if not customer.check_pin(str(request.get("pin"))):
+            return {"ok": False, "reason": "wrong_pin", "error": "Wrong PIN entered"}
+
+        session["customer"] = customer
+        return {"ok": True, "customer": customer.customer_id, "name": customer.name,
+                "accounts": [acc.acc_id for acc in customer.accounts]}
+
+    def logout(self, customer, request):
+        return {"ok": True}
+
+    def own_account(self, customer, request):
+        """ Returns the customer's Account named in the request, or raises TransactionError. """
+        acc = self.accounts.get(request.get("account"))
+        if acc is None or acc.owner is not customer:
+            raise Bank.TransactionError("unknown_account", "You have no such account")
+        return acc
+
+    def balance(self, customer, request):
+        return {"ok": True, "accounts": [{"account": acc.acc_id, "type": acc.accType, "balance": float(acc.balance)}
+                                         for acc in customer.accounts]}
+
+    def deposit(self, customer, request):
+        acc = self.own_account(customer, request)
+        transaction = acc.post_deposit(Bank.parse_amount(request.get("amount")))
+        return {"ok": True, "transactions": [transaction[0]], "balance": float(acc.balance)}
+
+    def withdraw(self, customer, request):
+        acc = self.own_account(customer, request)
+        transaction = acc.post_withdraw(Bank.parse_amount(request.get("amount")))
+        return {"ok": True, "transactions": [transaction[0]], "balance": float(acc.balance)}
+
+    def transfer(self, customer, request):
+        acc = self.own_account(customer, request)
+        receiver_acc = self.accounts.get(request.get("to"))
+        # Closed accounts stay in accounts without an owner
+        if receiver_acc is None or receiver_acc.owner is None:
+            raise Bank.TransactionError("unknown_account", "Receiving account does not exist")
+        sent, received = acc.post_transfer(Bank.parse_amount(request.get("amount")), receiver_acc)
+        return {"ok": True, "transactions": [sent[0], received[0]], "balance": float(acc.balance)}
+
+    def history(self, customer, request):
+        acc = self.own_account(customer, request)
+        count = request.get("count", 5)
+        if not isinstance(count, int) or count < 0:
+            raise Bank.TransactionError("bad_request", "count must be a whole number")
+
+        # Most recent transaction first, like the menu
+        return {"ok": True, "account": acc.acc_id, "balance": float(acc.balance),
+                "transactions": [{"trx": trx[0], "date": trx[2], "type": trx[3], "amount": trx[4]}
+                                 for trx in Bank.storage.history(acc, count)]}
+
+    def statement(self, customer, request):
+        acc = self.own_account(customer, request)
+        page = request.get("page", 0)
+        if not isinstance(page, int) or page < 0:
+            raise Bank.TransactionError("bad_request", "page must be a whole number")
+        try:
+            statement = acc.statement(request.get("from"), request.get("to"))
+        except (TypeError, ValueError):
+            raise Bank.TransactionError("bad_request", "from and to must be dates such as 2021-12-18")
+
+        return {"ok": True, "account": acc.acc_id, "opening_balance": float(statement.opening_balance),
+                "closing_balance": float(statement.closing_balance), "count": len(statement),
+                "pages": statement.pages(), "page": page,
+                "transactions": [{"trx": trx[0], "date": trx[2], "type": trx[3], "amount": trx[4]}
+                                 for trx in statement.page(page)]}
+
+    def open(self, customer, request):
+        acc_type = request.get("type")
+        if acc_type not in Bank.ACCOUNT_TYPES:
+            raise Bank.TransactionError("bad_request", "type must be Savings or Checking")
+        acc = Bank.open_account(customer, self.accounts, acc_type)
+        return {"ok": True, "account": acc.acc_id}
+
+    def close(self, customer, request):
+        acc = self.own_account(customer, request)
+        customer.remove_account(acc)
+        return {"ok": True, "account": acc.acc_id}
+
+    handlers = {"logout": logout, "balance": balance, "deposit": deposit, "withdraw": withdraw,
+                "transfer": transfer, "history": history, "statement": statement, "open": open,
+                "close": close}
+    blocking = {"deposit", "withdraw", "transfer", "history", "statement", "open", "close"}
+
+    async def persist(self):
+        """ Folds the journal into a new snapshot in a worker thread whenever it has grown large. """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            if Bank.storage.pending() >= Bank.JOURNAL_COMPACT_SIZE:
+                await loop.run_in_executor(None, Bank.storage.save, self.customers)
+
+
+async def serve(port):
+    """ Loads the bank and serves it until interrupted, then writes a final snapshot. """
+    customers = {}
+    accounts = {}
+    Bank.create_bank_obj(customers, accounts)
+
+    # The bank could not be loaded
+    if Bank.storage is None:
+        return
+
+    bank_server = BankServer(customers, accounts)
+    persist_task = asyncio.ensure_future(bank_server.persist())
+    server = await asyncio.start_server(bank_server.handle, HOST, port, backlog=4096)
+    print("Serving the bank on %s:%d" % (HOST, port))
+
+    # Stop cleanly on Ctrl+C or when asked to terminate, where the system supports it
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        persist_task.cancel()
+        Bank.storage.save(customers)
+        Bank.storage.close()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    try:
+        asyncio.run(serve(port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()